@@ -0,0 +1,63 @@
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Sequence
+
+# Word lists for readable synthetic product names per language
+_WORDS = {
+    "en": ["Classic", "Premium", "Mini", "Pro", "Ultra", "Fresh", "Mint", "Berry", "Ice", "Gold", "Black", "Lemon"],
+    "ru": ["Классик", "Премиум", "Мини", "Про", "Ультра", "Свежий", "Мята", "Ягода", "Лёд", "Золото", "Чёрный", "Лимон"],
+    "pl": ["Klasyczny", "Premium", "Mini", "Pro", "Ultra", "Świeży", "Mięta", "Jagoda", "Lód", "Złoty", "Czarny", "Cytryna"],
+}
+
+
+def generate_catalog(products: int = 1000, categories: int = 20, languages: Sequence[str] = ("en", "ru", "pl"),
+                     locations: int = 3, manufacturers: int = 30, seed: int = 42) -> Dict[str, List[dict]]:
+    """
+    Builds a synthetic catalog in the shape of the Supabase tables the bot reads:
+    {table_name: [row, ...]}. Deterministic for a given seed.
+    """
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    created = (now - timedelta(days=30)).isoformat()
+    tables: Dict[str, List[dict]] = {
+        "categories": [{"id": i, "name": f"Category {i}", "updated_at": created} for i in range(1, categories + 1)],
+        "manufacturers": [{"id": i, "name": f"Brand{i:03d}", "updated_at": created} for i in range(1, manufacturers + 1)],
+        "locations": [{"id": i, "name": f"Store {i}", "address": f"{i} Main St", "updated_at": created} for i in range(1, locations + 1)],
+        "products": [],
+        "product_localization": [],
+        "product_stock": [],
+        "interface_text": [],
+        "users": [],
+        "user_cart": [],
+        "orders": [],
+        "order_items": [],
+        "product_media": [],
+    }
+    for product_id in range(1, products + 1):
+        tables["products"].append({
+            "id": product_id,
+            "name": f"product-{product_id}",
+            "price": round(rng.uniform(1, 200), 2),
+            "image_url": f"https://example.invalid/images/{product_id}.jpg" if rng.random() < 0.7 else None,
+            "variation": rng.choice([None, "S", "M", "L"]),
+            "category_id": rng.randint(1, categories),
+            "manufacturer_id": rng.randint(1, manufacturers),
+            "updated_at": (now - timedelta(minutes=rng.randint(0, 10000))).isoformat(),
+        })
+        for language in languages:
+            words = _WORDS.get(language, _WORDS["en"])
+            tables["product_localization"].append({
+                "product_id": product_id,
+                "language_code": language,
+                "name": f"{rng.choice(words)} {rng.choice(words)} {product_id}",
+                "description": " ".join(rng.choice(words) for _ in range(8)),
+                "updated_at": created,
+            })
+        for location_id in range(1, locations + 1):
+            tables["product_stock"].append({
+                "product_id": product_id,
+                "location_id": location_id,
+                "quantity": rng.randint(0, 500),
+                "updated_at": created,
+            })
+    return tables
@@ -0,0 +1,355 @@
+import asyncio
+import functools
+import json
+import re
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiohttp import web
+
+# (table, embedded name) -> (related table, local column, related column, to_one)
+# product_localization is served as a single object (already filtered to one language),
+# which is the shape the bot's handlers and helpers read.
+RELATIONS = {
+    ("products", "manufacturers"): ("manufacturers", "manufacturer_id", "id", True),
+    ("products", "categories"): ("categories", "category_id", "id", True),
+    ("products", "product_localization"): ("product_localization", "id", "product_id", True),
+    ("products", "product_stock"): ("product_stock", "id", "product_id", False),
+    ("product_stock", "locations"): ("locations", "location_id", "id", True),
+    ("user_cart", "products"): ("products", "product_id", "id", True),
+    ("user_cart", "locations"): ("locations", "location_id", "id", True),
+    ("orders", "order_items"): ("order_items", "id", "order_id", False),
+    ("order_items", "products"): ("products", "product_id", "id", True),
+}
+
+_RESERVED_PARAMS = {"select", "order", "offset", "limit", "on_conflict", "columns"}
+_SELECT_ITEM_RE = re.compile(r"^(?:(\w+):)?(\w+)(!inner)?(?:\((.*)\))?$", re.S)
+
+
+class PostgrestError(Exception):
+    def __init__(self, message: str, status: int = 400, code: str = "P0001"):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        self.code = code
+
+
+def _split_top_level(text: str) -> List[str]:
+    parts, depth, current = [], 0, []
+    for ch in text:
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        if ch == "," and depth == 0:
+            parts.append("".join(current).strip())
+            current = []
+        else:
+            current.append(ch)
+    if "".join(current).strip():
+        parts.append("".join(current).strip())
+    return parts
+
+
+def parse_select(select: str) -> List[Tuple[str, bool, Optional[list]]]:
+    """'id, a!inner(x, b(y))' -> [(name, inner, children or None), ...]"""
+    items = []
+    for part in _split_top_level(select or "*"):
+        match = _SELECT_ITEM_RE.match(part.replace(" ", ""))
+        if not match:
+            items.append((part, False, None))
+            continue
+        _, name, inner, children = match.groups()
+        items.append((name, bool(inner), parse_select(children) if children is not None else None))
+    return items
+
+
+def _coerce(raw: str, sample: Any) -> Any:
+    if raw == "null":
+        return None
+    if isinstance(sample, bool):
+        return raw.lower() == "true"
+    if isinstance(sample, int):
+        try:
+            return int(raw)
+        except ValueError:
+            return raw
+    if isinstance(sample, float):
+        try:
+            return float(raw)
+        except ValueError:
+            return raw
+    return raw
+
+
+@functools.lru_cache(maxsize=64)
+def _in_options(raw: str, sample: Any) -> frozenset:
+    """The values of an in.(...) filter, coerced like `sample` (cached: large lists are checked per row)."""
+    return frozenset(_coerce(option.strip('"'), sample) for option in _split_top_level(raw.strip("()")))
+
+
+def _matches(row: dict, column: str, operator: str, raw: str) -> bool:
+    value = row.get(column)
+    if operator == "is":
+        return value is None if raw == "null" else str(value).lower() == raw
+    if operator == "in":
+        return value is not None and value in _in_options(raw, type(value)())
+    if operator in ("ilike", "like"):
+        pattern = re.escape(raw).replace("%", ".*").replace(r"\*", ".*")
+        flags = re.I if operator == "ilike" else 0
+        return value is not None and re.fullmatch(pattern, str(value), flags) is not None
+    if value is None:
+        return False
+    target = _coerce(raw, value)
+    try:
+        return {
+            "eq": value == target, "neq": value != target,
+            "gt": value > target, "gte": value >= target,
+            "lt": value < target, "lte": value <= target,
+        }[operator]
+    except (KeyError, TypeError):
+        raise PostgrestError(f"Unsupported filter {operator} on {column}")
+
+
+class FakePostgrest:
+    """
+    In-memory stand-in for the PostgREST API behind Supabase, covering what the bot uses:
+    selects with embedded relations (incl. !inner and filters on embedded columns),
+    eq/neq/gt/gte/lt/lte/in/ilike/is filters, order, offset/limit, count=exact,
+    single-object responses, insert/upsert/update/delete, and the bot's RPC functions.
+    Like Supabase, a select returns at most `max_rows` rows (PostgREST's db-max-rows).
+    Runs its own event loop in a background thread so it does not compete with the bot.
+    """
+
+    def __init__(self, tables: Dict[str, List[dict]], max_rows: int = 1000):
+        self.tables = tables
+        self.max_rows = max_rows
+        self.requests = Counter() # "GET products", "POST rpc/save_cart_lines", ...
+        self._indexes: Dict[Tuple[str, str], Dict[Any, List[dict]]] = {}
+        self._next_ids = {name: max((row.get("id", 0) for row in rows), default=0) + 1 for name, rows in tables.items()}
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._runner: Optional[web.AppRunner] = None
+        self.port: Optional[int] = None
+
+    # Data access
+
+    def _index(self, table: str, column: str) -> Dict[Any, List[dict]]:
+        key = (table, column)
+        index = self._indexes.get(key)
+        if index is None:
+            index = {}
+            for row in self.tables.get(table, []):
+                index.setdefault(row.get(column), []).append(row)
+            self._indexes[key] = index
+        return index
+
+    def _changed(self, table: str):
+        for key in [key for key in self._indexes if key[0] == table]:
+            del self._indexes[key]
+
+    def _candidates(self, table: str, filters: List[Tuple[str, str, str]]) -> List[dict]:
+        for column, operator, raw in filters:
+            if operator in ("eq", "in"):
+                index = self._index(table, column)
+                sample = next(iter(index), None)
+                if operator == "eq":
+                    return list(index.get(_coerce(raw, sample), []))
+                return [row for value in _in_options(raw, sample) for row in index.get(value, [])]
+        return list(self.tables.get(table, []))
+
+    def _render(self, table: str, rows: List[dict], select, filters: Dict[tuple, list], path: tuple = ()) -> List[dict]:
+        output = []
+        for row in rows:
+            if not all(_matches(row, *condition) for condition in filters.get(path, [])):
+                continue
+            item, keep = {}, True
+            for name, inner, children in select:
+                if children is None:
+                    if name == "*":
+                        item.update(row)
+                    else:
+                        item[name] = row.get(name)
+                    continue
+                relation = RELATIONS.get((table, name))
+                if relation is None:
+                    raise PostgrestError(f"Could not find a relationship between '{table}' and '{name}'", 400, "PGRST200")
+                related_table, local_column, related_column, to_one = relation
+                related_rows = self._index(related_table, related_column).get(row.get(local_column), [])
+                rendered = self._render(related_table, related_rows, children, filters, path + (name,))
+                if inner and not rendered:
+                    keep = False
+                    break
+                item[name] = (rendered[0] if rendered else None) if to_one else rendered
+            if keep:
+                output.append(item)
+        return output
+
+    def _parse_filters(self, query) -> Dict[tuple, list]:
+        filters: Dict[tuple, list] = {}
+        for key, value in query.items():
+            if key in _RESERVED_PARAMS or "." not in value:
+                continue
+            operator, raw = value.split(".", 1)
+            if operator == "not":
+                raise PostgrestError("not.* filters are not supported by the fake")
+            *path, column = key.split(".")
+            filters.setdefault(tuple(path), []).append((column, operator, raw))
+        return filters
+
+    def select(self, table: str, query, count: bool) -> Tuple[List[dict], int]:
+        filters = self._parse_filters(query)
+        rows = self._candidates(table, filters.get((), []))
+        result = self._render(table, rows, parse_select(query.get("select", "*")), filters)
+        for order in reversed(query.get("order", "").split(",") if query.get("order") else []):
+            column, _, direction = order.partition(".")
+            result.sort(key=lambda r: (r.get(column) is None, r.get(column)), reverse=direction.startswith("desc"))
+        total = len(result)
+        offset = int(query.get("offset", 0))
+        limit = query.get("limit")
+        limit = min(int(limit), self.max_rows) if limit is not None else self.max_rows
+        return result[offset:offset + limit], total
+
+    def insert(self, table: str, body, on_conflict: Optional[str] = None) -> List[dict]:
+        rows = body if isinstance(body, list) else [body]
+        stored = self.tables.setdefault(table, [])
+        conflict_columns = on_conflict.split(",") if on_conflict else None
+        by_key = {tuple(r.get(c) for c in conflict_columns): r for r in stored} if conflict_columns else {}
+        result = []
+        for row in rows:
+            if conflict_columns:
+                existing = by_key.get(tuple(row.get(c) for c in conflict_columns))
+                if existing is not None:
+                    existing.update(row)
+                    result.append(dict(existing))
+                    continue
+            row = dict(row)
+            if "id" not in row and table not in ("user_cart", "product_stock", "product_localization", "product_media"):
+                row["id"] = self._next_ids.get(table, 1)
+                self._next_ids[table] = row["id"] + 1
+            row.setdefault("created_at", datetime.now(timezone.utc).isoformat())
+            stored.append(row)
+            if conflict_columns:
+                by_key[tuple(row.get(c) for c in conflict_columns)] = row
+            result.append(dict(row))
+        self._changed(table)
+        return result
+
+    def update(self, table: str, query, body: dict) -> List[dict]:
+        filters = self._parse_filters(query).get((), [])
+        updated = []
+        for row in self._candidates(table, filters):
+            if all(_matches(row, *condition) for condition in filters):
+                row.update(body)
+                updated.append(dict(row))
+        self._changed(table)
+        return updated
+
+    def delete(self, table: str, query) -> List[dict]:
+        filters = self._parse_filters(query).get((), [])
+        kept, deleted = [], []
+        for row in self.tables.get(table, []):
+            (deleted if all(_matches(row, *condition) for condition in filters) else kept).append(row)
+        self.tables[table] = kept
+        self._changed(table)
+        return deleted
+
+    # RPC functions (Python versions of database/sql/*.sql and the categories RPC)
+
+    def rpc(self, name: str, args: dict):
+        if name == "get_categories_with_product_count":
+            counts = Counter(product["category_id"] for product in self.tables["products"])
+            return [{"id": c["id"], "name": c["name"], "product_count": counts.get(c["id"], 0)}
+                    for c in self.tables["categories"]]
+        if name == "save_cart_lines":
+            lines = {(r["user_id"], r["product_id"], r["location_id"]): r["quantity"] for r in args["p_lines"]}
+            cart = [r for r in self.tables["user_cart"] if (r["user_id"], r["product_id"], r["location_id"]) not in lines]
+            cart.extend({"user_id": key[0], "product_id": key[1], "location_id": key[2], "quantity": quantity}
+                        for key, quantity in lines.items() if quantity > 0)
+            self.tables["user_cart"] = cart
+            self._changed("user_cart")
+            return None
+        if name == "create_order_from_cart":
+            user_id = args["p_user_id"]
+            cart = [r for r in self.tables["user_cart"] if r["user_id"] == user_id]
+            if not cart:
+                raise PostgrestError("Cart is empty")
+            prices = {p["id"]: p["price"] for p in self.tables["products"]}
+            order = self.insert("orders", {
+                "user_id": user_id, "status": "pending_admin_approval",
+                "payment_method": args["p_payment_method"],
+                "total_amount": sum(r["quantity"] * prices[r["product_id"]] for r in cart),
+            })[0]
+            self.insert("order_items", [{
+                "order_id": order["id"], "product_id": r["product_id"], "location_id": r["location_id"],
+                "quantity": r["quantity"], "price_at_order": prices[r["product_id"]], "reserved_quantity": r["quantity"],
+            } for r in cart])
+            self.delete("user_cart", {"user_id": f"eq.{user_id}"})
+            return order
+        raise PostgrestError(f"Could not find the function public.{name}", 404, "PGRST202")
+
+    # HTTP layer
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        path = request.match_info["path"]
+        query = dict(request.query)
+        self.requests[f"{request.method} {path}"] += 1
+        try:
+            body = await request.json() if request.can_read_body else None
+            if path.startswith("rpc/"):
+                return web.json_response(self.rpc(path[4:], body or {}))
+            if request.method == "GET":
+                count = "count=" in request.headers.get("Prefer", "")
+                rows, total = self.select(path, query, count)
+                if "vnd.pgrst.object" in request.headers.get("Accept", ""):
+                    if len(rows) != 1:
+                        raise PostgrestError("JSON object requested, multiple (or no) rows returned", 406, "PGRST116")
+                    return web.json_response(rows[0])
+                headers = {}
+                if count:
+                    offset = int(query.get("offset", 0))
+                    end = offset + len(rows) - 1
+                    headers["Content-Range"] = f"{offset}-{end}/{total}" if rows else f"*/{total}"
+                return web.json_response(rows, headers=headers)
+            if request.method == "POST":
+                upsert = "merge-duplicates" in request.headers.get("Prefer", "")
+                return web.json_response(self.insert(path, body, query.get("on_conflict") if upsert else None), status=201)
+            if request.method == "PATCH":
+                return web.json_response(self.update(path, query, body or {}))
+            if request.method == "DELETE":
+                return web.json_response(self.delete(path, query))
+            raise PostgrestError(f"Method {request.method} not supported", 405)
+        except PostgrestError as e:
+            return web.json_response({"message": e.message, "code": e.code, "details": None, "hint": None}, status=e.status)
+
+    def _app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_route("*", "/rest/v1/{path:.*}", self._handle)
+        return app
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Starts serving in a background thread; returns the base URL to use as SUPABASE_URL."""
+        started = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._runner = web.AppRunner(self._app(), access_log=None)
+            self._loop.run_until_complete(self._runner.setup())
+            self._loop.run_until_complete(web.TCPSite(self._runner, host, port).start())
+            self.port = self._runner.addresses[0][1] # Actual port when started with port=0
+            started.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name="fake-postgrest", daemon=True)
+        self._thread.start()
+        started.wait()
+        return f"http://{host}:{self.port}"
+
+    def stop(self):
+        if self._loop:
+            asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
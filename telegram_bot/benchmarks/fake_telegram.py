@@ -0,0 +1,97 @@
+import asyncio
+import itertools
+import json
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+from aiohttp import web
+
+_BOOLEAN_METHODS = {
+    "answerCallbackQuery", "answerInlineQuery", "deleteMessage", "setWebhook", "deleteWebhook",
+    "setMyCommands", "sendChatAction",
+}
+_MESSAGE_METHODS = {"sendMessage", "editMessageText", "editMessageCaption", "editMessageReplyMarkup",
+                    "sendPhoto", "editMessageMedia"}
+
+
+class FakeTelegramAPI:
+    """
+    Stub Telegram Bot API (`/bot<token>/<method>`) answering every call the bot makes with a
+    plausible result, optionally after `latency` seconds. Counts calls per method.
+    Runs its own event loop in a background thread.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = Counter()
+        self._message_ids = itertools.count(1)
+        self._file_ids = itertools.count(1)
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._runner: Optional[web.AppRunner] = None
+        self.port: Optional[int] = None
+
+    def _message(self, form) -> dict:
+        chat_id = int(form.get("chat_id") or 0)
+        message = {
+            "message_id": int(form.get("message_id") or next(self._message_ids)),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": 1, "is_bot": True, "first_name": "Bot", "username": "loadtest_bot"},
+        }
+        if form.get("text"):
+            message["text"] = form["text"]
+        if "photo" in form or form.get("media"):
+            file_id = f"fake-file-{next(self._file_ids)}"
+            message["photo"] = [{"file_id": file_id, "file_unique_id": file_id, "width": 800, "height": 800}]
+            message["caption"] = form.get("caption")
+        return message
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        self.calls[method] += 1
+        form = {key: value for key, value in (await request.post()).items() if isinstance(value, str)}
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if method == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "Bot", "username": "loadtest_bot"}
+        elif method in _MESSAGE_METHODS:
+            result = self._message(form)
+        elif method in _BOOLEAN_METHODS:
+            result = True
+        else:
+            return web.json_response({"ok": False, "error_code": 404, "description": "Not Found: method not found"},
+                                     status=404)
+        return web.Response(text=json.dumps({"ok": True, "result": result}), content_type="application/json")
+
+    def _app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self._handle)
+        return app
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Starts serving in a background thread; returns the base URL for TelegramAPIServer.from_base()."""
+        started = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._runner = web.AppRunner(self._app(), access_log=None)
+            self._loop.run_until_complete(self._runner.setup())
+            self._loop.run_until_complete(web.TCPSite(self._runner, host, port).start())
+            self.port = self._runner.addresses[0][1] # Actual port when started with port=0
+            started.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name="fake-telegram", daemon=True)
+        self._thread.start()
+        started.wait()
+        return f"http://{host}:{self.port}"
+
+    def stop(self):
+        if self._loop:
+            asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
@@ -0,0 +1,226 @@
+"""
+Offline load test: drives the real Dispatcher (routers and middlewares from main.py) with
+synthetic Telegram updates, against a stub Bot API and an in-memory PostgREST stand-in.
+Nothing leaves the machine; no Telegram token or Supabase project is needed.
+
+Run from the telegram_bot/ directory:
+
+    python -m benchmarks.loadtest --users 200 --concurrency 50 --products 5000
+
+Each virtual user walks: /start -> language -> catalog -> category page 0 -> page 1
+-> product -> add to cart -> my orders -> cart. Reports updates/s and p50/p95/p99
+latency per handler (callback data with ids stripped, or the command).
+"""
+import argparse
+import asyncio
+import itertools
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+from benchmarks.catalog_generator import generate_catalog
+from benchmarks.fake_postgrest import FakePostgrest
+from benchmarks.fake_telegram import FakeTelegramAPI
+
+_update_ids = itertools.count(1)
+_message_ids = itertools.count(1_000_000)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline load test for the bot's handlers.")
+    parser.add_argument("--users", type=int, default=100, help="Virtual users (each runs the full scenario)")
+    parser.add_argument("--concurrency", type=int, default=20, help="Virtual users running at the same time")
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--languages", default="en,ru,pl", help="Comma-separated language codes")
+    parser.add_argument("--locations", type=int, default=3)
+    parser.add_argument("--orders-per-user", type=int, default=2, help="Orders seeded for each virtual user")
+    parser.add_argument("--telegram-latency", type=float, default=0.0, help="Seconds added to each Bot API call")
+    parser.add_argument("--backend", choices=("supabase", "sqlite"), default="supabase",
+                        help="REPOSITORY_BACKEND for catalog reads (sqlite syncs a replica in a temp dir)")
+    parser.add_argument("--send-limits", action="store_true",
+                        help="Keep the outgoing SendScheduler's Telegram rate limits (off by default to measure handlers)")
+    parser.add_argument("--cold", action="store_true", help="Skip dispatcher startup (no cache warm-up)")
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args(argv)
+
+
+def seed_orders(tables: Dict[str, List[dict]], user_ids: List[int], per_user: int, rng: random.Random):
+    """Past orders for the virtual users, so 'my orders' renders real rows."""
+    products = tables["products"]
+    order_id = itertools.count(1)
+    for user_id in user_ids:
+        for _ in range(per_user):
+            items = rng.sample(products, k=min(3, len(products)))
+            oid = next(order_id)
+            tables["orders"].append({
+                "id": oid, "user_id": user_id, "status": "completed", "payment_method": "cash",
+                "total_amount": round(sum(p["price"] for p in items), 2),
+                "created_at": "2024-01-01T12:00:00+00:00",
+            })
+            for product in items:
+                tables["order_items"].append({
+                    "order_id": oid, "product_id": product["id"], "location_id": 1, "quantity": 1,
+                    "price_at_order": product["price"], "reserved_quantity": 0,
+                })
+
+
+def _user(user_id: int, language: str) -> dict:
+    return {"id": user_id, "is_bot": False, "first_name": f"User{user_id}", "language_code": language}
+
+
+def message_update(user_id: int, language: str, text: str) -> dict:
+    return {
+        "update_id": next(_update_ids),
+        "message": {
+            "message_id": next(_message_ids), "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"}, "from": _user(user_id, language), "text": text,
+            "entities": [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}] if text.startswith("/") else None,
+        },
+    }
+
+
+def callback_update(user_id: int, language: str, data: str) -> dict:
+    return {
+        "update_id": next(_update_ids),
+        "callback_query": {
+            "id": str(next(_update_ids)), "from": _user(user_id, language), "chat_instance": str(user_id), "data": data,
+            "message": {
+                "message_id": next(_message_ids), "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private"},
+                "from": {"id": 1, "is_bot": True, "first_name": "Bot"}, "text": "menu",
+            },
+        },
+    }
+
+
+def scenario(user_id: int, language: str, tables: Dict[str, List[dict]], items_per_page: int,
+             rng: random.Random) -> List[dict]:
+    products_by_category = defaultdict(list)
+    for product in tables["products"]:
+        products_by_category[product["category_id"]].append(product["id"])
+    category_id = rng.choice([c for c in products_by_category if products_by_category[c]])
+    ids = sorted(products_by_category[category_id])
+    page_1 = f"category_{category_id}_1"
+    if len(ids) > items_per_page:
+        page_1 += f"_{ids[items_per_page - 1]}" # what the Next button sends (keyset cursor)
+    product_id = rng.choice(ids)
+    return [
+        message_update(user_id, language, "/start"),
+        callback_update(user_id, language, f"lang_{language}"),
+        callback_update(user_id, language, "catalog"),
+        callback_update(user_id, language, f"category_{category_id}_0"),
+        callback_update(user_id, language, page_1),
+        callback_update(user_id, language, f"product_{product_id}"),
+        callback_update(user_id, language, f"addtocart_{product_id}"),
+        callback_update(user_id, language, "my_orders"),
+        callback_update(user_id, language, "view_cart"),
+    ]
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def print_report(latencies: Dict[str, List[float]], errors: Dict[str, int], elapsed: float,
+                 telegram: FakeTelegramAPI, postgrest: FakePostgrest):
+    total = sum(len(values) for values in latencies.values())
+    print(f"\n{total} updates in {elapsed:.2f}s -> {total / elapsed:.1f} updates/s\n")
+    print(f"{'handler':<24}{'count':>7}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for label in sorted(latencies):
+        values = sorted(latencies[label])
+        print(f"{label:<24}{len(values):>7}{errors.get(label, 0):>8}"
+              f"{percentile(values, 0.50) * 1000:>10.1f}{percentile(values, 0.95) * 1000:>10.1f}"
+              f"{percentile(values, 0.99) * 1000:>10.1f}{values[-1] * 1000:>10.1f}")
+    print("\nBot API calls:", dict(telegram.calls.most_common()))
+    print("PostgREST requests:", dict(postgrest.requests.most_common()))
+
+
+async def run(args) -> None:
+    from aiogram.types import Update
+
+    from handlers.catalog import ITEMS_PER_PAGE
+    from main import create_bot, create_dispatcher
+    from utils.metrics import handler_label
+    from utils.warmup import warmup
+
+    rng = random.Random(args.seed)
+    languages = args.languages.split(",")
+    user_ids = [10_000 + i for i in range(args.users)]
+    seed_orders(args.tables, user_ids, args.orders_per_user, rng)
+
+    bot = create_bot()
+    dp = create_dispatcher()
+    if not args.cold:
+        started = time.perf_counter()
+        await dp.emit_startup(bot=bot)
+        print(f"Startup (cache warm-up) took {time.perf_counter() - started:.2f}s:",
+              ", ".join(f"{name} {seconds:.2f}s" for name, seconds in warmup.timings.items()))
+
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def virtual_user(user_id: int):
+        async with semaphore:
+            for raw in scenario(user_id, rng.choice(languages), args.tables, ITEMS_PER_PAGE, rng):
+                update = Update.model_validate(raw, context={"bot": bot})
+                label = handler_label(update.event)
+                started = time.perf_counter()
+                try:
+                    await dp.feed_update(bot, update)
+                except Exception as e:
+                    errors[label] += 1
+                    logging.getLogger(__name__).debug(f"{label} raised: {e!r}")
+                latencies[label].append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(virtual_user(user_id) for user_id in user_ids))
+    elapsed = time.perf_counter() - started
+
+    if not args.cold:
+        await dp.emit_shutdown(bot=bot)
+    await bot.session.close()
+    print_report(latencies, errors, elapsed, args.telegram, args.postgrest)
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    args.tables = generate_catalog(
+        products=args.products, categories=args.categories, languages=tuple(args.languages.split(",")),
+        locations=args.locations, seed=args.seed,
+    )
+    args.postgrest = FakePostgrest(args.tables)
+    args.telegram = FakeTelegramAPI(latency=args.telegram_latency)
+
+    # config.py reads these at import time, so they must be set before any bot module is imported
+    os.environ["SUPABASE_URL"] = args.postgrest.start()
+    os.environ["SUPABASE_KEY"] = "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoiYW5vbiJ9.loadtest"
+    os.environ["BOT_TOKEN"] = "123456:LOADTEST-fake-token"
+    os.environ.setdefault("DEBUG", "False")
+    os.environ["REPOSITORY_BACKEND"] = args.backend
+    replica_dir = tempfile.TemporaryDirectory()
+    os.environ["CATALOG_REPLICA_PATH"] = os.path.join(replica_dir.name, "catalog_replica.sqlite3")
+    os.environ["TELEGRAM_API_URL"] = args.telegram.start()
+    if not args.send_limits:
+        os.environ["SEND_GLOBAL_RATE"] = "0"
+    logging.basicConfig(level=logging.WARNING)
+
+    try:
+        asyncio.run(run(args))
+    finally:
+        args.telegram.stop()
+        args.postgrest.stop()
+        replica_dir.cleanup()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
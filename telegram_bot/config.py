@@ -6,11 +6,63 @@ load_dotenv()
 
 # Telegram Bot
 BOT_TOKEN = os.getenv("BOT_TOKEN")
+# Base URL of a self-hosted Bot API server (e.g. http://localhost:8081); unset = api.telegram.org
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL")
+# Outgoing request scheduler: sends/edits/deletes per second overall (0 disables the scheduler)
+# and per chat (with bursts of SEND_CHAT_BURST); 429 flood-waits are retried SEND_MAX_RETRIES times
+SEND_GLOBAL_RATE = float(os.getenv("SEND_GLOBAL_RATE", "30"))
+SEND_CHAT_RATE = float(os.getenv("SEND_CHAT_RATE", "1"))
+SEND_CHAT_BURST = float(os.getenv("SEND_CHAT_BURST", "3"))
+SEND_MAX_RETRIES = int(os.getenv("SEND_MAX_RETRIES", "3"))
 
 # Supabase
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
+# Max concurrent Supabase requests (worker pool size) and per-call timeout in seconds
+SUPABASE_POOL_SIZE = int(os.getenv("SUPABASE_POOL_SIZE", "10"))
+SUPABASE_TIMEOUT = float(os.getenv("SUPABASE_TIMEOUT", "10"))
+
+# Localization: seconds between background reloads of the interface_text table (0 disables)
+LOCALIZATION_REFRESH_INTERVAL = float(os.getenv("LOCALIZATION_REFRESH_INTERVAL", "300"))
+
+# Catalog snapshot cache: seconds between polls of products.updated_at (0 disables polling)
+CATALOG_REFRESH_INTERVAL = float(os.getenv("CATALOG_REFRESH_INTERVAL", "60"))
+# Seconds the per-location stock shown on product pages is cached (0 disables). product_stock
+# only changes through imports and admin edits, which invalidate the cache.
+CATALOG_STOCK_TTL = float(os.getenv("CATALOG_STOCK_TTL", "30"))
+# Startup warm-up (utils/warmup.py): products whose stock is prefetched
+# (most ordered recently, topped up with the first page of every category)
+WARMUP_HOT_PRODUCTS = int(os.getenv("WARMUP_HOT_PRODUCTS", "200"))
+
+# Repository backend for catalog reads: "supabase" (default) or "sqlite" (local replica,
+# kept in sync from Supabase; cart/orders/users always go to Supabase)
+REPOSITORY_BACKEND = os.getenv("REPOSITORY_BACKEND", "supabase").lower()
+CATALOG_REPLICA_PATH = os.getenv("CATALOG_REPLICA_PATH", "catalog_replica.sqlite3")
+# Seconds between incremental (updated_at cursor) syncs of the replica
+CATALOG_REPLICA_SYNC_INTERVAL = float(os.getenv("CATALOG_REPLICA_SYNC_INTERVAL", "30"))
+
+# Catalog imports (database/catalog_import.py): rows per select/upsert batch and batches in flight
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+IMPORT_CONCURRENCY = int(os.getenv("IMPORT_CONCURRENCY", "4"))
+
+# Write-behind cart sessions (database/cart_store.py): seconds between flushes of changed cart
+# lines to user_cart (0 writes every change through at once), and seconds an unchanged
+# session stays in memory
+CART_FLUSH_INTERVAL = float(os.getenv("CART_FLUSH_INTERVAL", "2"))
+CART_SESSION_TTL = float(os.getenv("CART_SESSION_TTL", "1800"))
+
+# User profile cache (LocalizationMiddleware): max cached users and entry lifetime in seconds
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "600"))
+
+# Order status notifications (database/sql/order_notifications.sql): messages per second
+# (0 disables delivery), outbox rows claimed per batch, seconds between polls when idle,
+# and delivery attempts before a notification is marked failed
+NOTIFY_RATE = float(os.getenv("NOTIFY_RATE", "20"))
+NOTIFY_BATCH_SIZE = int(os.getenv("NOTIFY_BATCH_SIZE", "50"))
+NOTIFY_POLL_INTERVAL = float(os.getenv("NOTIFY_POLL_INTERVAL", "10"))
+NOTIFY_MAX_ATTEMPTS = int(os.getenv("NOTIFY_MAX_ATTEMPTS", "5"))
 
 # Admin settings
 ADMIN_IDS_RAW = os.getenv("ADMIN_IDS")
@@ -18,6 +70,33 @@ ADMIN_IDS = [int(admin_id.strip()) for admin_id in ADMIN_IDS_RAW.split(',')] if
 
 # Optional
 WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+# Address the webhook server listens on (behind the reverse proxy that WEBHOOK_URL points to)
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8000"))
+# Fast-ack webhook: updates are acknowledged at once and queued (at most WEBHOOK_QUEUE_SIZE,
+# 0 = process inside the request) for WEBHOOK_QUEUE_WORKERS concurrent workers. When full,
+# WEBHOOK_QUEUE_OVERFLOW is "backpressure" (wait up to WEBHOOK_QUEUE_PUT_TIMEOUT seconds, then
+# answer 503 so Telegram redelivers later) or "shed" (acknowledge and drop the update).
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000"))
+WEBHOOK_QUEUE_WORKERS = int(os.getenv("WEBHOOK_QUEUE_WORKERS", "50"))
+WEBHOOK_QUEUE_OVERFLOW = os.getenv("WEBHOOK_QUEUE_OVERFLOW", "backpressure").lower()
+WEBHOOK_QUEUE_PUT_TIMEOUT = float(os.getenv("WEBHOOK_QUEUE_PUT_TIMEOUT", "5"))
+# Seconds queued updates get to finish on shutdown
+WEBHOOK_DRAIN_TIMEOUT = float(os.getenv("WEBHOOK_DRAIN_TIMEOUT", "30"))
+# Webhook worker processes; with more than one, a front process routes each update to a
+# worker by from_user.id (WEBHOOK_WORKER_QUEUE_SIZE updates queued per worker at most,
+# WEBHOOK_WORKER_CONCURRENCY processed concurrently per worker)
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "1"))
+WEBHOOK_WORKER_QUEUE_SIZE = int(os.getenv("WEBHOOK_WORKER_QUEUE_SIZE", "1000"))
+WEBHOOK_WORKER_CONCURRENCY = int(os.getenv("WEBHOOK_WORKER_CONCURRENCY", "100"))
+# Port for the Prometheus /metrics endpoint in polling mode (webhook mode serves it on the webhook app)
+METRICS_PORT_RAW = os.getenv("METRICS_PORT")
+METRICS_PORT = int(METRICS_PORT_RAW) if METRICS_PORT_RAW else None
+# Per-update query tracing: log updates issuing more than QUERY_TRACE_BUDGET queries,
+# repeating an identical query, or slower than QUERY_TRACE_SLOW_MS
+QUERY_TRACE_ENABLED = os.getenv("QUERY_TRACE_ENABLED", "False").lower() in ('true', '1', 't')
+QUERY_TRACE_BUDGET = int(os.getenv("QUERY_TRACE_BUDGET", "3"))
+QUERY_TRACE_SLOW_MS = float(os.getenv("QUERY_TRACE_SLOW_MS", "500"))
 DEBUG_RAW = os.getenv("DEBUG", "False") # Default to "False" if not set
 DEBUG = DEBUG_RAW.lower() in ('true', '1', 't')
 
@@ -40,6 +119,7 @@ if DEBUG:
     print(f"SUPABASE_URL: {SUPABASE_URL}")
     print(f"SUPABASE_KEY: {'*' * 5}{SUPABASE_KEY[-5:] if SUPABASE_KEY else 'Not Set'}")
     print(f"SUPABASE_SERVICE_KEY: {'*' * 5}{SUPABASE_SERVICE_KEY[-5:] if SUPABASE_SERVICE_KEY else 'Not Set'}")
+    print(f"SUPABASE_POOL_SIZE: {SUPABASE_POOL_SIZE}, SUPABASE_TIMEOUT: {SUPABASE_TIMEOUT}s")
     print(f"ADMIN_IDS: {ADMIN_IDS}")
     print(f"WEBHOOK_URL: {WEBHOOK_URL if WEBHOOK_URL else 'Not Set'}")
 else:
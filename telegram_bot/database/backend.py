@@ -0,0 +1,30 @@
+import os
+
+try:
+    from database.supabase_client import supabase_client
+except ImportError:
+    supabase_client = None
+
+try:
+    from config import REPOSITORY_BACKEND
+except ImportError:
+    REPOSITORY_BACKEND = os.getenv("REPOSITORY_BACKEND", "supabase").lower()
+
+
+def create_repository(backend: str = REPOSITORY_BACKEND):
+    """
+    The Repository catalog reads go through: the SupabaseClient itself ("supabase"), or a
+    ReplicaRepository serving them from a local SQLite replica of Supabase ("sqlite").
+    Returns None when Supabase is not available.
+    """
+    if supabase_client is None:
+        return None
+    if backend == "sqlite":
+        from database.sqlite_replica import ReplicaRepository
+        return ReplicaRepository(supabase_client)
+    if backend != "supabase":
+        print(f"Unknown REPOSITORY_BACKEND '{backend}', using supabase.")
+    return supabase_client
+
+
+repository = create_repository()
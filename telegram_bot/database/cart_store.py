@@ -0,0 +1,277 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from postgrest.exceptions import APIError
+
+from database.backend import repository
+from database.catalog_cache import catalog_cache
+from utils.metrics import CART_DROPPED_LINES, CART_FLUSHED_LINES, CART_FLUSHES
+
+try:
+    from config import CART_FLUSH_INTERVAL, CART_SESSION_TTL
+except ImportError:
+    CART_FLUSH_INTERVAL = float(os.getenv("CART_FLUSH_INTERVAL", "2"))
+    CART_SESSION_TTL = float(os.getenv("CART_SESSION_TTL", "1800"))
+
+logger = logging.getLogger(__name__)
+
+FLUSH_BATCH_SIZE = 1000 # Cart lines per save_cart_lines call
+EVICT_INTERVAL = 60.0 # Seconds between idle-session sweeps when every change is written through
+
+CartKey = Tuple[int, int] # (product_id, location_id)
+
+
+class CartSession:
+    """One user's cart in memory, plus the lines changed since they were last flushed."""
+
+    __slots__ = ("lines", "dirty", "touched_at")
+
+    def __init__(self, lines: Dict[CartKey, int]):
+        self.lines = lines
+        self.dirty: Set[CartKey] = set()
+        self.touched_at = time.monotonic()
+
+    @property
+    def count(self) -> int:
+        return sum(self.lines.values())
+
+
+class CartStore:
+    """
+    Write-behind cart sessions: each user's cart is loaded from user_cart on first use and
+    then read and changed in memory. Changed lines are flushed to user_cart every
+    `flush_interval` seconds, for all users in one batched save_cart_lines call
+    (database/sql/save_cart_lines.sql) holding only each line's latest quantity. A crash
+    loses at most the changes of one interval. Checkout must go through create_order() here,
+    not Repository.create_order(): it flushes the user's cart first and keeps other flushes
+    of that cart out until the order is created. stop() flushes everything on shutdown.
+    With `flush_interval` 0 every change is written through before the call returns.
+
+    Sessions are per process, so a user's updates must always reach the same process
+    (as in polling and the multi-process webhook mode). Unchanged sessions idle for
+    `session_ttl` seconds are dropped. `hits`/`misses` count session reads / loads.
+    """
+
+    def __init__(self, flush_interval: float = CART_FLUSH_INTERVAL, session_ttl: float = CART_SESSION_TTL):
+        self.flush_interval = flush_interval
+        self.session_ttl = session_ttl
+        self.hits = 0
+        self.misses = 0
+        self._sessions: Dict[int, CartSession] = {}
+        self._loading: Dict[int, asyncio.Future] = {}
+        self._checkouts: Set[int] = set() # Users whose cart is being checked out
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+
+    async def _session(self, user_id: int) -> CartSession:
+        session = self._sessions.get(user_id)
+        if session is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            load = self._loading.get(user_id)
+            if load is None:
+                # Concurrent first taps of one user share a single load
+                load = self._loading[user_id] = asyncio.ensure_future(self._load(user_id))
+                load.add_done_callback(lambda _: self._loading.pop(user_id, None))
+            session = await asyncio.shield(load)
+        session.touched_at = time.monotonic()
+        return session
+
+    async def _load(self, user_id: int) -> CartSession:
+        rows = await repository.get_cart_lines(user_id)
+        session = CartSession({(row["product_id"], row["location_id"]): row["quantity"] for row in rows or []})
+        return self._sessions.setdefault(user_id, session)
+
+    # Reads
+
+    async def count(self, user_id: int) -> int:
+        """Total quantity in the user's cart."""
+        return (await self._session(user_id)).count
+
+    async def get_cart(self, user_id: int, language: str = "en") -> list:
+        """
+        The user's cart in the shape of Repository.get_user_cart(), with products from the
+        catalog snapshot. If a line's product or location is not cached, the cart is flushed
+        and read from the database instead.
+        """
+        session = await self._session(user_id)
+        snapshot = catalog_cache.snapshot(language)
+        items = []
+        for (product_id, location_id), quantity in session.lines.items():
+            product = snapshot.products.get(product_id) if snapshot is not None else None
+            location = catalog_cache.locations.get(location_id)
+            if product is None or location is None:
+                await self.flush([user_id])
+                return await repository.get_user_cart(user_id, language)
+            items.append({
+                "user_id": user_id, "product_id": product_id, "location_id": location_id,
+                "quantity": quantity, "products": product, "locations": location,
+            })
+        return items
+
+    # Writes. Each returns the cart's new total quantity.
+
+    async def add(self, user_id: int, product_id: int, location_id: int, quantity: int = 1) -> int:
+        session = await self._session(user_id)
+        key = (product_id, location_id)
+        self._write(session, key, session.lines.get(key, 0) + quantity)
+        return await self._written(user_id, session)
+
+    async def set_quantity(self, user_id: int, product_id: int, location_id: int, quantity: int) -> int:
+        """Sets a line's quantity; 0 or less removes the line."""
+        session = await self._session(user_id)
+        self._write(session, (product_id, location_id), quantity)
+        return await self._written(user_id, session)
+
+    async def remove(self, user_id: int, product_id: int, location_id: int) -> int:
+        return await self.set_quantity(user_id, product_id, location_id, 0)
+
+    async def clear(self, user_id: int) -> int:
+        session = await self._session(user_id)
+        for key in list(session.lines):
+            self._write(session, key, 0)
+        return await self._written(user_id, session)
+
+    def _write(self, session: CartSession, key: CartKey, quantity: int):
+        if quantity > 0:
+            session.lines[key] = quantity
+        else:
+            session.lines.pop(key, None)
+        session.dirty.add(key)
+
+    async def _written(self, user_id: int, session: CartSession) -> int:
+        if self.flush_interval <= 0:
+            await self.flush([user_id])
+        return session.count
+
+    async def create_order(self, user_id: int, payment_method: str, language: str = "en") -> dict:
+        """
+        Checkout: flushes the user's cart, then runs Repository.create_order() on it.
+        Raises (without creating the order) if the flush fails. Until the order is created,
+        changes made meanwhile are not flushed, so they cannot reach user_cart before the
+        order clears it; they stay in the session and are flushed afterwards.
+        """
+        await self.flush([user_id])
+        self._checkouts.add(user_id)
+        try:
+            order = await repository.create_order(user_id, payment_method, language)
+        finally:
+            self._checkouts.discard(user_id)
+        session = self._sessions.get(user_id)
+        if session is not None:
+            # The order took every flushed line; lines changed meanwhile stay for the next flush
+            session.lines = {key: quantity for key, quantity in session.lines.items() if key in session.dirty}
+            if session.dirty and self.flush_interval <= 0:
+                try:
+                    await self.flush([user_id])
+                except Exception as e:
+                    logger.error(f"Error flushing cart of user {user_id} after checkout: {e}")
+        return order
+
+    # Flushing
+
+    async def flush(self, user_ids: Optional[Iterable[int]] = None) -> int:
+        """
+        Writes the changed lines of the given users' sessions (all sessions by default) in
+        batches, skipping carts being checked out. Flushes run one at a time, so once this returns
+        every change made before the call is in user_cart. A line the database refuses (e.g. a
+        deleted product) is logged and dropped; other batches are written regardless. Raises
+        after the last batch if a write failed otherwise; unwritten lines stay marked.
+        Returns the number of lines written.
+        """
+        async with self._flush_lock:
+            if user_ids is None:
+                user_ids = list(self._sessions)
+            sessions = [(user_id, self._sessions[user_id]) for user_id in user_ids
+                        if user_id in self._sessions and user_id not in self._checkouts]
+            pending: List[Tuple[CartSession, CartKey, dict]] = []
+            for user_id, session in sessions:
+                dirty, session.dirty = session.dirty, set()
+                pending.extend((session, key, {
+                    "user_id": user_id, "product_id": key[0], "location_id": key[1],
+                    "quantity": session.lines.get(key, 0),
+                }) for key in dirty)
+
+            written = 0
+            error: Optional[Exception] = None
+            for start in range(0, len(pending), FLUSH_BATCH_SIZE):
+                batch = pending[start:start + FLUSH_BATCH_SIZE]
+                try:
+                    written += await self._save(batch)
+                except Exception as e:
+                    CART_FLUSHES.labels("error").inc()
+                    for session, key, _ in batch:
+                        session.dirty.add(key)
+                    error = error or e
+            if error is not None:
+                raise error
+            return written
+
+    async def _save(self, batch: List[Tuple[CartSession, CartKey, dict]]) -> int:
+        """Writes one batch; a batch the database refuses is split to isolate the bad lines, which are dropped."""
+        try:
+            await repository.save_cart_lines([line for _, _, line in batch])
+        except APIError as e:
+            # A constraint violation (e.g. a deleted product or location) fails the whole request
+            if len(batch) > 1:
+                middle = len(batch) // 2
+                return await self._save(batch[:middle]) + await self._save(batch[middle:])
+            session, key, line = batch[0]
+            logger.error(f"Dropping cart line {line} refused by the database: {e.message or e}")
+            CART_DROPPED_LINES.inc()
+            if key not in session.dirty: # Unless changed meanwhile, the line is gone from the cart too
+                session.lines.pop(key, None)
+            return 0
+        CART_FLUSHES.labels("ok").inc()
+        CART_FLUSHED_LINES.inc(len(batch))
+        return len(batch)
+
+    def _evict_idle(self):
+        cutoff = time.monotonic() - self.session_ttl
+        for user_id in [user_id for user_id, session in self._sessions.items()
+                        if not session.dirty and session.touched_at < cutoff]:
+            del self._sessions[user_id]
+
+    async def start(self):
+        """Starts the flush loop. Registered as a dispatcher startup hook."""
+        if repository and self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Stops the flush loop and flushes every remaining change. Registered as a dispatcher shutdown hook."""
+        if self._flush_task:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        try:
+            written = await self.flush()
+        except Exception as e:
+            logger.error(f"Error flushing carts on shutdown: {e}")
+            return
+        if written:
+            logger.info(f"Flushed {written} cart lines on shutdown.")
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval if self.flush_interval > 0 else EVICT_INTERVAL)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing carts: {e}")
+            self._evict_idle()
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self._sessions),
+            "dirty_lines": sum(len(session.dirty) for session in self._sessions.values()),
+        }
+
+
+cart_store = CartStore()
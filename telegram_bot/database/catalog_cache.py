@@ -0,0 +1,360 @@
+import asyncio
+import bisect
+import os
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from database.backend import repository
+except ImportError:
+    repository = None
+
+try:
+    from config import CATALOG_REFRESH_INTERVAL, CATALOG_STOCK_TTL
+except ImportError:
+    CATALOG_REFRESH_INTERVAL = float(os.getenv("CATALOG_REFRESH_INTERVAL", "60"))
+    CATALOG_STOCK_TTL = float(os.getenv("CATALOG_STOCK_TTL", "30"))
+
+from database.repository import CURSOR_LOOKBACK, sync_from
+from utils.localization import SUPPORTED_LANGUAGES
+from utils.search_index import SearchIndex
+
+# Tables embedded in the snapshot's products, polled for changes alongside products: name -> key columns
+EMBEDDED_TABLES: Dict[str, Tuple[str, ...]] = {
+    "product_localization": ("product_id", "language_code"),
+    "manufacturers": ("id",),
+    "categories": ("id",),
+}
+
+
+class CatalogSnapshot:
+    """Indexed, read-only view of one language's catalog."""
+
+    def __init__(self, language: str, categories: list, products: list):
+        self.language = language
+        self.categories = categories
+        self.products: Dict[int, dict] = {}
+        self.products_by_category: Dict[int, List[int]] = {}
+        self.products_by_manufacturer: Dict[int, List[int]] = {}
+        self.manufacturers: Dict[int, dict] = {}
+        self.search_index = SearchIndex() # Names, descriptions and manufacturers of this language
+        self.cursor: Optional[str] = None # Highest products.updated_at seen
+        self.cursors: Dict[str, Optional[str]] = dict.fromkeys(EMBEDDED_TABLES) # Same, per embedded table
+        self.loaded_at = time.monotonic()
+        self.merge(products)
+
+    def merge(self, products: list):
+        """Inserts or replaces products and rebuilds the secondary indexes."""
+        for product in products:
+            self.products[product["id"]] = product
+            self.search_index.add_product(product)
+            updated_at = product.get("updated_at")
+            if updated_at and (self.cursor is None or updated_at > self.cursor):
+                self.cursor = updated_at
+        self._reindex()
+
+    def patch(self, changes: Dict[str, list]) -> Tuple[list, List[int]]:
+        """
+        Applies changed rows of the embedded tables ({table: rows}) to the products embedding
+        them (the category list itself is refetched localized by refresh()). Returns the
+        affected products rebuilt with the new rows (to merge()), and the ids of products
+        newly localized into this language, which the snapshot does not have yet.
+        """
+        patched: Dict[int, dict] = {}
+        missing: List[int] = []
+
+        def embed(product_id: int, field: str, value: dict):
+            patched[product_id] = {**patched.get(product_id, self.products[product_id]), field: value}
+
+        for row in changes.get("product_localization", ()):
+            if row["language_code"] != self.language:
+                continue
+            if row["product_id"] in self.products:
+                embed(row["product_id"], "product_localization", {"name": row["name"], "description": row["description"]})
+            else:
+                missing.append(row["product_id"])
+        for row in changes.get("manufacturers", ()):
+            for product_id in self.products_by_manufacturer.get(row["id"], ()):
+                embed(product_id, "manufacturers", {"id": row["id"], "name": row["name"]})
+        for row in changes.get("categories", ()):
+            for product_id in self.products_by_category.get(row["id"], ()):
+                embed(product_id, "categories", {"id": row["id"], "name": row["name"]})
+        return list(patched.values()), missing
+
+    def advance(self, changes: Dict[str, list]):
+        """Moves the embedded tables' cursors past the given rows, once they are applied."""
+        for table, rows in changes.items():
+            for row in rows:
+                updated_at = row.get("updated_at")
+                if updated_at and (self.cursors[table] is None or updated_at > self.cursors[table]):
+                    self.cursors[table] = updated_at
+
+    def _reindex(self):
+        by_category: Dict[int, List[int]] = {}
+        by_manufacturer: Dict[int, List[int]] = {}
+        manufacturers: Dict[int, dict] = {}
+        for product_id in sorted(self.products):
+            product = self.products[product_id]
+            category_id = product.get("category_id") or (product.get("categories") or {}).get("id")
+            if category_id is not None:
+                by_category.setdefault(category_id, []).append(product_id)
+            manufacturer = product.get("manufacturers") or {}
+            manufacturer_id = product.get("manufacturer_id") or manufacturer.get("id")
+            if manufacturer_id is not None:
+                by_manufacturer.setdefault(manufacturer_id, []).append(product_id)
+                manufacturers.setdefault(manufacturer_id, manufacturer)
+        self.products_by_category = by_category
+        self.products_by_manufacturer = by_manufacturer
+        self.manufacturers = manufacturers
+
+    def get_products_page(self, category_id: int, page: int, items_per_page: int,
+                          after_id: Optional[int] = None) -> Tuple[list, int]:
+        ids = self.products_by_category.get(category_id, [])
+        if after_id is not None:
+            start = bisect.bisect_right(ids, after_id)
+        else:
+            start = max(page, 0) * items_per_page
+        return [self.products[product_id] for product_id in ids[start:start + items_per_page]], len(ids)
+
+
+class CatalogCache:
+    """
+    Per-language catalog snapshots in front of the configured repository (database/backend.py).
+
+    Categories (with counts), products, manufacturers and product localizations are
+    loaded once per language and served from memory. Changes are picked up by polling the
+    updated_at of products and of the tables embedded in them (EMBEDDED_TABLES) every
+    `refresh_interval` seconds (only changed rows are fetched; like the SQLite replica, recent
+    cursors re-read CURSOR_LOOKBACK so late commits are not skipped), or immediately through
+    `notify_catalog_changed()` (e.g. from an admin action).
+    Deleted products are only noticed by a full reload, which notify_catalog_changed() does.
+    Reads for a language without a snapshot fall through to the repository.
+
+    Locations are kept alongside, and each product's per-location stock is cached for
+    `stock_ttl` seconds (prefetched for the hot products by the startup warm-up, utils/warmup.py).
+    """
+
+    def __init__(self, languages=SUPPORTED_LANGUAGES, refresh_interval: float = CATALOG_REFRESH_INTERVAL,
+                 stock_ttl: float = CATALOG_STOCK_TTL):
+        self.languages = tuple(languages)
+        self.refresh_interval = refresh_interval
+        self.stock_ttl = stock_ttl
+        self.hits = 0
+        self.misses = 0
+        self.locations: Dict[int, dict] = {} # {location_id: {"id", "name"}}, the shape stock rows embed
+        self._snapshots: Dict[str, CatalogSnapshot] = {}
+        self._stock: Dict[int, Tuple[float, list]] = {} # product_id -> (fetched at, stock_info)
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    def snapshot(self, language: str) -> Optional[CatalogSnapshot]:
+        return self._snapshots.get(language)
+
+    async def load(self, language: str) -> bool:
+        """Full (re)load of one language's snapshot."""
+        if not repository:
+            return False
+        lock = self._locks.setdefault(language, asyncio.Lock())
+        async with lock:
+            # Embedded tables are polled from here on; the lookback covers clock skew and commits in flight
+            since = (datetime.now(timezone.utc) - CURSOR_LOOKBACK).isoformat()
+            try:
+                categories, products = await asyncio.gather(
+                    repository.get_categories_with_count(language),
+                    repository.get_catalog_products(language),
+                )
+            except Exception as e:
+                print(f"Error loading catalog snapshot for lang '{language}': {e}")
+                return False
+            snapshot = CatalogSnapshot(language, categories or [], products or [])
+            snapshot.cursors = dict.fromkeys(EMBEDDED_TABLES, since)
+            self._snapshots[language] = snapshot
+            return True
+
+    async def refresh(self, language: str) -> bool:
+        """
+        Incremental refresh: merges products updated since the snapshot's cursor, then patches
+        in the embedded rows (localizations, manufacturers, categories) updated since theirs.
+        """
+        snapshot = self._snapshots.get(language)
+        if snapshot is None or snapshot.cursor is None:
+            return await self.load(language)
+        try:
+            changed, *embedded = await asyncio.gather(
+                repository.get_catalog_products(language, updated_since=sync_from(snapshot.cursor)),
+                *(repository.get_rows_updated_since(table, keys, sync_from(snapshot.cursors[table]))
+                  for table, keys in EMBEDDED_TABLES.items()),
+            )
+            changes = dict(zip(EMBEDDED_TABLES, embedded))
+            if changed or any(changes.values()):
+                # Counts per category may have moved; the RPC is a single cheap call.
+                snapshot.categories = await repository.get_categories_with_count(language) or []
+            if changed:
+                snapshot.merge(changed)
+            patched, missing = snapshot.patch(changes)
+            if missing:
+                added = await asyncio.gather(*(repository.get_product_details(product_id, language)
+                                               for product_id in missing))
+                patched.extend(product for product in added if product)
+            if patched:
+                snapshot.merge(patched)
+            snapshot.advance(changes)
+            return True
+        except Exception as e:
+            print(f"Error refreshing catalog snapshot for lang '{language}': {e}")
+            return False
+
+    async def load_locations(self) -> bool:
+        if not repository:
+            return False
+        try:
+            rows = await repository.get_locations()
+        except Exception as e:
+            print(f"Error loading locations: {e}")
+            return False
+        self.locations = {row["id"]: {"id": row["id"], "name": row.get("name")} for row in rows or []}
+        return True
+
+    async def prefetch_stock(self, product_ids: list) -> int:
+        """
+        Caches the stock of several products with one query (locations joined from `locations`).
+        Products with a location not loaded yet are left to be fetched on demand. Returns the number cached.
+        """
+        if not repository or self.stock_ttl <= 0 or not product_ids:
+            return 0
+        rows = await repository.get_stock_for_products(product_ids)
+        fetched_at = time.monotonic()
+        stock: Dict[int, list] = {product_id: [] for product_id in product_ids}
+        for row in rows or []:
+            location = self.locations.get(row["location_id"])
+            if location is None:
+                stock.pop(row["product_id"], None)
+            elif row["product_id"] in stock:
+                stock[row["product_id"]].append({"quantity": row["quantity"], "locations": location})
+        for product_id, stock_info in stock.items():
+            self._stock[product_id] = (fetched_at, stock_info)
+        return len(stock)
+
+    async def notify_catalog_changed(self, language: Optional[str] = None):
+        """Explicit invalidation hook: fully reloads one language, or all of them (and the locations)."""
+        languages = (language,) if language else self.languages
+        self._stock = {}
+        loads = [self.load(lang) for lang in languages]
+        if not language:
+            loads.append(self.load_locations())
+        await asyncio.gather(*loads)
+
+    async def start(self):
+        """
+        Initial load of all languages (unless the startup warm-up already did it) plus the
+        polling loop. Registered as a dispatcher startup hook.
+        """
+        if not self._snapshots:
+            await self.notify_catalog_changed()
+        if self.refresh_interval > 0 and self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._refresh_task:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            for language in self.languages:
+                await self.refresh(language)
+            await self.load_locations()
+
+    def _lookup(self, language: str) -> Optional[CatalogSnapshot]:
+        snapshot = self._snapshots.get(language)
+        if snapshot is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return snapshot
+
+    def _lookup_product(self, product_id: int, language: str) -> Optional[dict]:
+        snapshot = self._snapshots.get(language)
+        # A product missing from a loaded snapshot may have been added after the last poll.
+        product = snapshot.products.get(product_id) if snapshot is not None else None
+        if product is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return product
+
+    # Read API: same signatures and return shapes as the Repository methods it replaces.
+
+    async def get_categories_with_count(self, language: str = "en") -> list:
+        snapshot = self._lookup(language)
+        if snapshot is not None:
+            return snapshot.categories
+        return await repository.get_categories_with_count(language)
+
+    async def get_products_page(self, category_id: int, language: str = "en", page: int = 0,
+                                items_per_page: int = 5, after_id: Optional[int] = None) -> Tuple[list, int]:
+        snapshot = self._lookup(language)
+        if snapshot is not None:
+            return snapshot.get_products_page(category_id, page, items_per_page, after_id)
+        return await repository.get_products_page(category_id, language, page, items_per_page, after_id)
+
+    async def get_product_details(self, product_id: int, language: str = "en") -> Optional[dict]:
+        product = self._lookup_product(product_id, language)
+        if product is not None:
+            return product
+        return await repository.get_product_details(product_id, language)
+
+    async def get_product_with_stock(self, product_id: int, language: str = "en") -> Tuple[Optional[dict], list]:
+        """
+        Product details plus per-location stock in at most one DB round-trip: the stock query
+        (unless cached) when the product is in the snapshot, otherwise one embedded select.
+        """
+        product = self._lookup_product(product_id, language)
+        if product is not None:
+            cached = self._stock.get(product_id)
+            if cached is not None and time.monotonic() - cached[0] < self.stock_ttl:
+                return product, cached[1]
+            stock_info = await repository.get_product_stock_all_locations(product_id)
+            if self.stock_ttl > 0:
+                self._stock[product_id] = (time.monotonic(), stock_info)
+            return product, stock_info
+        return await repository.get_product_with_stock(product_id, language)
+
+    async def search_products(self, query: str, language: str = "en", limit: int = 20) -> list:
+        """
+        Ranked products matching a free-text query (names, descriptions, manufacturers; typo tolerant).
+        Pass the query as typed: the search index normalizes it, the repository fallback matches it with ilike.
+        """
+        snapshot = self._lookup(language)
+        if snapshot is not None:
+            return [snapshot.products[product_id] for product_id in snapshot.search_index.search(query, limit)]
+        products = await repository.get_products_with_filters(search_query=query, language=language)
+        return products[:limit]
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "locations": len(self.locations),
+            "stock_cached": len(self._stock),
+            "languages": {
+                language: {
+                    "products": len(snapshot.products),
+                    "categories": len(snapshot.categories),
+                    "cursor": snapshot.cursor,
+                    "age_seconds": round(time.monotonic() - snapshot.loaded_at, 1),
+                }
+                for language, snapshot in self._snapshots.items()
+            },
+        }
+
+
+catalog_cache = CatalogCache()
@@ -0,0 +1,381 @@
+"""
+Streaming import of warehouse files into product_stock, products and product_localization.
+
+Run from the telegram_bot/ directory (admins can also upload a file with the caption
+`/import <table>` in the bot, see handlers/admin.py):
+
+    python -m database.catalog_import stock.csv --table product_stock --batch-size 1000 --concurrency 4
+
+Files are CSV (with a header row) or JSONL, read batch by batch, so memory use is bounded
+by a few batches per worker whatever the file size. Valid rows are routed to one of
+`concurrency` workers by key, so the last line of a key in the file wins. Each worker's
+batch is diffed against the current rows and only new or changed rows are written, with one
+upsert per column set. Invalid rows and rows the database refuses are written to a
+reject file (JSONL: line, error, row) instead of failing the import.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from itertools import islice
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from postgrest.exceptions import APIError
+
+try:
+    from config import IMPORT_BATCH_SIZE, IMPORT_CONCURRENCY
+except ImportError:
+    IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+    IMPORT_CONCURRENCY = int(os.getenv("IMPORT_CONCURRENCY", "4"))
+
+from utils.localization import SUPPORTED_LANGUAGES
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_INTERVAL = 5.0 # Seconds between progress log lines
+
+
+def _int(value) -> int:
+    if isinstance(value, str):
+        value = value.strip()
+    number = float(value)
+    if not number.is_integer():
+        raise ValueError(f"{value!r} is not an integer")
+    return int(number)
+
+
+def _float(value) -> float:
+    return float(value.strip() if isinstance(value, str) else value)
+
+
+def _str(value) -> str:
+    return str(value).strip()
+
+
+class ImportSpec:
+    """How rows of one table are validated: key columns, column types, and what a new row needs."""
+
+    def __init__(self, keys: Tuple[str, ...], columns: Dict[str, Callable], required_new: Tuple[str, ...] = (),
+                 check: Optional[Callable[[dict], None]] = None):
+        self.keys = keys
+        self.columns = columns # column -> converter (raises ValueError on bad input)
+        self.required_new = required_new # Columns a row must have when its key does not exist yet
+        self.check = check # Extra row checks, raise ValueError
+
+
+def _check_stock(row: dict):
+    if row.get("quantity") is not None and row["quantity"] < 0:
+        raise ValueError("quantity must not be negative")
+
+
+def _check_product(row: dict):
+    if row.get("price") is not None and row["price"] < 0:
+        raise ValueError("price must not be negative")
+
+
+def _check_localization(row: dict):
+    if row["language_code"] not in SUPPORTED_LANGUAGES:
+        raise ValueError(f"unsupported language_code {row['language_code']!r}")
+
+
+# Upserts need a unique index on each table's key columns (database/sql/catalog_import.sql)
+IMPORT_TABLES: Dict[str, ImportSpec] = {
+    "product_stock": ImportSpec(
+        ("product_id", "location_id"),
+        {"product_id": _int, "location_id": _int, "quantity": _int},
+        required_new=("quantity",), check=_check_stock,
+    ),
+    "products": ImportSpec(
+        ("id",),
+        {"id": _int, "name": _str, "price": _float, "image_url": _str, "variation": _str,
+         "category_id": _int, "manufacturer_id": _int},
+        required_new=("name", "price", "category_id"), check=_check_product,
+    ),
+    "product_localization": ImportSpec(
+        ("product_id", "language_code"),
+        {"product_id": _int, "language_code": _str, "name": _str, "description": _str},
+        required_new=("name",), check=_check_localization,
+    ),
+}
+
+
+def detect_format(path: str) -> str:
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".jsonl", ".ndjson", ".json"):
+        return "jsonl"
+    return "csv"
+
+
+def read_rows(path: str, file_format: str) -> Iterator[Tuple[int, object]]:
+    """Yields (line number, row dict) lazily; a line that cannot be parsed yields its ValueError."""
+    if file_format == "csv":
+        import csv
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+    else:
+        with open(path, encoding="utf-8-sig") as f:
+            for line_number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                    if not isinstance(row, dict):
+                        raise ValueError("line is not a JSON object")
+                except ValueError as e:
+                    yield line_number, ValueError(f"invalid JSON: {e}")
+                else:
+                    yield line_number, row
+
+
+class ImportStats:
+    def __init__(self):
+        self.read = 0
+        self.rejected = 0
+        self.unchanged = 0
+        self.inserted = 0
+        self.updated = 0
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.read / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "read": self.read,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "unchanged": self.unchanged,
+            "rejected": self.rejected,
+            "seconds": round(self.elapsed, 2),
+            "rows_per_second": round(self.rows_per_second, 1),
+        }
+
+    def summary(self) -> str:
+        return (f"{self.read} rows in {self.elapsed:.1f}s ({self.rows_per_second:.0f} rows/s): "
+                f"{self.inserted} inserted, {self.updated} updated, {self.unchanged} unchanged, {self.rejected} rejected")
+
+
+class CatalogImporter:
+    """
+    Imports one file into `table` (a key of IMPORT_TABLES) through `repository`, which
+    defaults to the SupabaseClient (the diff must see the authoritative rows, not a replica).
+    Up to `concurrency` batches of `batch_size` rows are in flight at once, one per key shard. With `dry_run`,
+    changes are counted but not written.
+    """
+
+    def __init__(self, table: str, repository=None, batch_size: int = IMPORT_BATCH_SIZE,
+                 concurrency: int = IMPORT_CONCURRENCY, dry_run: bool = False):
+        if table not in IMPORT_TABLES:
+            raise ValueError(f"Unknown import table {table!r}; expected one of {', '.join(IMPORT_TABLES)}.")
+        if repository is None:
+            from database.supabase_client import supabase_client as repository
+        self.table = table
+        self.spec = IMPORT_TABLES[table]
+        self.repository = repository
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.dry_run = dry_run
+        self.stats = ImportStats()
+        self._rejects = None
+
+    async def run(self, path: str, rejects_path: Optional[str] = None, file_format: Optional[str] = None) -> ImportStats:
+        """Imports the file at `path`; rejected rows go to `rejects_path` (default `<path>.rejects.jsonl`)."""
+        self.stats = ImportStats()
+        rows = read_rows(path, file_format or detect_format(path))
+        loop = asyncio.get_running_loop()
+        # Valid rows are routed to a worker by key, so every row of a key is written by the same
+        # worker, in file order: a later line always wins, even across batches
+        queues = [asyncio.Queue(maxsize=1) for _ in range(self.concurrency)]
+        pending: List[Dict[tuple, Tuple[int, dict]]] = [{} for _ in range(self.concurrency)]
+        workers = [asyncio.create_task(self._worker(queue)) for queue in queues]
+        last_progress = time.perf_counter()
+        self._rejects = open(rejects_path or f"{path}.rejects.jsonl", "w", encoding="utf-8")
+        try:
+            while True:
+                # File reading and parsing happen off the event loop
+                lines = await loop.run_in_executor(None, lambda: list(islice(rows, self.batch_size)))
+                if not lines:
+                    break
+                self.stats.read += len(lines)
+                for key, line, row in self._validate_lines(lines):
+                    index = hash(key) % self.concurrency
+                    batch = pending[index]
+                    if key in batch:
+                        self.stats.unchanged += 1 # Superseded by a later line
+                    batch[key] = (line, row)
+                    if len(batch) >= self.batch_size:
+                        pending[index] = {}
+                        await queues[index].put(batch) # Waits while that worker is busy
+                if time.perf_counter() - last_progress >= PROGRESS_INTERVAL:
+                    last_progress = time.perf_counter()
+                    logger.info(f"Import into {self.table}: {self.stats.summary()}")
+            for index, batch in enumerate(pending):
+                if batch:
+                    await queues[index].put(batch)
+            for queue in queues:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+            self._rejects.close()
+            self.stats.finished = time.perf_counter()
+        logger.info(f"Import into {self.table} finished: {self.stats.summary()}")
+        return self.stats
+
+    def _reject(self, line: int, error: str, row):
+        self.stats.rejected += 1
+        self._rejects.write(json.dumps({"line": line, "error": error, "row": row}, ensure_ascii=False, default=str) + "\n")
+
+    def validate(self, raw: dict) -> dict:
+        """The row with known columns converted to their types (empty values are NULL); raises ValueError."""
+        row = {}
+        for column, convert in self.spec.columns.items():
+            if column not in raw:
+                continue
+            value = raw[column]
+            if value is None or (isinstance(value, str) and not value.strip()):
+                row[column] = None
+                continue
+            try:
+                row[column] = convert(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"invalid {column}: {value!r}")
+        for column in self.spec.keys:
+            if row.get(column) is None:
+                raise ValueError(f"missing {column}")
+        for column in self.spec.required_new:
+            if column in row and row[column] is None:
+                raise ValueError(f"{column} must not be empty")
+        if len(row) == len(self.spec.keys):
+            raise ValueError("no columns to update")
+        if self.spec.check:
+            self.spec.check(row)
+        return row
+
+    def _validate_lines(self, lines: List[Tuple[int, object]]) -> Iterator[Tuple[tuple, int, dict]]:
+        """Yields (key, line, row) for the valid lines; invalid ones are rejected."""
+        for line, raw in lines:
+            if isinstance(raw, Exception):
+                self._reject(line, str(raw), None)
+                continue
+            try:
+                row = self.validate(raw)
+            except ValueError as e:
+                self._reject(line, str(e), raw)
+                continue
+            yield tuple(row[column] for column in self.spec.keys), line, row
+
+    async def _worker(self, queue: asyncio.Queue):
+        """Processes one key shard's batches one after another, until it gets None."""
+        while True:
+            batch = await queue.get()
+            if batch is None:
+                return
+            try:
+                await self._process(batch)
+            except Exception as e:
+                logger.error(f"Error importing a batch into {self.table}: {e!r}")
+                for line, row in batch.values():
+                    self._reject(line, f"import failed: {e!r}", row)
+
+    async def _process(self, valid: Dict[tuple, Tuple[int, dict]]):
+        """Diffs one batch of validated rows (at most one per key) against the current rows and writes the changes."""
+        try:
+            current_rows = await self.repository.get_rows_by_keys(self.table, self.spec.keys, list(valid))
+        except Exception as e:
+            for line, row in valid.values():
+                self._reject(line, f"could not read current rows: {e!r}", row)
+            return
+        current = {tuple(row[column] for column in self.spec.keys): row for row in current_rows}
+
+        # Upserts need the same columns in every row of a request, so changes are grouped by column set
+        groups: Dict[Tuple[str, ...], List[Tuple[int, dict, bool]]] = {}
+        for key, (line, row) in valid.items():
+            existing = current.get(key)
+            if existing is None:
+                missing = [column for column in self.spec.required_new if row.get(column) is None]
+                if missing:
+                    self._reject(line, f"new row needs {', '.join(missing)}", row)
+                    continue
+            elif all(self._same(column, existing.get(column), value) for column, value in row.items()):
+                self.stats.unchanged += 1
+                continue
+            groups.setdefault(tuple(sorted(row)), []).append((line, row, existing is None))
+
+        for changes in groups.values():
+            await self._apply(changes)
+
+    def _same(self, column: str, current, new) -> bool:
+        if current is None or new is None:
+            return current is new
+        try:
+            return self.spec.columns[column](current) == new
+        except (TypeError, ValueError):
+            return False
+
+    async def _apply(self, changes: List[Tuple[int, dict, bool]], retried: bool = False):
+        """Upserts `changes` in one request; a batch the database refuses is split to isolate the bad rows."""
+        if not self.dry_run:
+            try:
+                await self.repository.upsert_rows(self.table, [row for _, row, _ in changes], self.spec.keys)
+            except APIError as e:
+                # A constraint violation (e.g. unknown product_id) fails the whole request
+                if len(changes) == 1:
+                    line, row, _ = changes[0]
+                    self._reject(line, e.message or str(e), row)
+                    return
+                middle = len(changes) // 2
+                await self._apply(changes[:middle])
+                await self._apply(changes[middle:])
+                return
+            except Exception as e:
+                if not retried: # Timeout or network error: retry the batch once
+                    await self._apply(changes, retried=True)
+                    return
+                for line, row, _ in changes:
+                    self._reject(line, f"write failed: {e!r}", row)
+                return
+        for _, _, is_new in changes:
+            if is_new:
+                self.stats.inserted += 1
+            else:
+                self.stats.updated += 1
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Stream a CSV/JSONL file into a catalog table.")
+    parser.add_argument("path", help="CSV (with header) or JSONL file")
+    parser.add_argument("--table", required=True, choices=sorted(IMPORT_TABLES))
+    parser.add_argument("--format", choices=("csv", "jsonl"), help="Default: from the file extension")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE, help="Rows per select/upsert")
+    parser.add_argument("--concurrency", type=int, default=IMPORT_CONCURRENCY, help="Batches in flight")
+    parser.add_argument("--rejects", help="Reject file (default: <path>.rejects.jsonl)")
+    parser.add_argument("--dry-run", action="store_true", help="Validate and diff only, write nothing")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(name)s - %(message)s")
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    importer = CatalogImporter(args.table, batch_size=args.batch_size, concurrency=args.concurrency,
+                               dry_run=args.dry_run)
+    stats = asyncio.run(importer.run(args.path, args.rejects, args.format))
+    print(json.dumps(stats.as_dict()))
+    return 1 if stats.rejected else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
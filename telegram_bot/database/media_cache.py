@@ -0,0 +1,81 @@
+import asyncio
+from typing import Dict, Optional, Set, Tuple, Union
+
+from aiogram.types import Message
+
+try:
+    from database.supabase_client import supabase_client
+except ImportError:
+    supabase_client = None
+
+
+class MediaCache:
+    """
+    Remembers the Telegram file_id of each product image so later sends reuse the file
+    Telegram already has instead of making it download `image_url` again.
+
+    Entries live in memory ({product_id: (image_url, file_id)}) and are persisted to the
+    product_media table (database/sql/product_media.sql). An entry is only used while its
+    image_url matches the product's current one; otherwise the URL is sent and the entry
+    is replaced with the new file_id.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[int, Tuple[str, str]] = {}
+        self._pending: Set[asyncio.Task] = set()
+
+    async def load(self):
+        """Loads all persisted file_ids. Registered as a dispatcher startup hook."""
+        if not supabase_client:
+            return
+        try:
+            rows = await supabase_client.get_product_media()
+        except Exception as e:
+            print(f"Error loading product media cache: {e}")
+            return
+        self._entries = {row["product_id"]: (row["image_url"], row["file_id"]) for row in rows or []}
+
+    def get_file_id(self, product_id: int, image_url: str) -> Optional[str]:
+        entry = self._entries.get(product_id)
+        if entry is not None and entry[0] == image_url:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        return None
+
+    def get_photo(self, product_id: int, image_url: str) -> str:
+        """What to pass as `photo`/`media`: the cached file_id if still valid, else the URL."""
+        return self.get_file_id(product_id, image_url) or image_url
+
+    def remember(self, product_id: int, image_url: str, sent: Union[Message, bool, None]):
+        """Records the file_id from a message we just sent, persisting it in the background."""
+        if not isinstance(sent, Message) or not sent.photo:
+            return
+        file_id = sent.photo[-1].file_id # Largest size
+        if self._entries.get(product_id) == (image_url, file_id):
+            return
+        self._entries[product_id] = (image_url, file_id)
+        if supabase_client:
+            task = asyncio.create_task(self._persist(product_id, image_url, file_id))
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+
+    def forget(self, product_id: int):
+        """Drops an entry whose file_id Telegram rejected."""
+        self._entries.pop(product_id, None)
+
+    async def _persist(self, product_id: int, image_url: str, file_id: str):
+        try:
+            await supabase_client.upsert_product_media(product_id, image_url, file_id)
+        except Exception as e:
+            print(f"Error saving file_id for product {product_id}: {e}")
+
+    async def stop(self):
+        """Waits for pending writes. Registered as a dispatcher shutdown hook."""
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+
+
+media_cache = MediaCache()
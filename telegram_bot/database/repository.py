@@ -0,0 +1,159 @@
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+# Transactions commit slightly out of updated_at order, so while a cursor is recent each
+# incremental sync (SQLite replica, catalog cache) re-reads CURSOR_LOOKBACK before it.
+# Cursors older than CURSOR_SETTLE are taken as final and read strictly after.
+CURSOR_LOOKBACK = timedelta(seconds=5)
+CURSOR_SETTLE = timedelta(minutes=1)
+
+
+def sync_from(cursor: Optional[str]) -> Optional[str]:
+    """The updated_at to sync strictly after, for a table whose newest synced row is `cursor`."""
+    if not cursor:
+        return None
+    try:
+        updated_at = datetime.fromisoformat(cursor.replace("Z", "+00:00"))
+    except ValueError:
+        return cursor
+    if updated_at.tzinfo is None:
+        updated_at = updated_at.replace(tzinfo=timezone.utc)
+    if datetime.now(timezone.utc) - updated_at > CURSOR_SETTLE:
+        return cursor
+    return (updated_at - CURSOR_LOOKBACK).isoformat()
+
+
+class Repository(ABC):
+    """
+    Data access used by the bot. SupabaseClient is the reference implementation;
+    ReplicaRepository (database/sqlite_replica.py) serves the catalog reads from a local
+    SQLite replica and delegates everything else to Supabase.
+    Return shapes follow the PostgREST responses (embedded relations as nested dicts).
+    """
+
+    async def start(self):
+        """Called on dispatcher startup."""
+
+    async def stop(self):
+        """Called on dispatcher shutdown."""
+
+    # Users
+
+    @abstractmethod
+    async def get_user(self, telegram_id: int) -> Optional[dict]: ...
+
+    @abstractmethod
+    async def create_user(self, telegram_id: int, language_code: str = "en") -> dict: ...
+
+    @abstractmethod
+    async def update_user_language(self, telegram_id: int, language_code: str) -> Optional[dict]: ...
+
+    # Catalog (read-mostly)
+
+    @abstractmethod
+    async def get_categories_with_count(self, language: str = "en"): ...
+
+    @abstractmethod
+    async def get_products_by_category(self, category_id: int, language: str = "en") -> list: ...
+
+    @abstractmethod
+    async def get_products_page(self, category_id: int, language: str = "en", page: int = 0,
+                                items_per_page: int = 5, after_id: Optional[int] = None,
+                                count: str = "exact") -> Tuple[list, int]: ...
+
+    @abstractmethod
+    async def get_product_details(self, product_id: int, language: str = "en") -> Optional[dict]: ...
+
+    @abstractmethod
+    async def get_product_with_stock(self, product_id: int, language: str = "en") -> Tuple[Optional[dict], list]: ...
+
+    @abstractmethod
+    async def get_product_stock(self, product_id: int, location_id: int) -> int: ...
+
+    @abstractmethod
+    async def get_product_stock_all_locations(self, product_id: int) -> list: ...
+
+    @abstractmethod
+    async def get_stock_for_products(self, product_ids: list) -> list: ...
+
+    @abstractmethod
+    async def get_locations(self) -> list: ...
+
+    @abstractmethod
+    async def get_hot_product_ids(self, limit: int, sample: int = 2000) -> list: ...
+
+    @abstractmethod
+    async def get_products_with_filters(self, category_id: int = None, manufacturer_id: int = None,
+                                        search_query: str = None, language: str = "en"): ...
+
+    @abstractmethod
+    async def get_catalog_products(self, language: str = "en", updated_since: Optional[str] = None,
+                                   chunk_size: int = 1000) -> list: ...
+
+    @abstractmethod
+    async def get_rows_updated_since(self, table: str, key_columns: Tuple[str, ...],
+                                     updated_since: Optional[str] = None, chunk_size: int = 1000) -> list: ...
+
+    @abstractmethod
+    async def get_rows_by_keys(self, table: str, key_columns: Tuple[str, ...], keys: list) -> list: ...
+
+    @abstractmethod
+    async def upsert_rows(self, table: str, rows: list, key_columns: Tuple[str, ...]): ...
+
+    async def catalog_changed(self):
+        """Called after bulk catalog writes (imports), so local copies can catch up at once."""
+
+    # Cart and orders
+
+    @abstractmethod
+    async def get_user_cart(self, user_id: int, language: str = "en") -> list: ...
+
+    @abstractmethod
+    async def get_cart_lines(self, user_id: int) -> list: ...
+
+    @abstractmethod
+    async def save_cart_lines(self, lines: list): ...
+
+    @abstractmethod
+    async def create_order(self, user_id: int, payment_method: str, language: str = "en") -> dict:
+        """Checks out user_cart as last flushed. Check out through cart_store.create_order(), which flushes first."""
+
+    @abstractmethod
+    async def get_user_orders(self, user_id: int, language: str = "en") -> list: ...
+
+    @abstractmethod
+    async def update_order_status(self, order_id: int, new_status: str, admin_notes: str = None): ...
+
+    @abstractmethod
+    async def update_orders_status(self, order_ids: list, new_status: str, admin_notes: str = None,
+                                   expected_status: str = None) -> list: ...
+
+    @abstractmethod
+    async def get_orders_page(self, status: str, limit: int = 10, after_id: Optional[int] = None,
+                              before_id: Optional[int] = None) -> list: ...
+
+    # Order notification outbox
+
+    @abstractmethod
+    async def claim_order_notifications(self, limit: int, lease_seconds: int) -> list: ...
+
+    @abstractmethod
+    async def update_order_notification(self, notification_id: int, values: dict): ...
+
+    # Interface texts and media
+
+    @abstractmethod
+    async def get_interface_text(self, key: str, language: str = "en") -> str: ...
+
+    @abstractmethod
+    async def get_interface_texts(self, keys: list, language: str = "en") -> dict: ...
+
+    @abstractmethod
+    async def get_all_interface_texts(self) -> list: ...
+
+    @abstractmethod
+    async def get_product_media(self) -> list: ...
+
+    @abstractmethod
+    async def upsert_product_media(self, product_id: int, image_url: str, file_id: str): ...
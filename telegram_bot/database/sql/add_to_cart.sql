@@ -0,0 +1,33 @@
+-- Unique index on cart lines, required by save_cart_lines.sql (on conflict).
+--
+-- The add_to_cart() function below is superseded: the bot now changes carts in memory
+-- (database/cart_store.py) and writes them in batches with save_cart_lines(). It no longer
+-- calls add_to_cart(), which is kept only so existing installs are unaffected.
+-- It atomically inserts a cart line or increments its quantity and returns the resulting
+-- line plus the user's total cart quantity.
+
+create unique index if not exists user_cart_line_key
+    on user_cart (user_id, product_id, location_id);
+
+create or replace function add_to_cart(p_user_id bigint, p_product_id bigint, p_location_id bigint, p_quantity integer)
+returns json
+language plpgsql
+as $$
+declare
+    v_line user_cart;
+    v_cart_count bigint;
+begin
+    insert into user_cart (user_id, product_id, location_id, quantity)
+    values (p_user_id, p_product_id, p_location_id, p_quantity)
+    on conflict (user_id, product_id, location_id)
+    do update set quantity = user_cart.quantity + excluded.quantity
+    returning * into v_line;
+
+    select coalesce(sum(quantity), 0)
+      into v_cart_count
+      from user_cart
+     where user_id = p_user_id;
+
+    return json_build_object('line', row_to_json(v_line), 'cart_count', v_cart_count);
+end;
+$$;
@@ -0,0 +1,11 @@
+-- Catalog import (database/catalog_import.py).
+--
+-- Imported rows are upserted by key (SupabaseClient.upsert_rows, on_conflict), which
+-- PostgREST can only do when a unique index covers exactly those columns. products is
+-- keyed by its primary key; the other two tables need these.
+
+create unique index if not exists product_stock_key
+    on product_stock (product_id, location_id);
+
+create unique index if not exists product_localization_key
+    on product_localization (product_id, language_code);
@@ -0,0 +1,28 @@
+-- updated_at columns on the catalog tables, kept current by a trigger.
+-- Required by the SQLite catalog replica (REPOSITORY_BACKEND=sqlite) and the in-memory
+-- catalog cache, which sync incrementally by reading rows with updated_at > their last
+-- cursor. While a cursor is recent they read from a few seconds before it instead
+-- (CURSOR_LOOKBACK in database/repository.py), so rows committed late are not skipped.
+
+create or replace function set_updated_at() returns trigger
+language plpgsql as $$
+begin
+    new.updated_at := now();
+    return new;
+end;
+$$;
+
+do $$
+declare
+    t text;
+begin
+    foreach t in array array['categories', 'manufacturers', 'locations', 'products', 'product_localization', 'product_stock']
+    loop
+        execute format('alter table %I add column if not exists updated_at timestamptz not null default now()', t);
+        execute format('create index if not exists %I on %I (updated_at)', t || '_updated_at_idx', t);
+        execute format('drop trigger if exists set_updated_at on %I', t);
+        execute format('create trigger set_updated_at before insert or update on %I '
+                       'for each row execute function set_updated_at()', t);
+    end loop;
+end;
+$$;
@@ -0,0 +1,75 @@
+-- Atomic checkout used by SupabaseClient.create_order().
+-- Computes the total, creates the order and its items, reserves stock and clears
+-- the user's cart in one transaction (one PostgREST round-trip).
+--
+-- Stock reservation: order_items.reserved_quantity holds the units an open order
+-- has reserved. Available stock for a product at a location is
+--     product_stock.quantity - sum(order_items.reserved_quantity)
+-- Releasing a reservation (e.g. when an order is rejected) sets reserved_quantity to 0.
+-- The product_stock rows are locked (in a fixed order, to avoid deadlocks) so
+-- concurrent checkouts of the same SKU are serialized and cannot oversell.
+
+create index if not exists order_items_reserved_idx
+    on order_items (product_id, location_id)
+    where reserved_quantity > 0;
+
+create or replace function create_order_from_cart(p_user_id bigint, p_payment_method text)
+returns orders
+language plpgsql
+as $$
+declare
+    v_order orders;
+    v_total numeric;
+    v_short record;
+begin
+    -- Lock the cart so a double-tapped checkout of the same cart waits for the first one
+    perform 1 from user_cart where user_id = p_user_id for update;
+    if not found then
+        raise exception 'Cart is empty';
+    end if;
+
+    perform 1
+      from product_stock ps
+      join user_cart c on c.product_id = ps.product_id and c.location_id = ps.location_id
+     where c.user_id = p_user_id
+     order by ps.product_id, ps.location_id
+       for update of ps;
+
+    select c.product_id, c.location_id
+      into v_short
+      from user_cart c
+      left join product_stock ps on ps.product_id = c.product_id and ps.location_id = c.location_id
+     where c.user_id = p_user_id
+       and coalesce(ps.quantity, 0) - coalesce((
+               select sum(oi.reserved_quantity)
+                 from order_items oi
+                where oi.product_id = c.product_id
+                  and oi.location_id = c.location_id
+                  and oi.reserved_quantity > 0
+           ), 0) < c.quantity
+     limit 1;
+    if found then
+        raise exception 'Insufficient stock for product % at location %', v_short.product_id, v_short.location_id;
+    end if;
+
+    select sum(c.quantity * p.price)
+      into v_total
+      from user_cart c
+      join products p on p.id = c.product_id
+     where c.user_id = p_user_id;
+
+    insert into orders (user_id, status, payment_method, total_amount)
+    values (p_user_id, 'pending_admin_approval', p_payment_method, v_total)
+    returning * into v_order;
+
+    insert into order_items (order_id, product_id, location_id, quantity, price_at_order, reserved_quantity)
+    select v_order.id, c.product_id, c.location_id, c.quantity, p.price, c.quantity
+      from user_cart c
+      join products p on p.id = c.product_id
+     where c.user_id = p_user_id;
+
+    delete from user_cart where user_id = p_user_id;
+
+    return v_order;
+end;
+$$;
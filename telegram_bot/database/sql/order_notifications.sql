@@ -0,0 +1,74 @@
+-- Outbox of customer notifications for order status changes, delivered by
+-- utils/notifications.py (OrderNotifier).
+--
+-- A trigger on orders enqueues one row per status transition in the same transaction
+-- as the update, so no transition is lost, whichever client made it (bot, admin panel,
+-- SQL editor). (order_id, status) is unique, so re-applying a status does not notify twice.
+-- Rows are claimed with a lease (claim_order_notifications); a claim that is not
+-- settled (process killed mid-batch) becomes due again when its lease expires.
+
+create table if not exists order_notifications (
+    id bigserial primary key,
+    order_id bigint not null references orders (id) on delete cascade,
+    user_id bigint not null,
+    status text not null,
+    state text not null default 'pending', -- pending | sent | failed
+    attempts int not null default 0,
+    next_attempt_at timestamptz not null default now(),
+    claimed_until timestamptz,
+    last_error text,
+    created_at timestamptz not null default now(),
+    sent_at timestamptz,
+    unique (order_id, status)
+);
+
+create index if not exists order_notifications_due_idx
+    on order_notifications (next_attempt_at, id)
+    where state = 'pending';
+
+create or replace function enqueue_order_notification()
+returns trigger
+language plpgsql
+as $$
+begin
+    insert into order_notifications (order_id, user_id, status)
+    values (new.id, new.user_id, new.status)
+    on conflict (order_id, status) do nothing;
+    return new;
+end;
+$$;
+
+drop trigger if exists orders_enqueue_notification on orders;
+create trigger orders_enqueue_notification
+    after update of status on orders
+    for each row
+    when (new.status is distinct from old.status)
+    execute function enqueue_order_notification();
+
+-- Leases up to p_limit due notifications for p_lease_seconds and returns them with the
+-- customer's language. Rows locked by a concurrent claim are skipped, so several bot
+-- processes never take the same notification.
+create or replace function claim_order_notifications(p_limit int, p_lease_seconds int)
+returns table (
+    id bigint, order_id bigint, user_id bigint, status text, attempts int,
+    created_at timestamptz, language_code text
+)
+language sql
+as $$
+    with due as (
+        select n.id
+          from order_notifications n
+         where n.state = 'pending'
+           and n.next_attempt_at <= now()
+           and (n.claimed_until is null or n.claimed_until < now())
+         order by n.next_attempt_at, n.id
+         limit p_limit
+           for update skip locked
+    )
+    update order_notifications n
+       set claimed_until = now() + make_interval(secs => p_lease_seconds)
+      from due
+     where n.id = due.id
+    returning n.id, n.order_id, n.user_id, n.status, n.attempts, n.created_at,
+              (select u.language_code from users u where u.telegram_id = n.user_id);
+$$;
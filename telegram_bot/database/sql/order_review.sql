@@ -0,0 +1,31 @@
+-- Admin review of orders (handlers/admin.py).
+--
+-- The pending queue is paged by keyset on id (SupabaseClient.get_orders_page), served
+-- by a partial index that only holds the orders still awaiting review.
+
+create index if not exists orders_pending_review_idx
+    on orders (id)
+    where status = 'pending_admin_approval';
+
+-- Rejected or cancelled orders give their reserved stock back (see create_order_from_cart.sql).
+-- Done by trigger so a bulk status update releases every order's reservation in the same
+-- statement, whichever client made it.
+create or replace function release_order_reservations()
+returns trigger
+language plpgsql
+as $$
+begin
+    update order_items
+       set reserved_quantity = 0
+     where order_id = new.id
+       and reserved_quantity > 0;
+    return new;
+end;
+$$;
+
+drop trigger if exists orders_release_reservations on orders;
+create trigger orders_release_reservations
+    after update of status on orders
+    for each row
+    when (new.status in ('rejected', 'cancelled') and old.status is distinct from new.status)
+    execute function release_order_reservations();
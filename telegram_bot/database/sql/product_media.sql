@@ -0,0 +1,10 @@
+-- Telegram file_id cache for product images, used by database/media_cache.py.
+-- One row per product: the image_url that was uploaded and the file_id Telegram
+-- returned for it. A row whose image_url no longer matches products.image_url is stale.
+
+create table if not exists product_media (
+    product_id bigint primary key references products (id) on delete cascade,
+    image_url text not null,
+    file_id text not null,
+    updated_at timestamptz not null default now()
+);
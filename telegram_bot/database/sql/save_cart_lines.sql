@@ -0,0 +1,32 @@
+-- Batched write-behind of cart sessions, used by SupabaseClient.save_cart_lines()
+-- (database/cart_store.py). p_lines is a JSON array of
+--     {"user_id": ..., "product_id": ..., "location_id": ..., "quantity": ...}
+-- holding the current quantity of every cart line changed since the last flush, for any
+-- number of users. Quantities are absolute (a retried flush writes the same state again);
+-- 0 removes the line. Applied in one transaction, so a flush is either fully durable or not at all.
+-- Requires the user_cart_line_key unique index from add_to_cart.sql.
+
+create or replace function save_cart_lines(p_lines jsonb)
+returns void
+language sql
+as $$
+    with lines as (
+        select *
+          from jsonb_to_recordset(p_lines)
+               as l(user_id bigint, product_id bigint, location_id bigint, quantity integer)
+    ),
+    removed as (
+        delete from user_cart c
+         using lines l
+         where l.quantity <= 0
+           and c.user_id = l.user_id
+           and c.product_id = l.product_id
+           and c.location_id = l.location_id
+    )
+    insert into user_cart (user_id, product_id, location_id, quantity)
+    select user_id, product_id, location_id, quantity
+      from lines
+     where quantity > 0
+    on conflict (user_id, product_id, location_id)
+    do update set quantity = excluded.quantity;
+$$;
@@ -0,0 +1,443 @@
+import asyncio
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from database.repository import Repository, sync_from
+
+try:
+    from config import CATALOG_REPLICA_PATH, CATALOG_REPLICA_SYNC_INTERVAL
+except ImportError:
+    CATALOG_REPLICA_PATH = os.getenv("CATALOG_REPLICA_PATH", "catalog_replica.sqlite3")
+    CATALOG_REPLICA_SYNC_INTERVAL = float(os.getenv("CATALOG_REPLICA_SYNC_INTERVAL", "30"))
+
+# Replicated tables: name -> (primary key columns, replicated columns).
+# Every table needs an updated_at column maintained by the database (database/sql/catalog_updated_at.sql).
+REPLICATED_TABLES: Dict[str, Tuple[Tuple[str, ...], Tuple[str, ...]]] = {
+    "categories": (("id",), ("id", "name", "updated_at")),
+    "manufacturers": (("id",), ("id", "name", "updated_at")),
+    "locations": (("id",), ("id", "name", "address", "updated_at")),
+    "products": (("id",), ("id", "name", "price", "image_url", "variation", "category_id",
+                           "manufacturer_id", "updated_at")),
+    "product_localization": (("product_id", "language_code"), ("product_id", "language_code", "name",
+                                                               "description", "updated_at")),
+    "product_stock": (("product_id", "location_id"), ("product_id", "location_id", "quantity", "updated_at")),
+}
+
+_PRODUCT_SELECT = (
+    "SELECT p.id, p.name, p.price, p.image_url, p.variation, p.category_id, p.manufacturer_id, p.updated_at, "
+    "m.id AS m_id, m.name AS m_name, c.id AS c_id, c.name AS c_name, l.name AS l_name, l.description AS l_description "
+    "FROM products p "
+    "JOIN product_localization l ON l.product_id = p.id AND l.language_code = ? "
+    "LEFT JOIN manufacturers m ON m.id = p.manufacturer_id "
+    "LEFT JOIN categories c ON c.id = p.category_id "
+)
+
+
+def _product(row: sqlite3.Row) -> dict:
+    """A joined product row in the shape of the PostgREST embedded select."""
+    return {
+        "id": row["id"],
+        "name": row["name"],
+        "price": row["price"],
+        "image_url": row["image_url"],
+        "variation": row["variation"],
+        "category_id": row["category_id"],
+        "manufacturer_id": row["manufacturer_id"],
+        "updated_at": row["updated_at"],
+        "manufacturers": {"id": row["m_id"], "name": row["m_name"]} if row["m_id"] is not None else None,
+        "categories": {"id": row["c_id"], "name": row["c_name"]} if row["c_id"] is not None else None,
+        "product_localization": {"name": row["l_name"], "description": row["l_description"]},
+    }
+
+
+class CatalogReplica:
+    """
+    Local SQLite copy of the catalog tables (see REPLICATED_TABLES).
+
+    `sync()` pulls rows updated after the per-table cursor from the source repository
+    and upserts them; every `full_sync_interval` seconds the tables are replaced wholesale
+    so rows deleted in Supabase disappear too. Cursors are stored in the database file, so
+    a restarted bot serves the last synced catalog immediately, even if Supabase is down.
+    All SQLite access runs on one worker thread.
+    """
+
+    def __init__(self, path: str = CATALOG_REPLICA_PATH, sync_interval: float = CATALOG_REPLICA_SYNC_INTERVAL,
+                 full_sync_interval: float = 3600):
+        self.path = path
+        self.sync_interval = sync_interval
+        self.full_sync_interval = full_sync_interval
+        self.last_sync_seconds: Optional[float] = None
+        self.last_sync_rows = 0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="catalog-replica")
+        self._connection: Optional[sqlite3.Connection] = None
+        self._sync_lock = asyncio.Lock()
+        self._sync_task: Optional[asyncio.Task] = None
+        self._ready = False
+
+    async def _run(self, function, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, function, *args)
+
+    # Everything below prefixed with _db_ runs on the replica thread.
+
+    def _db_open(self):
+        if self._connection is not None:
+            return
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        for table, (keys, columns) in REPLICATED_TABLES.items():
+            connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(columns)}, PRIMARY KEY ({', '.join(keys)}))"
+            )
+        connection.execute("CREATE INDEX IF NOT EXISTS products_category_idx ON products (category_id, id)")
+        connection.execute("CREATE TABLE IF NOT EXISTS sync_state (name TEXT PRIMARY KEY, value TEXT)")
+        connection.commit()
+        self._connection = connection
+
+    def _db_close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _db_state(self, name: str) -> Optional[str]:
+        row = self._connection.execute("SELECT value FROM sync_state WHERE name = ?", (name,)).fetchone()
+        return row["value"] if row else None
+
+    def _db_apply(self, changes: Dict[str, list], replace: bool) -> int:
+        """Upserts (or, with `replace`, swaps in) the fetched rows and advances the cursors, in one transaction."""
+        applied = 0
+        with self._connection:
+            for table, rows in changes.items():
+                _, columns = REPLICATED_TABLES[table]
+                if replace:
+                    self._connection.execute(f"DELETE FROM {table}")
+                self._connection.executemany(
+                    f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                    [tuple(row.get(column) for column in columns) for row in rows]
+                )
+                applied += len(rows)
+                cursor = max((row["updated_at"] for row in rows if row.get("updated_at")), default=None)
+                if cursor and (replace or cursor > (self._db_state(f"cursor:{table}") or "")):
+                    self._connection.execute("INSERT OR REPLACE INTO sync_state VALUES (?, ?)", (f"cursor:{table}", cursor))
+            if replace:
+                self._connection.execute("INSERT OR REPLACE INTO sync_state VALUES ('full_sync_at', ?)", (str(time.time()),))
+        return applied
+
+    def _db_query(self, sql: str, params: tuple = ()) -> List[sqlite3.Row]:
+        return self._connection.execute(sql, params).fetchall()
+
+    # Sync
+
+    @property
+    def ready(self) -> bool:
+        """True once a full sync has completed (in this process or a previous one)."""
+        return self._ready
+
+    async def open(self):
+        await self._run(self._db_open)
+        self._ready = await self._run(self._db_state, "full_sync_at") is not None
+
+    async def sync(self, source: Repository, full: bool = False) -> bool:
+        """One sync pass from `source`. Returns False (keeping the current data) if it fails."""
+        async with self._sync_lock:
+            started = time.perf_counter()
+            try:
+                full_sync_at = await self._run(self._db_state, "full_sync_at")
+                full = full or full_sync_at is None or time.time() - float(full_sync_at) > self.full_sync_interval
+                cursors = {}
+                if not full:
+                    for table in REPLICATED_TABLES:
+                        cursors[table] = sync_from(await self._run(self._db_state, f"cursor:{table}"))
+                results = await asyncio.gather(*(
+                    source.get_rows_updated_since(table, keys, cursors.get(table))
+                    for table, (keys, _) in REPLICATED_TABLES.items()
+                ))
+                changes = dict(zip(REPLICATED_TABLES, results))
+                self.last_sync_rows = await self._run(self._db_apply, changes, full)
+            except Exception as e:
+                print(f"Error syncing catalog replica ({'full' if full else 'incremental'}): {e}")
+                return False
+            self.last_sync_seconds = time.perf_counter() - started
+            self._ready = self._ready or full
+            return True
+
+    async def start(self, source: Repository):
+        await self.open()
+        await self.sync(source)
+        if self.sync_interval > 0 and self._sync_task is None:
+            self._sync_task = asyncio.create_task(self._sync_loop(source))
+
+    async def stop(self):
+        if self._sync_task:
+            self._sync_task.cancel()
+            try:
+                await self._sync_task
+            except asyncio.CancelledError:
+                pass
+            self._sync_task = None
+        await self._run(self._db_close)
+        self._executor.shutdown(wait=False)
+
+    async def _sync_loop(self, source: Repository):
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            await self.sync(source)
+
+    # Reads: same return shapes as the SupabaseClient methods
+
+    async def get_categories_with_count(self, language: str = "en") -> list:
+        rows = await self._run(self._db_query, (
+            "SELECT c.id, c.name, COUNT(l.product_id) AS product_count FROM categories c "
+            "LEFT JOIN products p ON p.category_id = c.id "
+            "LEFT JOIN product_localization l ON l.product_id = p.id AND l.language_code = ? "
+            "GROUP BY c.id ORDER BY c.id"
+        ), (language,))
+        return [dict(row) for row in rows]
+
+    async def get_products(self, language: str, where: str = "", params: tuple = (),
+                           suffix: str = "ORDER BY p.id") -> list:
+        rows = await self._run(self._db_query, f"{_PRODUCT_SELECT} {where} {suffix}", (language, *params))
+        return [_product(row) for row in rows]
+
+    async def count_products(self, language: str, where: str, params: tuple) -> int:
+        rows = await self._run(self._db_query, (
+            "SELECT COUNT(*) AS n FROM products p "
+            "JOIN product_localization l ON l.product_id = p.id AND l.language_code = ? " + where
+        ), (language, *params))
+        return rows[0]["n"]
+
+    async def get_stock(self, product_id: int) -> list:
+        rows = await self._run(self._db_query, (
+            "SELECT s.quantity, loc.id, loc.name FROM product_stock s "
+            "LEFT JOIN locations loc ON loc.id = s.location_id WHERE s.product_id = ? ORDER BY s.location_id"
+        ), (product_id,))
+        return [{"quantity": row["quantity"],
+                 "locations": {"id": row["id"], "name": row["name"]} if row["id"] is not None else None}
+                for row in rows]
+
+    async def get_stock_rows(self, product_ids: list) -> list:
+        placeholders = ", ".join("?" * len(product_ids))
+        rows = await self._run(self._db_query, (
+            "SELECT product_id, location_id, quantity FROM product_stock "
+            f"WHERE product_id IN ({placeholders}) ORDER BY product_id, location_id"
+        ), tuple(product_ids))
+        return [dict(row) for row in rows]
+
+    async def get_locations(self) -> list:
+        rows = await self._run(self._db_query, "SELECT id, name, address FROM locations ORDER BY id")
+        return [dict(row) for row in rows]
+
+
+class ReplicaRepository(Repository):
+    """
+    Repository serving catalog reads (categories, products, localizations, stock) from a
+    CatalogReplica and delegating users, cart, orders, interface texts and media to `remote`
+    (the SupabaseClient). Until the replica has completed a first full sync, and whenever
+    a local read fails, catalog reads fall back to `remote` as well.
+    `hits`/`misses` count catalog reads served locally / by the fallback.
+    """
+
+    def __init__(self, remote: Repository, replica: Optional[CatalogReplica] = None):
+        self.remote = remote
+        self.replica = replica or CatalogReplica()
+        self.hits = 0
+        self.misses = 0
+
+    async def start(self):
+        await self.replica.start(self.remote)
+
+    async def stop(self):
+        await self.replica.stop()
+
+    async def _local(self, read, fallback):
+        """Runs `read()` on the replica, or `fallback()` on the remote if it is not ready or fails."""
+        if self.replica.ready:
+            try:
+                result = await read()
+                self.hits += 1
+                return result
+            except sqlite3.Error as e:
+                print(f"Catalog replica read failed, falling back to Supabase: {e}")
+        self.misses += 1
+        return await fallback()
+
+    # Catalog reads (local)
+
+    async def get_categories_with_count(self, language: str = "en"):
+        return await self._local(
+            lambda: self.replica.get_categories_with_count(language),
+            lambda: self.remote.get_categories_with_count(language),
+        )
+
+    async def get_products_by_category(self, category_id: int, language: str = "en") -> list:
+        return await self._local(
+            lambda: self.replica.get_products(language, "WHERE p.category_id = ?", (category_id,)),
+            lambda: self.remote.get_products_by_category(category_id, language),
+        )
+
+    async def get_products_page(self, category_id: int, language: str = "en", page: int = 0,
+                                items_per_page: int = 5, after_id: Optional[int] = None,
+                                count: str = "exact") -> Tuple[list, int]:
+        page = max(page, 0)
+
+        async def read():
+            where, params = "WHERE p.category_id = ?", (category_id,)
+            total = await self.replica.count_products(language, where, params)
+            if after_id is not None:
+                products = await self.replica.get_products(
+                    language, where + " AND p.id > ?", (*params, after_id), f"ORDER BY p.id LIMIT {int(items_per_page)}"
+                )
+            else:
+                products = await self.replica.get_products(
+                    language, where, params,
+                    f"ORDER BY p.id LIMIT {int(items_per_page)} OFFSET {int(page * items_per_page)}"
+                )
+            return products, total
+
+        return await self._local(
+            read,
+            lambda: self.remote.get_products_page(category_id, language, page, items_per_page, after_id, count),
+        )
+
+    async def get_product_details(self, product_id: int, language: str = "en") -> Optional[dict]:
+        async def read():
+            products = await self.replica.get_products(language, "WHERE p.id = ?", (product_id,))
+            return products[0] if products else None
+
+        return await self._local(read, lambda: self.remote.get_product_details(product_id, language))
+
+    async def get_product_with_stock(self, product_id: int, language: str = "en") -> Tuple[Optional[dict], list]:
+        async def read():
+            products = await self.replica.get_products(language, "WHERE p.id = ?", (product_id,))
+            if not products:
+                return None, []
+            return products[0], await self.replica.get_stock(product_id)
+
+        return await self._local(read, lambda: self.remote.get_product_with_stock(product_id, language))
+
+    async def get_product_stock(self, product_id: int, location_id: int) -> int:
+        async def read():
+            stock = await self.replica.get_stock(product_id)
+            return next((s["quantity"] for s in stock if (s["locations"] or {}).get("id") == location_id), 0)
+
+        return await self._local(read, lambda: self.remote.get_product_stock(product_id, location_id))
+
+    async def get_product_stock_all_locations(self, product_id: int) -> list:
+        return await self._local(
+            lambda: self.replica.get_stock(product_id),
+            lambda: self.remote.get_product_stock_all_locations(product_id),
+        )
+
+    async def get_stock_for_products(self, product_ids: list) -> list:
+        return await self._local(
+            lambda: self.replica.get_stock_rows(list(product_ids)),
+            lambda: self.remote.get_stock_for_products(product_ids),
+        )
+
+    async def get_locations(self) -> list:
+        return await self._local(self.replica.get_locations, self.remote.get_locations)
+
+    async def get_hot_product_ids(self, limit: int, sample: int = 2000) -> list:
+        return await self.remote.get_hot_product_ids(limit, sample)
+
+    async def get_products_with_filters(self, category_id: int = None, manufacturer_id: int = None,
+                                        search_query: str = None, language: str = "en"):
+        conditions, params = [], []
+        if category_id:
+            conditions.append("p.category_id = ?")
+            params.append(category_id)
+        if manufacturer_id:
+            conditions.append("p.manufacturer_id = ?")
+            params.append(manufacturer_id)
+        if search_query:
+            conditions.append("l.name LIKE ?") # Case-insensitive for ASCII, like ilike for the common case
+            params.append(f"%{search_query}%")
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return await self._local(
+            lambda: self.replica.get_products(language, where, tuple(params)),
+            lambda: self.remote.get_products_with_filters(category_id, manufacturer_id, search_query, language),
+        )
+
+    async def get_catalog_products(self, language: str = "en", updated_since: Optional[str] = None,
+                                   chunk_size: int = 1000) -> list:
+        where, params = ("WHERE p.updated_at > ?", (updated_since,)) if updated_since else ("", ())
+        return await self._local(
+            lambda: self.replica.get_products(language, where, params),
+            lambda: self.remote.get_catalog_products(language, updated_since, chunk_size),
+        )
+
+    async def get_rows_updated_since(self, table: str, key_columns: Tuple[str, ...],
+                                     updated_since: Optional[str] = None, chunk_size: int = 1000) -> list:
+        return await self.remote.get_rows_updated_since(table, key_columns, updated_since, chunk_size)
+
+    # Everything else goes to Supabase
+
+    async def get_user(self, telegram_id: int) -> Optional[dict]:
+        return await self.remote.get_user(telegram_id)
+
+    async def create_user(self, telegram_id: int, language_code: str = "en") -> dict:
+        return await self.remote.create_user(telegram_id, language_code)
+
+    async def update_user_language(self, telegram_id: int, language_code: str) -> Optional[dict]:
+        return await self.remote.update_user_language(telegram_id, language_code)
+
+    async def get_user_cart(self, user_id: int, language: str = "en") -> list:
+        return await self.remote.get_user_cart(user_id, language)
+
+    async def get_cart_lines(self, user_id: int) -> list:
+        return await self.remote.get_cart_lines(user_id)
+
+    async def save_cart_lines(self, lines: list):
+        return await self.remote.save_cart_lines(lines)
+
+    async def create_order(self, user_id: int, payment_method: str, language: str = "en") -> dict:
+        return await self.remote.create_order(user_id, payment_method, language)
+
+    async def get_user_orders(self, user_id: int, language: str = "en") -> list:
+        return await self.remote.get_user_orders(user_id, language)
+
+    async def update_order_status(self, order_id: int, new_status: str, admin_notes: str = None):
+        return await self.remote.update_order_status(order_id, new_status, admin_notes)
+
+    async def get_rows_by_keys(self, table: str, key_columns: Tuple[str, ...], keys: list) -> list:
+        return await self.remote.get_rows_by_keys(table, key_columns, keys)
+
+    async def upsert_rows(self, table: str, rows: list, key_columns: Tuple[str, ...]):
+        return await self.remote.upsert_rows(table, rows, key_columns)
+
+    async def catalog_changed(self):
+        await self.replica.sync(self.remote)
+
+    async def update_orders_status(self, order_ids: list, new_status: str, admin_notes: str = None,
+                                   expected_status: str = None) -> list:
+        return await self.remote.update_orders_status(order_ids, new_status, admin_notes, expected_status)
+
+    async def get_orders_page(self, status: str, limit: int = 10, after_id: Optional[int] = None,
+                              before_id: Optional[int] = None) -> list:
+        return await self.remote.get_orders_page(status, limit, after_id, before_id)
+
+    async def claim_order_notifications(self, limit: int, lease_seconds: int) -> list:
+        return await self.remote.claim_order_notifications(limit, lease_seconds)
+
+    async def update_order_notification(self, notification_id: int, values: dict):
+        return await self.remote.update_order_notification(notification_id, values)
+
+    async def get_interface_text(self, key: str, language: str = "en") -> str:
+        return await self.remote.get_interface_text(key, language)
+
+    async def get_interface_texts(self, keys: list, language: str = "en") -> dict:
+        return await self.remote.get_interface_texts(keys, language)
+
+    async def get_all_interface_texts(self) -> list:
+        return await self.remote.get_all_interface_texts()
+
+    async def get_product_media(self) -> list:
+        return await self.remote.get_product_media()
+
+    async def upsert_product_media(self, product_id: int, image_url: str, file_id: str):
+        return await self.remote.upsert_product_media(product_id, image_url, file_id)
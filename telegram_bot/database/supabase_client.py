@@ -1,18 +1,33 @@
 import os
-from supabase import create_client, Client
-from typing import Optional
+import asyncio
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from supabase import create_client, Client, ClientOptions
+from postgrest.exceptions import APIError
+from postgrest.types import ReturnMethod
+from typing import Optional, Tuple
 from dotenv import load_dotenv
 
+from database.repository import Repository
+from utils.query_trace import record_query
+
 load_dotenv()
 
 try:
-    from config import SUPABASE_URL, SUPABASE_KEY, SUPABASE_SERVICE_KEY
+    from config import (
+        SUPABASE_URL, SUPABASE_KEY, SUPABASE_SERVICE_KEY,
+        SUPABASE_POOL_SIZE, SUPABASE_TIMEOUT
+    )
 except ImportError:
     SUPABASE_URL = os.getenv("SUPABASE_URL")
     SUPABASE_KEY = os.getenv("SUPABASE_KEY")
     SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
+    SUPABASE_POOL_SIZE = int(os.getenv("SUPABASE_POOL_SIZE", "10"))
+    SUPABASE_TIMEOUT = float(os.getenv("SUPABASE_TIMEOUT", "10"))
 
-class SupabaseClient:
+class SupabaseClient(Repository):
     def __init__(self):
         self.url = SUPABASE_URL
         self.key = SUPABASE_KEY
@@ -21,15 +36,57 @@ class SupabaseClient:
         if not self.url or not self.key:
             raise ValueError("Supabase URL and Key must be provided.")
 
-        self.client: Client = create_client(self.url, self.key)
+        self.timeout = SUPABASE_TIMEOUT
+        # supabase-py is synchronous: every .execute() is a blocking HTTP round-trip.
+        # All queries are run through this bounded pool (see _execute) so the aiogram
+        # event loop is never blocked and at most SUPABASE_POOL_SIZE requests are in flight.
+        self._executor = ThreadPoolExecutor(max_workers=SUPABASE_POOL_SIZE, thread_name_prefix="supabase")
+        options = ClientOptions(postgrest_client_timeout=self.timeout)
+
+        self.client: Client = create_client(self.url, self.key, options=options)
 
         if self.service_key:
-            self.admin_client: Client = create_client(self.url, self.service_key)
+            self.admin_client: Client = create_client(self.url, self.service_key, options=options)
         else:
             self.admin_client: Optional[Client] = None
 
+    async def _execute(self, query, timeout: Optional[float] = None):
+        """
+        Runs a prepared PostgREST query (anything with a blocking .execute()) in the
+        worker pool and awaits the response without blocking the event loop.
+        Raises asyncio.TimeoutError if the call takes longer than `timeout` seconds.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, query.execute)
+        started = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(future, timeout if timeout is not None else self.timeout)
+        except Exception as e:
+            record_query(query, time.perf_counter() - started, error=e)
+            raise
+        record_query(query, time.perf_counter() - started, response) # No-op unless the update is being traced
+        return response
+
+    async def _execute_all(self, build_query, chunk_size: int = 1000) -> list:
+        """
+        Fetches every row of a query in range() chunks, since PostgREST caps the rows
+        returned by a single request. `build_query` returns a fresh, ordered query.
+        """
+        rows = []
+        start = 0
+        while True:
+            response = await self._execute(build_query().range(start, start + chunk_size - 1))
+            rows.extend(response.data)
+            if len(response.data) < chunk_size:
+                return rows
+            start += chunk_size
+
+    def close(self):
+        """Releases the worker pool. Called on bot shutdown."""
+        self._executor.shutdown(wait=False)
+
     async def get_user(self, telegram_id: int) -> Optional[dict]:
-        response = self.client.table("users").select("*").eq("telegram_id", telegram_id).execute()
+        response = await self._execute(self.client.table("users").select("*").eq("telegram_id", telegram_id))
         return response.data[0] if response.data else None
 
     async def create_user(self, telegram_id: int, language_code: str = "en") -> dict:
@@ -38,114 +95,187 @@ class SupabaseClient:
             "language_code": language_code,
             "is_blocked": False
         }
-        response = self.client.table("users").insert(user_data).execute()
+        response = await self._execute(self.client.table("users").insert(user_data))
         return response.data[0]
 
+    async def update_user_language(self, telegram_id: int, language_code: str) -> Optional[dict]:
+        response = await self._execute(self.client.table("users").update({
+            "language_code": language_code
+        }).eq("telegram_id", telegram_id))
+        return response.data[0] if response.data else None
+
     async def get_products_by_category(self, category_id: int, language: str = "en") -> list:
-        response = self.client.table("products").select(
+        response = await self._execute(self.client.table("products").select(
             "id, name, price, image_url, variation, manufacturers(name), product_localization!inner(name, description)"
-        ).eq("category_id", category_id).eq("product_localization.language_code", language).execute()
+        ).eq("category_id", category_id).eq("product_localization.language_code", language))
         return response.data
 
+    async def get_products_page(self, category_id: int, language: str = "en", page: int = 0,
+                                items_per_page: int = 5, after_id: Optional[int] = None,
+                                count: str = "exact") -> Tuple[list, int]:
+        """
+        One page of a category's products, ordered by id, plus the total number of products.
+        Uses range() (offset) paging by default; when `after_id` (the last id of the previous
+        page) is given, seeks with id > after_id instead, which stays cheap on deep pages.
+        `count` is the PostgREST count method: "exact", "planned" or "estimated".
+        """
+        if page < 0:
+            page = 0
+        query = self.client.table("products").select(
+            "id, name, price, image_url, variation, manufacturers(name), product_localization!inner(name, description)",
+            count=count
+        ).eq("category_id", category_id).eq("product_localization.language_code", language).order("id")
+
+        if after_id is not None:
+            response = await self._execute(query.gt("id", after_id).limit(items_per_page))
+            # The count only covers rows after the cursor; add the pages already seen.
+            total = page * items_per_page + (response.count or 0)
+        else:
+            start = page * items_per_page
+            try:
+                response = await self._execute(query.range(start, start + items_per_page - 1))
+            except APIError as e:
+                if e.code == "PGRST103": # Requested range past the last row
+                    return [], 0
+                raise
+            total = response.count or 0
+        return response.data, total
+
     async def get_product_stock(self, product_id: int, location_id: int) -> int:
-        response = self.client.table("product_stock").select("quantity").eq(
+        response = await self._execute(self.client.table("product_stock").select("quantity").eq(
             "product_id", product_id
-        ).eq("location_id", location_id).execute()
+        ).eq("location_id", location_id))
         return response.data[0]["quantity"] if response.data else 0
 
-    async def add_to_cart(self, user_id: int, product_id: int, location_id: int, quantity: int):
-        existing_response = self.client.table("user_cart").select("*").eq(
-            "user_id", user_id
-        ).eq("product_id", product_id).eq("location_id", location_id).execute()
-
-        existing_data = existing_response.data
-
-        if existing_data:
-            new_quantity = existing_data[0]["quantity"] + quantity
-            response = self.client.table("user_cart").update({
-                "quantity": new_quantity
-            }).eq("user_id", user_id).eq("product_id", product_id).eq("location_id", location_id).execute()
-        else:
-            cart_data = {
-                "user_id": user_id,
-                "product_id": product_id,
-                "location_id": location_id,
-                "quantity": quantity
-            }
-            response = self.client.table("user_cart").insert(cart_data).execute()
+    async def get_cart_lines(self, user_id: int) -> list:
+        """The user's cart lines without embedded products (product_id, location_id, quantity)."""
+        response = await self._execute(self.client.table("user_cart").select(
+            "product_id, location_id, quantity"
+        ).eq("user_id", user_id))
         return response.data
 
+    async def save_cart_lines(self, lines: list):
+        """
+        Writes cart lines of any number of users in one transaction via the save_cart_lines RPC
+        (database/sql/save_cart_lines.sql): each line's quantity is set as given, 0 deletes it.
+        """
+        await self._execute(self.client.rpc("save_cart_lines", {"p_lines": lines}))
+
     async def get_user_cart(self, user_id: int, language: str = "en") -> list:
-        response = self.client.table("user_cart").select(
+        response = await self._execute(self.client.table("user_cart").select(
             "user_id, product_id, location_id, quantity, "
             "products!inner(id, name, price, image_url, category_id, manufacturer_id, "
             "product_localization!inner(language_code, name, description)), "
             "locations!inner(id, name, address)"
-        ).eq("user_id", user_id).eq("products.product_localization.language_code", language).execute()
+        ).eq("user_id", user_id).eq("products.product_localization.language_code", language))
         return response.data
 
     async def create_order(self, user_id: int, payment_method: str, language: str = "en") -> dict:
-        cart_items = await self.get_user_cart(user_id, language)
-
-        if not cart_items:
-            raise ValueError("Cart is empty")
-
-        total_amount = sum(item["quantity"] * float(item["products"]["price"]) for item in cart_items)
-
-        order_data = {
-            "user_id": user_id,
-            "status": "pending_admin_approval",
-            "payment_method": payment_method,
-            "total_amount": total_amount
-        }
-
-        order_response = self.client.table("orders").insert(order_data).execute()
-        order_id = order_response.data[0]["id"]
-
-        order_items_to_insert = []
-        for item in cart_items:
-            order_item = {
-                "order_id": order_id,
-                "product_id": item["products"]["id"],
-                "location_id": item["location_id"],
-                "quantity": item["quantity"],
-                "price_at_order": float(item["products"]["price"]),
-                "reserved_quantity": 0
-            }
-            order_items_to_insert.append(order_item)
-
-        if order_items_to_insert:
-            self.client.table("order_items").insert(order_items_to_insert).execute()
-
-        self.client.table("user_cart").delete().eq("user_id", user_id).execute()
-
-        return order_response.data[0]
+        """
+        Checks out the user's cart in a single transaction via the create_order_from_cart
+        RPC (database/sql/create_order_from_cart.sql): computes the total, inserts the order
+        and its items, reserves stock and clears the cart.
+        Raises ValueError if the cart is empty or stock is insufficient.
+        Only sees the cart as last flushed: check out through cart_store.create_order()
+        (database/cart_store.py), which flushes it first.
+        """
+        try:
+            response = await self._execute(self.client.rpc("create_order_from_cart", {
+                "p_user_id": user_id,
+                "p_payment_method": payment_method
+            }))
+        except APIError as e:
+            # Business errors are raised by the function itself; surface them like before.
+            if e.message and (e.message.startswith("Cart is empty") or e.message.startswith("Insufficient stock")):
+                raise ValueError(e.message) from e
+            raise
+        return response.data[0] if isinstance(response.data, list) else response.data
 
     async def get_user_orders(self, user_id: int, language: str = "en") -> list:
-        response = self.client.table("orders").select(
+        response = await self._execute(self.client.table("orders").select(
             "id, status, total_amount, created_at, payment_method, "
             "order_items!inner(quantity, price_at_order, products!inner(name))"
-        ).eq("user_id", user_id).order("created_at", desc=True).execute()
+        ).eq("user_id", user_id).order("created_at", desc=True))
         return response.data
 
     async def get_interface_text(self, key: str, language: str = "en") -> str:
         lang_column = f"text_{language}"
-        response = self.client.table("interface_text").select(lang_column).eq("key", key).execute()
+        response = await self._execute(self.client.table("interface_text").select(lang_column).eq("key", key))
         if response.data and response.data[0].get(lang_column):
             return response.data[0][lang_column]
         return key
 
+    async def get_interface_texts(self, keys: list, language: str = "en") -> dict:
+        """Resolves several interface_text keys in one round-trip. Keys without a text are omitted."""
+        lang_column = f"text_{language}"
+        response = await self._execute(
+            self.client.table("interface_text").select(f"key, {lang_column}").in_("key", list(keys))
+        )
+        return {row["key"]: row[lang_column] for row in response.data or [] if row.get(lang_column)}
+
+    async def get_all_interface_texts(self) -> list:
+        """Whole interface_text table (key plus one text_<lang> column per language) in one round-trip."""
+        response = await self._execute(self.client.table("interface_text").select("*"))
+        return response.data
+
     async def get_product_details(self, product_id: int, language: str = "en") -> Optional[dict]:
-        response = self.client.table("products").select(
+        response = await self._execute(self.client.table("products").select(
             "id, name, price, image_url, variation, manufacturers(id, name), categories(id, name), "
             "product_localization!inner(name, description)"
-        ).eq("id", product_id).eq("product_localization.language_code", language).single().execute()
+        ).eq("id", product_id).eq("product_localization.language_code", language).single())
         return response.data if response.data else None
 
+    async def get_product_with_stock(self, product_id: int, language: str = "en") -> Tuple[Optional[dict], list]:
+        """
+        Product details (localization, manufacturer, category) and per-location stock
+        in one embedded select. Returns (product, stock_info) in the same shapes as
+        get_product_details() and get_product_stock_all_locations().
+        """
+        response = await self._execute(self.client.table("products").select(
+            "id, name, price, image_url, variation, manufacturers(id, name), categories(id, name), "
+            "product_localization!inner(name, description), product_stock(quantity, locations(id, name))"
+        ).eq("id", product_id).eq("product_localization.language_code", language).limit(1))
+        if not response.data:
+            return None, []
+        product = response.data[0]
+        stock_info = product.pop("product_stock", None) or []
+        return product, stock_info
+
     async def get_product_stock_all_locations(self, product_id: int) -> list:
-        response = self.client.table("product_stock").select(
+        response = await self._execute(self.client.table("product_stock").select(
             "quantity, locations(id, name)"
-        ).eq("product_id", product_id).execute()
+        ).eq("product_id", product_id))
+        return response.data
+
+    async def get_stock_for_products(self, product_ids: list) -> list:
+        """product_stock rows (product_id, location_id, quantity) of several products, in one round-trip per 1000 rows."""
+        return await self._execute_all(lambda: self.client.table("product_stock").select(
+            "product_id, location_id, quantity"
+        ).in_("product_id", list(product_ids)).order("product_id").order("location_id"))
+
+    async def get_locations(self) -> list:
+        return await self._execute_all(lambda: self.client.table("locations").select("id, name, address").order("id"))
+
+    async def get_hot_product_ids(self, limit: int, sample: int = 2000) -> list:
+        """Ids of the products ordered most often among the latest `sample` order items, most ordered first."""
+        response = await self._execute(
+            self.client.table("order_items").select("product_id").order("order_id", desc=True).limit(sample)
+        )
+        counts = Counter(row["product_id"] for row in response.data or [])
+        return [product_id for product_id, _ in counts.most_common(limit)]
+
+    async def get_product_media(self) -> list:
+        return await self._execute_all(
+            lambda: self.client.table("product_media").select("product_id, image_url, file_id").order("product_id")
+        )
+
+    async def upsert_product_media(self, product_id: int, image_url: str, file_id: str):
+        response = await self._execute(self.client.table("product_media").upsert({
+            "product_id": product_id,
+            "image_url": image_url,
+            "file_id": file_id,
+            "updated_at": datetime.now(timezone.utc).isoformat()
+        }, on_conflict="product_id"))
         return response.data
 
     async def get_products_with_filters(self, category_id: int = None, manufacturer_id: int = None,
@@ -162,11 +292,79 @@ class SupabaseClient:
         if search_query:
             query = query.ilike("product_localization.name", f"%{search_query}%")
 
-        response = query.execute()
+        response = await self._execute(query)
         return response.data
 
+    async def get_catalog_products(self, language: str = "en", updated_since: Optional[str] = None,
+                                   chunk_size: int = 1000) -> list:
+        """
+        All products of one language (optionally only those with updated_at > updated_since),
+        with manufacturer, category and localization embedded.
+        """
+        def build_query():
+            query = self.client.table("products").select(
+                "id, name, price, image_url, variation, category_id, manufacturer_id, updated_at, "
+                "manufacturers(id, name), categories(id, name), product_localization!inner(name, description)"
+            ).eq("product_localization.language_code", language)
+            if updated_since:
+                query = query.gt("updated_at", updated_since)
+            return query.order("id")
+
+        return await self._execute_all(build_query, chunk_size)
+
+    async def get_rows_updated_since(self, table: str, key_columns: Tuple[str, ...],
+                                     updated_since: Optional[str] = None, chunk_size: int = 1000) -> list:
+        """
+        Every row of `table` with updated_at > updated_since (all rows if None), ordered by
+        updated_at then the key columns. Used by the SQLite catalog replica's sync job.
+        """
+        def build_query():
+            query = self.client.table(table).select("*")
+            if updated_since:
+                query = query.gt("updated_at", updated_since)
+            query = query.order("updated_at")
+            for column in key_columns:
+                query = query.order(column)
+            return query
+
+        return await self._execute_all(build_query, chunk_size)
+
+    async def get_rows_by_keys(self, table: str, key_columns: Tuple[str, ...], keys: list) -> list:
+        """
+        The rows of `table` whose key (values of `key_columns`) is in `keys`.
+        Composite keys are filtered with in_() per column, which selects the cross product of
+        the values, so the result is read in range() pages (PostgREST caps the rows per request)
+        and matched exactly here.
+        """
+        if not keys:
+            return []
+        client = self.admin_client or self.client
+
+        def build_query():
+            query = client.table(table).select("*")
+            for index, column in enumerate(key_columns):
+                query = query.in_(column, sorted({key[index] for key in keys}))
+            for column in key_columns:
+                query = query.order(column)
+            return query
+
+        wanted = set(keys)
+        rows = await self._execute_all(build_query)
+        return [row for row in rows if tuple(row.get(column) for column in key_columns) in wanted]
+
+    async def upsert_rows(self, table: str, rows: list, key_columns: Tuple[str, ...]):
+        """
+        Bulk upsert in one request (merge on `key_columns`), without returning the rows.
+        All rows must have the same columns; columns left out keep their current values.
+        """
+        if not self.admin_client:
+            raise ConnectionError("Admin client not initialized. SUPABASE_SERVICE_KEY might be missing.")
+        await self._execute(self.admin_client.table(table).upsert(
+            rows, on_conflict=",".join(key_columns), returning=ReturnMethod.minimal, default_to_null=False,
+        ))
+
     async def get_categories_with_count(self, language: str = "en"):
-        response = self.client.rpc("get_categories_with_product_count", {"lang": language}).execute()
+        response = await self._execute(self.client.rpc("get_categories_with_product_count", {"lang": language}))
         return response.data
 
     async def update_order_status(self, order_id: int, new_status: str, admin_notes: str = None):
@@ -177,9 +375,65 @@ class SupabaseClient:
         if admin_notes:
             update_data["admin_notes"] = admin_notes
 
-        response = self.admin_client.table("orders").update(update_data).eq("id", order_id).execute()
+        response = await self._execute(self.admin_client.table("orders").update(update_data).eq("id", order_id))
         return response.data[0] if response.data else None
 
+    async def update_orders_status(self, order_ids: list, new_status: str, admin_notes: str = None,
+                                   expected_status: str = None) -> list:
+        """
+        Bulk status change in one request. With `expected_status`, only orders still in that
+        status are changed (e.g. an order another admin already reviewed is skipped).
+        Returns the updated orders.
+        """
+        if not self.admin_client:
+            raise ConnectionError("Admin client not initialized. SUPABASE_SERVICE_KEY might be missing.")
+
+        update_data = {"status": new_status}
+        if admin_notes:
+            update_data["admin_notes"] = admin_notes
+
+        query = self.admin_client.table("orders").update(update_data).in_("id", list(order_ids))
+        if expected_status:
+            query = query.eq("status", expected_status)
+        response = await self._execute(query)
+        return response.data or []
+
+    async def get_orders_page(self, status: str, limit: int = 10, after_id: Optional[int] = None,
+                              before_id: Optional[int] = None) -> list:
+        """
+        Orders in `status`, oldest first, by keyset on id: the `limit` orders after `after_id`,
+        or the `limit` orders before `before_id` (previous page). No offset or count is used.
+        """
+        if not self.admin_client:
+            raise ConnectionError("Admin client not initialized. SUPABASE_SERVICE_KEY might be missing.")
+
+        query = self.admin_client.table("orders").select(
+            "id, user_id, status, payment_method, total_amount, created_at"
+        ).eq("status", status)
+        if before_id is not None:
+            response = await self._execute(query.lt("id", before_id).order("id", desc=True).limit(limit))
+            return list(reversed(response.data))
+        if after_id is not None:
+            query = query.gt("id", after_id)
+        response = await self._execute(query.order("id").limit(limit))
+        return response.data
+
+    # Order notification outbox (database/sql/order_notifications.sql)
+
+    async def claim_order_notifications(self, limit: int, lease_seconds: int) -> list:
+        """Due notifications, leased to the caller for `lease_seconds` (with the user's language_code)."""
+        if not self.admin_client:
+            raise ConnectionError("Admin client not initialized. SUPABASE_SERVICE_KEY might be missing.")
+        response = await self._execute(self.admin_client.rpc(
+            "claim_order_notifications", {"p_limit": limit, "p_lease_seconds": lease_seconds}
+        ))
+        return response.data or []
+
+    async def update_order_notification(self, notification_id: int, values: dict):
+        if not self.admin_client:
+            raise ConnectionError("Admin client not initialized. SUPABASE_SERVICE_KEY might be missing.")
+        await self._execute(self.admin_client.table("order_notifications").update(values).eq("id", notification_id))
+
 try:
     supabase_client = SupabaseClient()
 except ValueError as e:
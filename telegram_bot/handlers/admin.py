@@ -0,0 +1,235 @@
+import asyncio
+import os
+import shutil
+import tempfile
+from typing import Optional, Union
+
+from aiogram import Bot, Router, F
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message, CallbackQuery, FSInputFile
+from aiogram.fsm.context import FSMContext
+
+try:
+    from config import ADMIN_IDS
+except ImportError:
+    ADMIN_IDS = []
+
+try:
+    from database.backend import repository
+except ImportError:
+    print("CRITICAL: Repository could not be imported in handlers.admin.")
+    repository = None
+
+from database.catalog_cache import catalog_cache
+from database.catalog_import import IMPORT_TABLES, CatalogImporter
+from keyboards.inline import get_admin_orders_keyboard
+from utils.localization import get_text, get_texts
+from utils.notifications import order_notifier # Status changes go through it so customers are notified
+
+router = Router()
+# Every handler here is admin-only; other users' /admin and admin_* callbacks fall through unhandled.
+router.message.filter(F.from_user.id.in_(ADMIN_IDS))
+router.callback_query.filter(F.from_user.id.in_(ADMIN_IDS))
+
+PENDING_STATUS = "pending_admin_approval"
+ORDERS_PER_PAGE = 8
+
+_imports = set() # Running import tasks (referenced so they are not garbage-collected)
+
+
+async def show_pending_orders(event: Union[Message, CallbackQuery], state: FSMContext, language: str,
+                              page: int = 0, after_id: Optional[int] = None, before_id: Optional[int] = None):
+    """
+    Renders one page of the pending queue. Pages are fetched by keyset on id (one extra row
+    tells whether there is a next page); the page and its cursor are kept in the FSM data so
+    selection toggles only redraw the keyboard and bulk actions can reload the same page.
+    """
+    orders = await repository.get_orders_page(PENDING_STATUS, ORDERS_PER_PAGE + 1, after_id, before_id)
+    if not orders and (after_id is not None or before_id is not None):
+        # Everything on this page was handled (e.g. by a bulk action); other pages may still have orders
+        return await show_pending_orders(event, state, language)
+    if before_id is not None:
+        has_next = True # We came back from the page after this one
+        if len(orders) > ORDERS_PER_PAGE:
+            orders = orders[1:]
+        else:
+            page, before_id = 0, None # Reached the start of the queue
+    else:
+        has_next = len(orders) > ORDERS_PER_PAGE
+        orders = orders[:ORDERS_PER_PAGE]
+
+    data = await state.get_data()
+    selected = data.get("admin_selected", [])
+    await state.update_data(
+        admin_orders=orders, admin_page=page, admin_after=after_id, admin_before=before_id, admin_has_next=has_next,
+    )
+
+    texts = await get_texts({
+        "admin_pending_orders": "🗂 Orders awaiting approval (page {page})",
+        "admin_no_pending_orders": "No orders are awaiting approval.",
+        "admin_selected_count": "Selected: {count}",
+    }, language)
+    if orders:
+        text = texts["admin_pending_orders"].format(page=page + 1)
+    else:
+        text = texts["admin_no_pending_orders"]
+    if selected:
+        text += "\n" + texts["admin_selected_count"].format(count=len(selected))
+    keyboard = await get_admin_orders_keyboard(orders, selected, page, has_next, language)
+
+    if isinstance(event, CallbackQuery):
+        await event.message.edit_text(text, reply_markup=keyboard)
+    else:
+        await event.answer(text, reply_markup=keyboard)
+
+
+@router.message(Command("admin"))
+async def admin_command_handler(message: Message, state: FSMContext, language: str):
+    if not repository:
+        await message.answer(await get_text("error_db_connection", language, "DB error."))
+        return
+    await state.update_data(admin_selected=[])
+    try:
+        await show_pending_orders(message, state, language)
+    except Exception as e:
+        print(f"Error in admin_command_handler: {e}")
+        await message.answer(await get_text("error_generic", language, "An error occurred."))
+
+
+@router.callback_query(F.data == "admin_orders")
+@router.callback_query(F.data.startswith("admin_orders_"))
+@router.callback_query(F.data.startswith("admin_prev_"))
+async def admin_orders_page_callback_handler(callback: CallbackQuery, state: FSMContext, language: str):
+    """admin_orders (first page), admin_orders_<page>_<after_id> (next), admin_prev_<page>_<before_id> (previous)."""
+    after_id = before_id = None
+    page = 0
+    parts = callback.data.split("_")
+    try:
+        if len(parts) == 4:
+            page = int(parts[2])
+            if parts[1] == "prev":
+                before_id = int(parts[3])
+            else:
+                after_id = int(parts[3])
+        await show_pending_orders(callback, state, language, page, after_id, before_id)
+        await callback.answer()
+    except Exception as e:
+        print(f"Error in admin_orders_page_callback_handler: {e}")
+        await callback.answer(await get_text("error_generic", language, "An error occurred."), show_alert=True)
+
+
+@router.callback_query(F.data.startswith("admin_sel_"))
+async def admin_select_callback_handler(callback: CallbackQuery, state: FSMContext, language: str):
+    """admin_sel_<order_id> toggles one order, admin_sel_page selects the whole page, admin_sel_none clears."""
+    data = await state.get_data()
+    orders = data.get("admin_orders", [])
+    selected = list(data.get("admin_selected", []))
+    target = callback.data.split("_", 2)[2]
+    if target == "page":
+        selected.extend(order["id"] for order in orders if order["id"] not in selected)
+    elif target == "none":
+        selected = []
+    else:
+        order_id = int(target)
+        if order_id in selected:
+            selected.remove(order_id)
+        else:
+            selected.append(order_id)
+    await state.update_data(admin_selected=selected)
+
+    # Only the keyboard changes; quick taps are coalesced into one edit by the SendScheduler
+    keyboard = await get_admin_orders_keyboard(
+        orders, selected, data.get("admin_page", 0), data.get("admin_has_next", False), language
+    )
+    await callback.message.edit_reply_markup(reply_markup=keyboard)
+    await callback.answer()
+
+
+@router.callback_query(F.data.in_({"admin_approve", "admin_reject"}))
+async def admin_review_callback_handler(callback: CallbackQuery, state: FSMContext, language: str):
+    """Approves or rejects all selected orders with one bulk update, then reloads the current page."""
+    data = await state.get_data()
+    selected = data.get("admin_selected", [])
+    if not selected:
+        await callback.answer(await get_text("admin_nothing_selected", language, "No orders selected."))
+        return
+
+    approve = callback.data == "admin_approve"
+    try:
+        # Only orders still pending are changed, so an order reviewed meanwhile by another admin is skipped
+        updated = await order_notifier.transition(
+            selected, "approved" if approve else "rejected", expected_status=PENDING_STATUS
+        )
+    except Exception as e:
+        print(f"Error in admin_review_callback_handler: {e}")
+        await callback.answer(await get_text("error_generic", language, "An error occurred."), show_alert=True)
+        return
+
+    texts = await get_texts({
+        "admin_orders_approved": "Approved orders: {count}",
+        "admin_orders_rejected": "Rejected orders: {count}",
+        "admin_orders_skipped": "Already reviewed: {count}",
+    }, language)
+    result = texts["admin_orders_approved" if approve else "admin_orders_rejected"].format(count=len(updated))
+    skipped = len(selected) - len(updated)
+    if skipped:
+        result += "\n" + texts["admin_orders_skipped"].format(count=skipped)
+
+    await state.update_data(admin_selected=[])
+    try:
+        await show_pending_orders(
+            callback, state, language, data.get("admin_page", 0), data.get("admin_after"), data.get("admin_before")
+        )
+    except Exception as e:
+        print(f"Error reloading pending orders: {e}")
+    await callback.answer(result, show_alert=True)
+
+
+@router.message(Command("import"), F.document)
+async def admin_import_document_handler(message: Message, command: CommandObject, bot: Bot, language: str):
+    """
+    A CSV/JSONL document captioned `/import <table>` (or named after the table, e.g.
+    product_stock_2024-06.csv) is imported with database/catalog_import.py in the background;
+    the admin gets the report, plus the reject file if rows were rejected.
+    """
+    document = message.document
+    table = (command.args or "").strip()
+    if not table:
+        table = next((name for name in IMPORT_TABLES if (document.file_name or "").startswith(name)), "")
+    if table not in IMPORT_TABLES:
+        await message.answer(
+            f"Usage: send a CSV or JSONL file with the caption /import &lt;table&gt;, table one of: {', '.join(IMPORT_TABLES)}."
+        )
+        return
+
+    workdir = tempfile.mkdtemp(prefix="catalog-import-")
+    path = os.path.join(workdir, os.path.basename(document.file_name or f"{table}.csv"))
+    try:
+        await bot.download(document, destination=path) # Streamed to disk in chunks
+    except Exception as e:
+        shutil.rmtree(workdir, ignore_errors=True)
+        print(f"Error downloading import file: {e}")
+        await message.answer(await get_text("error_generic", language, "An error occurred."))
+        return
+
+    await message.answer(f"Importing {document.file_name} into {table}...")
+    task = asyncio.create_task(_run_import(message, table, path, workdir))
+    _imports.add(task)
+    task.add_done_callback(_imports.discard)
+
+
+async def _run_import(message: Message, table: str, path: str, workdir: str):
+    rejects_path = os.path.join(workdir, "rejects.jsonl")
+    try:
+        stats = await CatalogImporter(table).run(path, rejects_path)
+        await message.answer(f"Import into {table} finished: {stats.summary()}.")
+        if stats.rejected:
+            await message.answer_document(FSInputFile(rejects_path, filename=f"{table}_rejects.jsonl"))
+        if stats.inserted or stats.updated:
+            await repository.catalog_changed() # Replica backend: sync now instead of at the next interval
+            await catalog_cache.notify_catalog_changed()
+    except Exception as e:
+        print(f"Error importing into {table}: {e}")
+        await message.answer(f"Import into {table} failed: {e}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
@@ -8,7 +8,8 @@ try:
 except ImportError:
     supabase_client = None
 
-from utils.localization import get_text
+from database.cart_store import cart_store # Cart reads and writes are served from memory, flushed behind
+from utils.localization import get_text, get_texts
 # from keyboards.inline import get_cart_keyboard # Example, will need to be created
 
 router = Router()
@@ -25,7 +26,7 @@ async def view_cart_callback_handler(callback: CallbackQuery, language: str, sta
 
     user_id = callback.from_user.id
     try:
-        cart_items = await supabase_client.get_user_cart(user_id, language)
+        cart_items = await cart_store.get_cart(user_id, language)
 
         if not cart_items:
             empty_cart_text = await get_text("cart_is_empty", language, "Your cart is currently empty.")
@@ -105,10 +106,16 @@ async def add_to_cart_callback_handler(callback: CallbackQuery, language: str, s
         location_id = 1 # Placeholder - THIS IS A MAJOR GAP TO BE ADDRESSED
         quantity = 1 # Default quantity to add
 
-        await supabase_client.add_to_cart(user_id, product_id, location_id, quantity)
+        cart_count = await cart_store.add(user_id, product_id, location_id, quantity)
 
-        added_to_cart_text = await get_text("item_added_to_cart", language, "Item added to your cart!")
-        await callback.answer(added_to_cart_text, show_alert=True)
+        texts = await get_texts({
+            "item_added_to_cart": "Item added to your cart!",
+            "cart_button": "🛒 Cart ({count})",
+        }, language)
+        await callback.answer(
+            f"{texts['item_added_to_cart']}\n{texts['cart_button'].format(count=cart_count)}",
+            show_alert=True
+        )
 
         # Optionally, update the product message or cart button text
         # For example, refresh the product details message to show updated cart info or disable "add to cart"
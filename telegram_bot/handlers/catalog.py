@@ -1,12 +1,16 @@
 from aiogram import Router, F
 from aiogram.types import CallbackQuery, InputMediaPhoto, Message # Added Message for potential text command triggers
 from aiogram.fsm.context import FSMContext # For potential future use with states
+from aiogram.exceptions import TelegramBadRequest
 
 try:
-    from database.supabase_client import supabase_client
+    from database.backend import repository # Catalog reads: Supabase or the local SQLite replica
 except ImportError:
-    print("CRITICAL: Supabase client could not be imported in handlers.catalog.")
-    supabase_client = None
+    print("CRITICAL: Repository could not be imported in handlers.catalog.")
+    repository = None
+
+from database.catalog_cache import catalog_cache # In-memory catalog snapshots, falls through to the repository
+from database.media_cache import media_cache # Telegram file_ids of product images
 
 from keyboards.inline import (
     get_categories_keyboard,
@@ -15,7 +19,7 @@ from keyboards.inline import (
     get_main_menu_keyboard # For a potential back to main menu from catalog top
 )
 from utils.localization import get_text
-from utils.helpers import paginate_items, format_product_details # format_price is used within format_product_details
+from utils.helpers import format_product_details # format_price is used within format_product_details
 
 router = Router()
 # Assuming middlewares (Localization, Database) are applied at the dispatcher level.
@@ -29,7 +33,7 @@ async def show_catalog_menu_callback_handler(callback: CallbackQuery, language:
     Displays the catalog menu, typically options to browse by categories, manufacturers, or search.
     The document example shows direct navigation to categories.
     """
-    if not supabase_client:
+    if not repository:
         await callback.message.answer(await get_text("error_db_connection", language, "DB error."))
         await callback.answer()
         return
@@ -46,7 +50,7 @@ async def show_catalog_menu_callback_handler(callback: CallbackQuery, language:
         # Fetch categories from Supabase
         # The example in SupabaseClient uses an RPC "get_categories_with_product_count"
         # Let's assume this RPC exists and returns categories with a 'name' field (localized or key) and 'id'.
-        categories = await supabase_client.get_categories_with_count(language) # Pass language for RPC
+        categories = await catalog_cache.get_categories_with_count(language) # Pass language for RPC
 
         if not categories:
             no_categories_text = await get_text("no_categories_found", language, "No categories available at the moment.")
@@ -54,8 +58,7 @@ async def show_catalog_menu_callback_handler(callback: CallbackQuery, language:
             await callback.answer()
             return
 
-        catalog_intro_text = await get_text("catalog_menu", language) # "🛍️ Product Catalog
-Choose how you'd like to browse:"
+        catalog_intro_text = await get_text("catalog_menu", language) # "🛍️ Product Catalog\nChoose how you'd like to browse:"
                                                                  # This text might be for a menu before listing categories.
                                                                  # If directly showing categories, a text like "choose_category" might be better.
 
@@ -85,10 +88,11 @@ Choose how you'd like to browse:"
 @router.callback_query(F.data.startswith("category_"))
 async def show_category_products_callback_handler(callback: CallbackQuery, language: str, state: FSMContext):
     """
-    Handles callbacks like "category_<category_id>_<page>".
-    Displays paginated products for the selected category.
+    Handles callbacks like "category_<category_id>_<page>[_<after_id>]".
+    Displays paginated products for the selected category. Only the requested page is fetched;
+    `after_id` (last product id of the previous page, set by the "Next" button) enables seek paging.
     """
-    if not supabase_client:
+    if not repository:
         await callback.message.answer(await get_text("error_db_connection", language, "DB error."))
         await callback.answer()
         return
@@ -97,12 +101,14 @@ async def show_category_products_callback_handler(callback: CallbackQuery, langu
         parts = callback.data.split("_")
         category_id = int(parts[1])
         page = int(parts[2]) if len(parts) > 2 else 0
+        after_id = int(parts[3]) if len(parts) > 3 else None
 
-        # Fetch products for the category
-        # get_products_by_category(category_id, language) is defined in SupabaseClient
-        all_products = await supabase_client.get_products_by_category(category_id, language)
+        # Fetch only the current page and the category total (one round-trip)
+        page_products, total_items = await catalog_cache.get_products_page(
+            category_id, language, page=page, items_per_page=ITEMS_PER_PAGE, after_id=after_id
+        )
 
-        if not all_products:
+        if not page_products and page == 0:
             no_products_text = await get_text("no_products_in_category", language)
             # It's better to edit the message to inform no products, rather than just an alert.
             # Let's provide a keyboard to go back.
@@ -111,15 +117,12 @@ async def show_category_products_callback_handler(callback: CallbackQuery, langu
             await callback.answer()
             return
 
-        # Paginate products
-        paginated_products = paginate_items(all_products, page, ITEMS_PER_PAGE)
-
-        if not paginated_products and page > 0: # page > 0 means they tried to go to a non-existent page
+        if not page_products: # page > 0 means they tried to go to a non-existent page
             page_error_text = await get_text("error_invalid_page", language, "Invalid page number.")
             await callback.answer(page_error_text, show_alert=True)
             return
-        # This case should be covered by `if not all_products` or `if not paginated_products and page > 0`
-        # elif not paginated_products and page == 0:
+        # This case should be covered by `if not page_products and page == 0` above
+        # elif not page_products and page == 0:
         #      no_products_text = await get_text("no_products_in_category", language)
         #      await callback.answer(no_products_text, show_alert=True)
         #      return
@@ -138,10 +141,10 @@ async def show_category_products_callback_handler(callback: CallbackQuery, langu
         text = await get_text("products_in_category", language) # "Products in this category:"
 
         products_kb = await get_products_keyboard(
-            products=paginated_products,
+            products=page_products,
             category_id=category_id,
             current_page=page,
-            total_items=len(all_products),
+            total_items=total_items,
             language_code=language,
             items_per_page=ITEMS_PER_PAGE
         )
@@ -157,13 +160,34 @@ async def show_category_products_callback_handler(callback: CallbackQuery, langu
         await callback.answer(error_msg, show_alert=True)
 
 
+async def _send_product_photo(callback: CallbackQuery, photo: str, caption: str, reply_markup):
+    """Shows a product photo (URL or file_id) in place of the current message. Returns the sent message."""
+    # If current message has a photo, edit media. Otherwise, delete and send new, or send new directly.
+    if callback.message.photo:
+        media = InputMediaPhoto(media=photo, caption=caption)
+        return await callback.message.edit_media(media, reply_markup=reply_markup)
+
+    # If previous message was text (e.g. product list), delete it and send a new photo message.
+    # This is a common pattern.
+    try:
+        await callback.message.delete()
+    except Exception as e_del:
+        print(f"Could not delete previous message: {e_del}") # Log and continue
+
+    return await callback.message.answer_photo(
+        photo=photo,
+        caption=caption,
+        reply_markup=reply_markup
+    )
+
+
 @router.callback_query(F.data.startswith("product_"))
 async def show_product_details_callback_handler(callback: CallbackQuery, language: str, state: FSMContext):
     """
     Handles callbacks like "product_<product_id>".
     Displays detailed information about the selected product.
     """
-    if not supabase_client:
+    if not repository:
         await callback.message.answer(await get_text("error_db_connection", language, "DB error."))
         await callback.answer()
         return
@@ -171,19 +195,15 @@ async def show_product_details_callback_handler(callback: CallbackQuery, languag
     try:
         product_id = int(callback.data.split("_")[1])
 
-        # Fetch product details
-        # get_product_details(product_id, language) defined in SupabaseClient
-        product = await supabase_client.get_product_details(product_id, language)
+        # Fetch product details and per-location stock in one DB round-trip
+        # (product from the catalog snapshot + live stock, or a single embedded select on a cache miss)
+        product, stock_info = await catalog_cache.get_product_with_stock(product_id, language)
 
         if not product:
             not_found_text = await get_text("product_not_found", language, "Product not found.")
             await callback.answer(not_found_text, show_alert=True)
             return
 
-        # Fetch stock information
-        # get_product_stock_all_locations(product_id) defined in SupabaseClient
-        stock_info = await supabase_client.get_product_stock_all_locations(product_id)
-
         # Format product details using helper
         # format_product_details(product, stock_info, language) is an async helper
         formatted_text = await format_product_details(product, stock_info, language)
@@ -203,23 +223,17 @@ async def show_product_details_callback_handler(callback: CallbackQuery, languag
         image_url = product.get("image_url")
 
         if image_url:
-            # If current message has a photo, edit media. Otherwise, delete and send new, or send new directly.
-            if callback.message.photo:
-                 media = InputMediaPhoto(media=image_url, caption=formatted_text)
-                 await callback.message.edit_media(media, reply_markup=product_kb)
-            else:
-                # If previous message was text (e.g. product list), delete it and send a new photo message.
-                # This is a common pattern.
-                try:
-                    await callback.message.delete()
-                except Exception as e_del:
-                    print(f"Could not delete previous message: {e_del}") # Log and continue
-
-                await callback.message.answer_photo(
-                    photo=image_url,
-                    caption=formatted_text,
-                    reply_markup=product_kb
-                )
+            # Reuse the file_id Telegram gave us for this image last time, if the URL hasn't changed
+            photo = media_cache.get_photo(product_id, image_url)
+            try:
+                sent = await _send_product_photo(callback, photo, formatted_text, product_kb)
+            except TelegramBadRequest:
+                if photo == image_url:
+                    raise
+                # Cached file_id no longer accepted; fall back to the URL and re-cache
+                media_cache.forget(product_id)
+                sent = await _send_product_photo(callback, image_url, formatted_text, product_kb)
+            media_cache.remember(product_id, image_url, sent)
         else:
             # No image, just edit the text
             await callback.message.edit_text(formatted_text, reply_markup=product_kb)
@@ -244,5 +258,3 @@ async def show_product_details_callback_handler(callback: CallbackQuery, languag
 #   to get_product_keyboard, which then constructs a callback like `category_<cat_id>_<last_page_of_product>`.
 #   This is a more advanced state/context management.
 #   For now, `get_product_keyboard` has a generic "back to catalog (categories list)" button.
-
-```
@@ -0,0 +1,99 @@
+from aiogram import Router
+from aiogram.types import (
+    InlineQuery,
+    InlineQueryResultArticle,
+    InlineQueryResultCachedPhoto,
+    InputTextMessageContent,
+)
+
+try:
+    from database.backend import repository # Catalog reads: Supabase or the local SQLite replica
+except ImportError:
+    print("CRITICAL: Repository could not be imported in handlers.search.")
+    repository = None
+
+from database.catalog_cache import catalog_cache
+from database.media_cache import media_cache
+from utils.cache import TTLCache
+from utils.helpers import format_price
+
+router = Router()
+
+# Inline mode (`@bot query` in any chat) must be enabled for the bot via @BotFather (/setinline).
+
+INLINE_RESULTS_PER_PAGE = 20 # Telegram allows up to 50 results per answer
+INLINE_MAX_RESULTS = 100 # Results kept per query; deeper pages are not served
+INLINE_CACHE_TIME = 60 # Seconds Telegram may cache an answer on its side
+
+# Ranked results per (language, lowercased query); both the search index and the ilike
+# fallback are case-insensitive. Inline queries fire on every keystroke
+# and each next_offset page re-sends the same query, so most lookups are repeats.
+search_results_cache = TTLCache(maxsize=2000, ttl=INLINE_CACHE_TIME)
+
+
+def _product_name(product: dict) -> str:
+    localization = product.get("product_localization") or {}
+    if isinstance(localization, list):
+        localization = localization[0] if localization else {}
+    return localization.get("name") or product.get("name") or "Unnamed Product"
+
+
+async def _build_result(product: dict, language: str):
+    name = _product_name(product)
+    price_str = await format_price(float(product.get("price", 0)), language=language)
+    manufacturer = (product.get("manufacturers") or {}).get("name")
+    description = f"{manufacturer} · {price_str}" if manufacturer else price_str
+    text = f"{name}\n{description}"
+
+    image_url = product.get("image_url")
+    file_id = media_cache.get_file_id(product["id"], image_url) if image_url else None
+    if file_id:
+        # Photo Telegram already has: no download of image_url needed
+        return InlineQueryResultCachedPhoto(
+            id=str(product["id"]),
+            photo_file_id=file_id,
+            title=name,
+            description=description,
+            caption=text,
+        )
+    return InlineQueryResultArticle(
+        id=str(product["id"]),
+        title=name,
+        description=description,
+        thumbnail_url=image_url,
+        input_message_content=InputTextMessageContent(message_text=text),
+    )
+
+
+@router.inline_query()
+async def inline_search_handler(inline_query: InlineQuery, language: str):
+    """
+    Serves `@bot <query>` product lookups from the in-memory search index.
+    Results are paged with next_offset; `offset` is the index of the first result.
+    """
+    query = inline_query.query.strip()
+    if not query or not repository:
+        await inline_query.answer([], cache_time=INLINE_CACHE_TIME, is_personal=True)
+        return
+
+    try:
+        offset = int(inline_query.offset) if inline_query.offset else 0
+    except ValueError:
+        offset = 0
+
+    try:
+        cache_key = (language, query.lower())
+        products = search_results_cache.get(cache_key)
+        if products is None:
+            products = await catalog_cache.search_products(query, language, limit=INLINE_MAX_RESULTS)
+            search_results_cache.set(cache_key, products)
+
+        page = products[offset:offset + INLINE_RESULTS_PER_PAGE]
+        results = [await _build_result(product, language) for product in page]
+        next_offset = str(offset + INLINE_RESULTS_PER_PAGE) if offset + INLINE_RESULTS_PER_PAGE < len(products) else ""
+
+        # Results depend on the user's language, so Telegram must not share them across users.
+        await inline_query.answer(results, cache_time=INLINE_CACHE_TIME, is_personal=True, next_offset=next_offset)
+    except Exception as e:
+        print(f"Error in inline_search_handler: {e}")
+        await inline_query.answer([], cache_time=1, is_personal=True)
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.filters import CommandStart
@@ -14,8 +16,10 @@ except ImportError:
     print("CRITICAL: Supabase client could not be imported in handlers.start.")
     supabase_client = None
 
+from database.cart_store import cart_store
 from keyboards.inline import get_language_keyboard, get_main_menu_keyboard
 from utils.localization import get_text
+from utils.cache import user_cache
 
 router = Router()
 
@@ -27,11 +31,12 @@ router = Router()
 # For now, assuming middlewares are registered at the Dispatcher level in main.py
 
 @router.message(CommandStart())
-async def start_command_handler(message: Message, state: FSMContext, language: str): # Added language from middleware
+async def start_command_handler(message: Message, state: FSMContext, language: str,
+                                db_user: Optional[dict] = None): # language and db_user from middleware
     """
     Handles the /start command.
     Checks if the user exists. If new, prompts for language. If existing, shows main menu.
-    The 'language' parameter is expected to be injected by LocalizationMiddleware.
+    The 'language' and 'db_user' parameters are expected to be injected by LocalizationMiddleware.
     """
     if not supabase_client:
         await message.answer("Error: Bot database connection is not configured. Please contact admin.")
@@ -41,7 +46,7 @@ async def start_command_handler(message: Message, state: FSMContext, language: s
     user_first_name = message.from_user.first_name
 
     try:
-        user = await supabase_client.get_user(user_telegram_id)
+        user = db_user # Already loaded (and cached) by LocalizationMiddleware
 
         if not user:
             # New user - offer language choice
@@ -59,7 +64,9 @@ async def start_command_handler(message: Message, state: FSMContext, language: s
             user_lang = user.get("language_code", language) # Fallback to middleware language if DB is weird
 
             welcome_text = await get_text("welcome_back", user_lang)
-            main_menu_keyboard = await get_main_menu_keyboard(user_lang) # Fetches texts internally
+            # Cart count from the user's cart session: loaded once, then kept up to date in memory
+            cart_count = await cart_store.count(user_telegram_id)
+            main_menu_keyboard = await get_main_menu_keyboard(user_lang, cart_count=cart_count) # Fetches texts internally
 
             await message.answer(
                 text=welcome_text.format(name=user_first_name),
@@ -72,7 +79,8 @@ async def start_command_handler(message: Message, state: FSMContext, language: s
         await message.answer(error_msg)
 
 @router.callback_query(F.data.startswith("lang_"))
-async def set_language_callback_handler(callback: CallbackQuery, state: FSMContext, language: str): # Added language from middleware
+async def set_language_callback_handler(callback: CallbackQuery, state: FSMContext, language: str,
+                                        db_user: Optional[dict] = None): # language and db_user from middleware
     """
     Handles language selection from the inline keyboard.
     Creates or updates the user with the selected language.
@@ -87,15 +95,17 @@ async def set_language_callback_handler(callback: CallbackQuery, state: FSMConte
     user_first_name = callback.from_user.first_name
 
     try:
-        user = await supabase_client.get_user(user_telegram_id)
+        user = db_user
+        cart_count = 0 # A user registering now has no cart yet
         if not user:
-            await supabase_client.create_user(user_telegram_id, selected_language)
+            user = await supabase_client.create_user(user_telegram_id, selected_language)
         else:
+            cart_count = await cart_store.count(user_telegram_id)
             # User exists, update their language preference
-            # Direct update using supabase_client.client as per document example
-            await supabase_client.client.table("users").update({
-                "language_code": selected_language
-            }).eq("telegram_id", user_telegram_id).execute()
+            updated_user = await supabase_client.update_user_language(user_telegram_id, selected_language)
+            user = updated_user or {**user, "language_code": selected_language}
+        # Write through so the middleware picks up the new language without re-querying
+        user_cache.set(user_telegram_id, user)
 
         # Update the language in the current context for immediate effect if needed by subsequent code
         # data['language'] = selected_language # If we could modify middleware data; not standard.
@@ -103,7 +113,7 @@ async def set_language_callback_handler(callback: CallbackQuery, state: FSMConte
 
         welcome_text_key = "welcome_new_user" # Or "language_selection_confirmed"
         welcome_text = await get_text(welcome_text_key, selected_language)
-        main_menu_keyboard = await get_main_menu_keyboard(selected_language) # Pass selected_language
+        main_menu_keyboard = await get_main_menu_keyboard(selected_language, cart_count=cart_count)
 
         # Edit the message that had the language buttons
         await callback.message.edit_text(
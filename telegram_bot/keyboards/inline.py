@@ -32,19 +32,27 @@ def get_language_keyboard() -> InlineKeyboardMarkup:
 
 async def get_main_menu_keyboard(
     language_code: str, # To potentially fetch texts if not passed
-    button_texts: Optional[dict] = None # Pre-fetched texts
+    button_texts: Optional[dict] = None, # Pre-fetched texts
+    cart_count: int = 0 # Items in the user's cart (cart_store.count(), kept in memory)
 ) -> InlineKeyboardMarkup:
-    from utils.localization import get_text # Local import
+    from utils.localization import get_texts # Local import
 
-    # If button_texts are not provided, fetch them.
+    # If button_texts are not provided, fetch them (all in one lookup).
     # This makes the keyboard function async.
     if button_texts is None:
+        texts = await get_texts({
+            "catalog_button": None,
+            "cart_button": "🛒 Cart ({count})",
+            "orders_button": None,
+            "settings_button": None,
+            "help_button": None,
+        }, language_code)
         button_texts = {
-            "catalog": await get_text("catalog_button", language_code),
-            "cart": await get_text("cart_button", language_code, default="🛒 Cart ({count})").format(count=0), # Placeholder count
-            "orders": await get_text("orders_button", language_code),
-            "settings": await get_text("settings_button", language_code),
-            "help": await get_text("help_button", language_code),
+            "catalog": texts["catalog_button"],
+            "cart": texts["cart_button"].format(count=cart_count),
+            "orders": texts["orders_button"],
+            "settings": texts["settings_button"],
+            "help": texts["help_button"],
         }
 
     builder = InlineKeyboardBuilder()
@@ -80,14 +88,19 @@ async def get_categories_keyboard(
 
 # Placeholder for get_products_keyboard from catalog.py example
 async def get_products_keyboard(
-    products: List[dict], # List of product dicts
+    products: List[dict], # Product dicts of the current page only
     category_id: int,
     current_page: int,
-    total_items: int,
+    total_items: int, # Total products in the category (all pages)
     language_code: str,
     items_per_page: int = 5
 ) -> InlineKeyboardMarkup:
-    from utils.localization import get_text # Local import
+    from utils.localization import get_texts # Local import
+    texts = await get_texts({
+        "prev_page_button": "⬅️ Prev",
+        "next_page_button": "➡️ Next",
+        "back_button": "⬅️ Back",
+    }, language_code)
     builder = InlineKeyboardBuilder()
 
     for product in products:
@@ -102,21 +115,22 @@ async def get_products_keyboard(
     if total_pages > 1:
         pagination_buttons = []
         if current_page > 0:
-            prev_text = await get_text("prev_page_button", language_code, default="⬅️ Prev")
             pagination_buttons.append(
-                InlineKeyboardButton(text=prev_text, callback_data=f"category_{category_id}_{current_page - 1}")
+                InlineKeyboardButton(text=texts["prev_page_button"], callback_data=f"category_{category_id}_{current_page - 1}")
             )
         if current_page < total_pages - 1:
-            next_text = await get_text("next_page_button", language_code, default="➡️ Next")
+            # Carry the last id on this page so the next page can be fetched by seek instead of offset
+            next_callback = f"category_{category_id}_{current_page + 1}"
+            if products and products[-1].get('id') is not None:
+                next_callback += f"_{products[-1]['id']}"
             pagination_buttons.append(
-                InlineKeyboardButton(text=next_text, callback_data=f"category_{category_id}_{current_page + 1}")
+                InlineKeyboardButton(text=texts["next_page_button"], callback_data=next_callback)
             )
         if pagination_buttons:
             builder.row(*pagination_buttons)
 
-    back_button_text = await get_text("back_button", language_code, default="⬅️ Back")
     # Example: back to categories list; might need specific callback like "catalog" or "categories_menu"
-    builder.row(InlineKeyboardButton(text=back_button_text, callback_data="catalog")) # Or specific "show_categories"
+    builder.row(InlineKeyboardButton(text=texts["back_button"], callback_data="catalog")) # Or specific "show_categories"
     return builder.as_markup()
 
 # Placeholder for get_product_keyboard from catalog.py example
@@ -125,13 +139,16 @@ async def get_product_keyboard(
     stock_info: list, # To potentially offer choice of location for adding to cart
     language_code: str
 ) -> InlineKeyboardMarkup:
-    from utils.localization import get_text # Local import
+    from utils.localization import get_texts # Local import
+    texts = await get_texts({
+        "add_to_cart_button": "➕ Add to Cart",
+        "back_button": "⬅️ Back",
+    }, language_code)
     builder = InlineKeyboardBuilder()
 
     # Add to cart button - might need to select location if multiple stock locations
     # For simplicity, let's assume a general add to cart. Specific location selection could be another step.
-    add_to_cart_text = await get_text("add_to_cart_button", language_code, default="➕ Add to Cart")
-    builder.row(InlineKeyboardButton(text=add_to_cart_text, callback_data=f"addtocart_{product_id}")) # Needs location?
+    builder.row(InlineKeyboardButton(text=texts["add_to_cart_button"], callback_data=f"addtocart_{product_id}")) # Needs location?
 
     # If multiple locations, you might list them or ask user to choose one before adding to cart.
     # Example: if stock_info has multiple locations with quantity > 0
@@ -145,9 +162,61 @@ async def get_product_keyboard(
     #            callback_data=f"addtocart_{product_id}_{loc_id}"
     #        ))
 
-    back_button_text = await get_text("back_button", language_code, default="⬅️ Back")
     # Example: back to product list of its category. This requires category_id.
     # This information (like category_id) might need to be passed to this function or be part of product_details.
     # For now, a generic "back_to_catalog" or rely on state/previous message context.
-    builder.row(InlineKeyboardButton(text=back_button_text, callback_data="catalog")) # Needs to know where to go back
+    builder.row(InlineKeyboardButton(text=texts["back_button"], callback_data="catalog")) # Needs to know where to go back
+    return builder.as_markup()
+
+
+async def get_admin_orders_keyboard(
+    orders: List[dict], # Orders of the current page only
+    selected: List[int], # Ids of the selected orders (may include orders of other pages)
+    current_page: int,
+    has_next: bool,
+    language_code: str
+) -> InlineKeyboardMarkup:
+    from utils.localization import get_texts # Local import
+    texts = await get_texts({
+        "admin_select_page_button": "☑️ Select page",
+        "admin_clear_selection_button": "✖️ Clear",
+        "admin_approve_button": "✅ Approve ({count})",
+        "admin_reject_button": "❌ Reject ({count})",
+        "prev_page_button": "⬅️ Prev",
+        "next_page_button": "➡️ Next",
+    }, language_code)
+    builder = InlineKeyboardBuilder()
+
+    for order in orders:
+        mark = "☑️" if order["id"] in selected else "⬜"
+        created_at = (order.get("created_at") or "").split("T")[0]
+        builder.row(InlineKeyboardButton(
+            text=f"{mark} #{order['id']} · {float(order.get('total_amount') or 0):.2f} · {created_at}",
+            callback_data=f"admin_sel_{order['id']}"
+        ))
+
+    if orders:
+        builder.row(
+            InlineKeyboardButton(text=texts["admin_select_page_button"], callback_data="admin_sel_page"),
+            InlineKeyboardButton(text=texts["admin_clear_selection_button"], callback_data="admin_sel_none")
+        )
+
+    # Keyset pagination: Prev carries the first id of this page, Next the last one
+    pagination_buttons = []
+    if current_page > 0 and orders:
+        pagination_buttons.append(InlineKeyboardButton(
+            text=texts["prev_page_button"], callback_data=f"admin_prev_{current_page - 1}_{orders[0]['id']}"
+        ))
+    if has_next and orders:
+        pagination_buttons.append(InlineKeyboardButton(
+            text=texts["next_page_button"], callback_data=f"admin_orders_{current_page + 1}_{orders[-1]['id']}"
+        ))
+    if pagination_buttons:
+        builder.row(*pagination_buttons)
+
+    if selected:
+        builder.row(
+            InlineKeyboardButton(text=texts["admin_approve_button"].format(count=len(selected)), callback_data="admin_approve"),
+            InlineKeyboardButton(text=texts["admin_reject_button"].format(count=len(selected)), callback_data="admin_reject")
+        )
     return builder.as_markup()
@@ -6,13 +6,18 @@ from aiogram.utils.keyboard import ReplyKeyboardBuilder
 # but they can be useful for persistent actions.
 
 # Example: A main menu reply keyboard (less common if inline is preferred for navigation)
-async def get_main_reply_keyboard(language_code: str) -> ReplyKeyboardMarkup:
-    from utils.localization import get_text # Local import
+async def get_main_reply_keyboard(language_code: str, cart_count: int = 0) -> ReplyKeyboardMarkup:
+    from utils.localization import get_texts # Local import
 
-    # Texts should be fetched using get_text, similar to inline keyboards
-    catalog_text = await get_text("catalog_button", language_code, "🛍️ Catalog")
-    cart_text = await get_text("cart_button", language_code, "🛒 Cart").format(count=0) # Example
-    orders_text = await get_text("orders_button", language_code, "📋 My Orders")
+    # Texts are resolved in one lookup, similar to inline keyboards
+    texts = await get_texts({
+        "catalog_button": "🛍️ Catalog",
+        "cart_button": "🛒 Cart ({count})",
+        "orders_button": "📋 My Orders",
+    }, language_code)
+    catalog_text = texts["catalog_button"]
+    cart_text = texts["cart_button"].format(count=cart_count) # cart_store.count(), no query per render
+    orders_text = texts["orders_button"]
 
     builder = ReplyKeyboardBuilder()
     builder.row(KeyboardButton(text=catalog_text))
@@ -3,13 +3,18 @@ import logging
 import sys
 
 from aiogram import Bot, Dispatcher
+from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.enums import ParseMode
+from prometheus_client import start_http_server
 # from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application # For webhook
 # from aiohttp import web # For webhook
 
 # Import configurations
 try:
-    from config import BOT_TOKEN, DEBUG, WEBHOOK_URL, SUPABASE_URL # Check if SUPABASE_URL is needed here directly
+    from config import BOT_TOKEN, DEBUG, WEBHOOK_URL, SUPABASE_URL, METRICS_PORT, QUERY_TRACE_ENABLED, TELEGRAM_API_URL # Check if SUPABASE_URL is needed here directly
+    from config import SEND_GLOBAL_RATE, SEND_CHAT_RATE, SEND_CHAT_BURST, SEND_MAX_RETRIES
 except ImportError:
     print("CRITICAL: config.py not found or essential variables are missing.")
     sys.exit(1)
@@ -17,9 +22,21 @@ except ImportError:
 # Import middlewares
 from middlewares.localization import LocalizationMiddleware
 from middlewares.database import DatabaseMiddleware
+from middlewares.metrics import setup_metrics
+from middlewares.query_trace import QueryTraceMiddleware
+from utils.send_scheduler import SendScheduler
+
+# Interface texts and catalog caches (preloaded on startup by the warm-up)
+from utils.localization import localization_catalog
+from database.backend import repository
+from database.catalog_cache import catalog_cache
+from database.cart_store import cart_store
+from database.media_cache import media_cache
+from utils.notifications import order_notifier
+from utils.warmup import warmup
 
 # Import routers from handlers
-from handlers import start, catalog, cart, orders, settings # __init__.py in handlers should make these importable
+from handlers import start, catalog, cart, orders, settings, search, admin # __init__.py in handlers should make these importable
 
 # Import Supabase client instance to check availability (optional, for early exit)
 try:
@@ -39,22 +56,35 @@ logging.basicConfig(level=logging.INFO if not DEBUG else logging.DEBUG,
 logger = logging.getLogger(__name__)
 
 
-async def main() -> None:
-    if not BOT_TOKEN:
-        logger.critical("BOT_TOKEN is not configured in .env file. Bot cannot start.")
-        return
-
-    if not SUPABASE_URL and not supabase_client:
-        logger.warning("SUPABASE_URL is not configured. Database features will be unavailable.")
-    elif SUPABASE_URL and not supabase_client:
-        logger.error("SUPABASE_URL is configured, but Supabase client failed to initialize. Check credentials and connectivity.")
-        # Depending on how critical DB is, you might exit:
-        # return
-
-    # Initialize Bot instance with default parse mode which will be passed to all API calls
-    bot = Bot(token=BOT_TOKEN, parse_mode=ParseMode.HTML)
-
-    # Initialize Dispatcher
+async def on_shutdown_close_db() -> None:
+    """Releases the Supabase worker pool when the dispatcher stops."""
+    if supabase_client:
+        supabase_client.close()
+
+
+def create_bot(senders: int = 1, **kwargs) -> Bot:
+    """
+    Bot with HTML as the default parse mode and the outgoing SendScheduler; kwargs (e.g. `session`) go to Bot().
+    `senders` is the number of processes sending for this token (the webhook worker pool's size).
+    """
+    if TELEGRAM_API_URL and "session" not in kwargs:
+        kwargs["session"] = AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_URL))
+    # aiogram >= 3.7 takes defaults via DefaultBotProperties instead of Bot(parse_mode=...)
+    bot = Bot(token=BOT_TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML), **kwargs)
+    if SEND_GLOBAL_RATE > 0:
+        # Every process sending for this token gets its share of the global limit
+        bot.session.middleware(SendScheduler(
+            global_rate=SEND_GLOBAL_RATE / max(1, senders), chat_rate=SEND_CHAT_RATE,
+            chat_burst=SEND_CHAT_BURST, max_retries=SEND_MAX_RETRIES,
+        ))
+    return bot
+
+
+def create_dispatcher() -> Dispatcher:
+    """
+    Dispatcher with all middlewares, startup/shutdown hooks and routers registered.
+    Shared by polling (main), webhook.py and the offline load test (benchmarks/loadtest.py).
+    """
     dp = Dispatcher()
 
     # Register middlewares
@@ -66,6 +96,27 @@ async def main() -> None:
     # Let's ensure they are registered.
     dp.update.middleware(DatabaseMiddleware()) # To pass supabase_client via data if needed by handlers
     dp.update.middleware(LocalizationMiddleware()) # To pass language_code via data
+    setup_metrics(dp) # Prometheus: per-update/handler latency, Supabase calls, cache hit ratios
+    if QUERY_TRACE_ENABLED:
+        dp.update.outer_middleware(QueryTraceMiddleware()) # Logs per-update query traces (N+1, over budget, slow)
+
+    # Concurrent initial loads (texts, replica sync, catalog, locations, hot stock, media) before any
+    # update is handled; the refresh loops below start afterwards without loading again
+    dp.startup.register(warmup.run)
+    dp.shutdown.register(warmup.stop)
+    dp.startup.register(localization_catalog.start)
+    dp.shutdown.register(localization_catalog.stop)
+    if repository:
+        # SQLite replica (no-op for the plain Supabase backend), started by the warm-up
+        dp.shutdown.register(repository.stop)
+    dp.startup.register(catalog_cache.start)
+    dp.shutdown.register(catalog_cache.stop)
+    dp.shutdown.register(media_cache.stop)
+    dp.startup.register(order_notifier.start)
+    dp.shutdown.register(order_notifier.stop)
+    dp.startup.register(cart_store.start)
+    dp.shutdown.register(cart_store.stop) # Final cart flush, before the Supabase pool is closed
+    dp.shutdown.register(on_shutdown_close_db)
 
     # Register routers
     logger.info("Registering routers...")
@@ -79,8 +130,38 @@ async def main() -> None:
     logger.info("Included orders router.")
     dp.include_router(settings.router)
     logger.info("Included settings router.")
+    dp.include_router(search.router)
+    logger.info("Included search (inline mode) router.")
+    dp.include_router(admin.router)
+    logger.info("Included admin router.")
     logger.info("All routers registered.")
 
+    return dp
+
+
+async def main() -> None:
+    if not BOT_TOKEN:
+        logger.critical("BOT_TOKEN is not configured in .env file. Bot cannot start.")
+        return
+
+    if not SUPABASE_URL and not supabase_client:
+        logger.warning("SUPABASE_URL is not configured. Database features will be unavailable.")
+    elif SUPABASE_URL and not supabase_client:
+        logger.error("SUPABASE_URL is configured, but Supabase client failed to initialize. Check credentials and connectivity.")
+        # Depending on how critical DB is, you might exit:
+        # return
+
+    # Initialize Bot instance with default parse mode which will be passed to all API calls
+    bot = create_bot()
+
+    # Initialize Dispatcher
+    dp = create_dispatcher()
+
+    if METRICS_PORT:
+        # No web app in polling mode, so serve /metrics from prometheus_client's own HTTP server
+        start_http_server(METRICS_PORT)
+        logger.info(f"Prometheus metrics available on port {METRICS_PORT} (/metrics).")
+
     # Decide polling or webhook based on WEBHOOK_URL in config
     if WEBHOOK_URL:
         logger.info(f"Starting bot in webhook mode. URL: {WEBHOOK_URL}")
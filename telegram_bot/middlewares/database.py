@@ -9,8 +9,10 @@ from aiogram.types import TelegramObject
 # Assuming supabase_client is globally available from database.supabase_client
 try:
     from database.supabase_client import supabase_client
+    from database.backend import repository
 except ImportError:
     supabase_client = None # Or handle error
+    repository = None
 
 class DatabaseMiddleware(BaseMiddleware):
     async def __call__(
@@ -27,6 +29,7 @@ class DatabaseMiddleware(BaseMiddleware):
             # or skip injecting if it's optional for some handlers.
             print("Warning: Supabase client not available in DatabaseMiddleware.")
             data["supabase_client"] = None
+        data["repository"] = repository # Catalog reads (Supabase or the local SQLite replica)
 
         # You could also manage session lifecycle here if using something like SQLAlchemy
         # async with db_session_context() as session:
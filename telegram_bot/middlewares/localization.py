@@ -12,6 +12,10 @@ except ImportError:
     print("CRITICAL: Supabase client could not be imported in LocalizationMiddleware.")
     supabase_client = None
 
+from utils.cache import user_cache
+
+_NOT_CACHED = object()
+
 class LocalizationMiddleware(BaseMiddleware):
     async def __call__(
         self,
@@ -22,21 +26,29 @@ class LocalizationMiddleware(BaseMiddleware):
         user: Optional[User] = data.get("event_from_user")
 
         language_code = "en" # Default language
+        db_user = None
 
         if user and supabase_client:
-            try:
-                db_user = await supabase_client.get_user(user.id)
-                if db_user and db_user.get("language_code"):
-                    language_code = db_user["language_code"]
-                # If db_user is None (new user not yet in DB), they might not have a language_code set.
-                # The start handler usually handles creating the user and setting initial language.
-                # So, for a very first interaction, language might default to 'en' here,
-                # which is fine as language selection is typically the first step.
-            except Exception as e:
-                print(f"Error fetching user language in LocalizationMiddleware: {e}")
-                # Keep default language_code if error occurs
+            # The users row is served from the per-process cache; handlers that change it
+            # (see handlers/start.py) write through, so steady-state updates do no user queries.
+            db_user = user_cache.get(user.id, _NOT_CACHED)
+            if db_user is _NOT_CACHED:
+                db_user = None
+                try:
+                    db_user = await supabase_client.get_user(user.id)
+                    user_cache.set(user.id, db_user) # None is cached too: "not registered yet"
+                except Exception as e:
+                    print(f"Error fetching user language in LocalizationMiddleware: {e}")
+                    # Keep default language_code if error occurs
+            if db_user and db_user.get("language_code"):
+                language_code = db_user["language_code"]
+            # If db_user is None (new user not yet in DB), they might not have a language_code set.
+            # The start handler usually handles creating the user and setting initial language.
+            # So, for a very first interaction, language might default to 'en' here,
+            # which is fine as language selection is typically the first step.
 
         data["language"] = language_code
+        data["db_user"] = db_user # The users row (or None), so handlers don't re-query it
         # print(f"[LocalizationMiddleware] User {user.id if user else 'Unknown'}, Language: {language_code}") # For debugging
 
         return await handler(event, data)
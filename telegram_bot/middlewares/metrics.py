@@ -0,0 +1,90 @@
+import time
+from typing import Callable, Dict, Any, Awaitable
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from utils.metrics import (
+    UPDATES_TOTAL, UPDATE_ERRORS_TOTAL, UPDATES_IN_FLIGHT, UPDATE_LATENCY,
+    HANDLER_LATENCY, HANDLER_ERRORS_TOTAL, handler_label
+)
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """
+    Outer middleware for dp.update: throughput, in-flight updates, total latency and
+    errors per update type. Register it first so it also times the other middlewares.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        update_type = event.event_type if isinstance(event, Update) else type(event).__name__.lower()
+        UPDATES_TOTAL.labels(update_type).inc()
+        UPDATES_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            UPDATE_ERRORS_TOTAL.labels(update_type).inc()
+            raise
+        finally:
+            UPDATE_LATENCY.labels(update_type).observe(time.perf_counter() - started)
+            UPDATES_IN_FLIGHT.dec()
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """
+    Inner middleware for the message / callback_query / inline_query observers: latency
+    and errors per matched handler, labelled by router module and callback prefix/command.
+    Inner middlewares on the dispatcher also apply to handlers of included routers.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        handler_object = data.get("handler")
+        callback = getattr(handler_object, "callback", None)
+        router = getattr(callback, "__module__", "unknown").rsplit(".", 1)[-1]
+        label = handler_label(event)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS_TOTAL.labels(router, label).inc()
+            raise
+        finally:
+            HANDLER_LATENCY.labels(router, label).observe(time.perf_counter() - started)
+
+
+def setup_metrics(dp) -> None:
+    """Registers the metrics middlewares, cache stats and SupabaseClient instrumentation on a dispatcher."""
+    from database.supabase_client import supabase_client
+    from database.backend import repository
+    from database.catalog_cache import catalog_cache
+    from database.cart_store import cart_store
+    from database.media_cache import media_cache
+    from handlers.search import search_results_cache
+    from utils.cache import user_cache
+    from utils.metrics import cache_stats, instrument_client
+
+    dp.update.outer_middleware(MetricsMiddleware())
+    handler_metrics = HandlerMetricsMiddleware()
+    dp.message.middleware(handler_metrics)
+    dp.callback_query.middleware(handler_metrics)
+    dp.inline_query.middleware(handler_metrics)
+
+    cache_stats.register("user", user_cache)
+    cache_stats.register("catalog", catalog_cache)
+    cache_stats.register("media", media_cache)
+    cache_stats.register("cart", cart_store) # Cart sessions served from memory vs loaded
+    cache_stats.register("inline_search", search_results_cache)
+    if repository is not None and repository is not supabase_client:
+        cache_stats.register("catalog_replica", repository) # Catalog reads served locally vs by Supabase
+
+    instrument_client(supabase_client)
@@ -0,0 +1,30 @@
+from typing import Callable, Dict, Any, Awaitable
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from utils.metrics import handler_label
+from utils.query_trace import start_trace, finish_trace
+
+
+class QueryTraceMiddleware(BaseMiddleware):
+    """
+    Opt-in (QUERY_TRACE_ENABLED) outer middleware for dp.update: records every Supabase
+    query and get_text lookup issued while handling an update, and logs the trace as one
+    JSON line when it exceeds QUERY_TRACE_BUDGET queries, repeats an identical query
+    (N+1 pattern) or takes longer than QUERY_TRACE_SLOW_MS.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        if isinstance(event, Update):
+            token = start_trace(event.update_id, event.event_type, handler_label(event.event))
+        else:
+            token = start_trace(None, type(event).__name__.lower(), handler_label(event))
+        try:
+            return await handler(event, data)
+        finally:
+            finish_trace(token)
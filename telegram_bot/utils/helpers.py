@@ -32,7 +32,13 @@ async def format_product_details(product: dict, stock_info: list, language: str)
     Formats product details for display.
     (Placeholder - needs actual implementation based on product structure and desired output)
     """
-    from .localization import get_text # Local import to avoid circular dependency at module level
+    from .localization import get_texts # Local import to avoid circular dependency at module level
+
+    texts = await get_texts({
+        "product_details_template": "{name}\n\n{description}\n\nPrice: {price}\n\nStock:\n{stock_list}",
+        "product_stock_line": "{location_name}: {quantity} units",
+        "stock_unavailable": "Stock information unavailable",
+    }, language)
 
     name = product.get('name', 'N/A')
     if product.get('product_localization'):
@@ -44,20 +50,16 @@ async def format_product_details(product: dict, stock_info: list, language: str)
 
     price_str = await format_price(float(product.get('price', 0)), language=language) # Assuming price needs currency based on lang
 
-    details_text = await get_text("product_details_template", language,
-                                default="{name}\n\n{description}\n\nPrice: {price}\n\nStock:\n{stock_list}")
-
     stock_lines = []
     if stock_info:
         for stock_item in stock_info:
             loc_name = stock_item.get('locations', {}).get('name', 'Unknown Location')
             qty = stock_item.get('quantity', 0)
-            stock_line = await get_text("product_stock_line", language, default="{location_name}: {quantity} units")
-            stock_lines.append(stock_line.format(location_name=loc_name, quantity=qty))
+            stock_lines.append(texts["product_stock_line"].format(location_name=loc_name, quantity=qty))
     else:
-        stock_lines.append(await get_text("stock_unavailable", language, default="Stock information unavailable"))
+        stock_lines.append(texts["stock_unavailable"])
 
-    return details_text.format(
+    return texts["product_details_template"].format(
         name=name,
         description=description,
         price=price_str,
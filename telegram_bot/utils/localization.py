@@ -1,5 +1,8 @@
+import asyncio
 import json
-from typing import Optional
+import os
+import time
+from typing import Dict, Iterable, Mapping, Optional, Union
 # Assuming supabase_client is initialized in database.supabase_client
 # and can be imported.
 # If supabase_client is None due to initialization error, this will also fail.
@@ -8,49 +11,157 @@ try:
     from database.supabase_client import supabase_client
 except ImportError:
     # This is a fallback or could indicate a circular dependency or init issue.
-    # For now, we'll allow it to be None and handle it in get_text.
+    # For now, we'll allow it to be None and the catalog will serve the bundled locale files only.
     supabase_client = None
 
-# Fallback local cache for texts if DB fails or for overrides
-# This part is not in the original document but can be useful.
-# For now, we'll stick to the document's direct DB approach.
-# loaded_texts = {}
+try:
+    from config import LOCALIZATION_REFRESH_INTERVAL
+except ImportError:
+    LOCALIZATION_REFRESH_INTERVAL = float(os.getenv("LOCALIZATION_REFRESH_INTERVAL", "300"))
 
-# def load_texts_from_json(language_code: str):
-#     global loaded_texts
-#     try:
-#         with open(f"locales/{language_code}.json", "r", encoding="utf-8") as f:
-#             loaded_texts[language_code] = json.load(f)
-#     except FileNotFoundError:
-#         loaded_texts[language_code] = {}
-#         print(f"Warning: Locale file for {language_code}.json not found.")
+from utils.query_trace import record_text_lookup
 
-async def get_text(key: str, language_code: str = "en", default: Optional[str] = None) -> str:
+SUPPORTED_LANGUAGES = ("en", "ru", "pl")
+LOCALES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "locales")
+
+
+class LocalizationCatalog:
     """
-    Fetches a localized text string from Supabase based on its key and language.
-    Falls back to the key itself or a provided default if not found.
+    In-process catalog of interface texts: {language_code: {key: text}}.
+
+    The bundled locales/*.json files are loaded first as a fallback, then the whole
+    `interface_text` table is loaded from Supabase on top of them (DB wins).
+    Lookups never touch the network; the DB copy is refreshed in the background
+    every `refresh_interval` seconds, or immediately via `refresh()` (e.g. after
+    texts were edited in the admin panel).
     """
-    if supabase_client:
+
+    def __init__(self, languages=SUPPORTED_LANGUAGES, refresh_interval: float = LOCALIZATION_REFRESH_INTERVAL):
+        self.languages = tuple(languages)
+        self.refresh_interval = refresh_interval
+        self.version = 0 # Incremented on every successful DB load
+        self.loaded_at: Optional[float] = None
+        self._texts: Dict[str, Dict[str, str]] = {}
+        self._missing: Dict[str, set] = {} # Keys already looked up in the DB without a result
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.load_local()
+
+    def load_local(self):
+        """Loads the bundled locales/<lang>.json files as the base layer."""
+        for language_code in self.languages:
+            try:
+                with open(os.path.join(LOCALES_DIR, f"{language_code}.json"), "r", encoding="utf-8") as f:
+                    self._texts[language_code] = json.load(f)
+            except FileNotFoundError:
+                self._texts[language_code] = {}
+                print(f"Warning: Locale file for {language_code}.json not found.")
+            except json.JSONDecodeError as e:
+                self._texts[language_code] = {}
+                print(f"Warning: Locale file {language_code}.json is invalid: {e}")
+
+    async def refresh(self) -> bool:
+        """
+        Reloads all interface texts from Supabase in a single query and swaps them in.
+        Returns False (keeping the current texts) if the DB is unavailable.
+        """
+        if not supabase_client:
+            return False
         try:
-            # The get_interface_text method in SupabaseClient already handles fallback to key
-            text = await supabase_client.get_interface_text(key, language_code)
-            # If text is the key itself (meaning not found in DB), and a default is provided, use default.
-            if text == key and default is not None:
-                return default
-            return text
+            rows = await supabase_client.get_all_interface_texts()
         except Exception as e:
-            print(f"Error fetching text '{key}' for lang '{language_code}' from Supabase: {e}")
-            # Fallback to key or default if Supabase call fails
-            return default if default is not None else key
-    else:
-        # Supabase client not available, fallback to key or default
-        print(f"Warning: Supabase client not available for get_text (key: {key}, lang: {language_code}).")
-        # Optionally, could try loading from local JSON files here as a further fallback.
-        # if not loaded_texts.get(language_code):
-        #     load_texts_from_json(language_code)
-        # return loaded_texts.get(language_code, {}).get(key, default if default is not None else key)
+            print(f"Error loading interface texts from Supabase: {e}")
+            return False
+
+        # Build new dicts and swap them in one assignment so readers never see a half-loaded catalog.
+        texts = {language_code: dict(self._texts.get(language_code, {})) for language_code in self.languages}
+        for row in rows or []:
+            key = row.get("key")
+            if not key:
+                continue
+            for language_code in self.languages:
+                value = row.get(f"text_{language_code}")
+                if value:
+                    texts[language_code][key] = value
+        self._texts = texts
+        self._missing = {}
+        self.version += 1
+        self.loaded_at = time.monotonic()
+        return True
+
+    def get(self, key: str, language_code: str = "en", default: Optional[str] = None) -> str:
+        text = self._texts.get(language_code, {}).get(key)
+        if text is not None:
+            return text
         return default if default is not None else key
 
+    async def get_many(self, keys: Mapping[str, Optional[str]], language_code: str = "en") -> Dict[str, str]:
+        """
+        Resolves several keys at once; `keys` maps each key to its default (or None).
+        Keys missing from memory are only looked up in Supabase while the full table
+        hasn't been loaded yet, and then all of them in a single query.
+        """
+        texts = self._texts.get(language_code, {})
+        missing = [key for key in keys if key not in texts and key not in self._missing.get(language_code, ())]
+        if missing and self.version == 0 and supabase_client:
+            try:
+                fetched = await supabase_client.get_interface_texts(missing, language_code)
+            except Exception as e:
+                print(f"Error fetching texts {missing} for lang '{language_code}' from Supabase: {e}")
+            else:
+                self._texts.setdefault(language_code, {}).update(fetched)
+                self._missing.setdefault(language_code, set()).update(key for key in missing if key not in fetched)
+        return {key: self.get(key, language_code, default) for key, default in keys.items()}
+
+    async def start(self):
+        """
+        Initial load (unless the startup warm-up already did it) plus the background refresh
+        loop. Registered as a dispatcher startup hook.
+        """
+        if self.loaded_at is None:
+            await self.refresh()
+        if self.refresh_interval > 0 and self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._refresh_task:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            await self.refresh()
+
+
+localization_catalog = LocalizationCatalog()
+
+
+async def get_text(key: str, language_code: str = "en", default: Optional[str] = None) -> str:
+    """
+    Returns a localized text string by key and language from the in-memory catalog.
+    Falls back to the key itself or a provided default if not found.
+    Kept async so existing callers don't change; no I/O is performed.
+    """
+    record_text_lookup(key, language_code)
+    return localization_catalog.get(key, language_code, default)
+
+
+async def get_texts(keys: Union[Iterable[str], Mapping[str, Optional[str]]], language_code: str = "en") -> Dict[str, str]:
+    """
+    Resolves all texts for a screen in one operation.
+    `keys` is either a list of keys or a dict of {key: default}; returns {key: text}.
+    Costs at most one DB query (only before the catalog's first full load).
+    """
+    if not isinstance(keys, Mapping):
+        keys = dict.fromkeys(keys)
+    for key in keys:
+        record_text_lookup(key, language_code)
+    return await localization_catalog.get_many(keys, language_code)
+
 # Example of how you might add more localization utility functions:
 # async def get_formatted_date(date_obj, language_code: str = "en"):
 #     # ... logic to format date based on language ...
@@ -0,0 +1,150 @@
+import functools
+import inspect
+import os
+import re
+import time
+from typing import Dict
+
+from aiohttp import web
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# Buckets in seconds, tuned for bot handlers / PostgREST calls (tens of ms to a few seconds)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+UPDATES_TOTAL = Counter("bot_updates_total", "Telegram updates received", ["update_type"])
+UPDATE_ERRORS_TOTAL = Counter("bot_update_errors_total", "Updates whose processing raised", ["update_type"])
+UPDATES_IN_FLIGHT = Gauge("bot_updates_in_flight", "Updates currently being processed")
+UPDATE_LATENCY = Histogram("bot_update_latency_seconds", "Total processing time per update",
+                           ["update_type"], buckets=LATENCY_BUCKETS)
+
+HANDLER_LATENCY = Histogram("bot_handler_latency_seconds", "Handler latency by router and callback/command",
+                            ["router", "handler"], buckets=LATENCY_BUCKETS)
+HANDLER_ERRORS_TOTAL = Counter("bot_handler_errors_total", "Handler exceptions by router and callback/command",
+                               ["router", "handler"])
+
+SUPABASE_CALLS_TOTAL = Counter("bot_supabase_calls_total", "SupabaseClient method calls", ["method"])
+SUPABASE_ERRORS_TOTAL = Counter("bot_supabase_errors_total", "SupabaseClient method calls that raised", ["method"])
+SUPABASE_LATENCY = Histogram("bot_supabase_latency_seconds", "SupabaseClient method latency",
+                             ["method"], buckets=LATENCY_BUCKETS)
+
+UPDATE_QUEUE_DEPTH = Gauge("bot_update_queue_depth", "Webhook updates waiting in the in-process queue")
+UPDATE_QUEUE_WAIT = Histogram("bot_update_queue_wait_seconds", "Time webhook updates spent queued before processing",
+                              buckets=LATENCY_BUCKETS)
+UPDATE_QUEUE_DROPPED = Counter("bot_update_queue_dropped_total",
+                               "Webhook updates not queued: shed (acknowledged and dropped) or rejected (503)",
+                               ["reason"])
+
+SEND_WAIT = Histogram("bot_send_wait_seconds", "Time outgoing Bot API requests waited for the rate limiter",
+                      buckets=LATENCY_BUCKETS + (30.0, 60.0))
+SEND_COALESCED = Counter("bot_send_coalesced_total", "Message edits folded into a later edit of the same message")
+SEND_RETRY_AFTER = Counter("bot_send_retry_after_total", "Bot API requests retried after a 429 flood-wait", ["method"])
+
+NOTIFICATIONS_TOTAL = Counter("bot_order_notifications_total",
+                              "Order status notifications by result (sent, retry, failed)", ["result"])
+NOTIFICATION_DELAY = Histogram("bot_order_notification_delay_seconds", "Time from status change to notification sent",
+                               buckets=(1.0, 5.0, 15.0, 30.0, 60.0, 300.0, 900.0, 3600.0))
+
+CART_FLUSHES = Counter("bot_cart_flushes_total", "Write-behind cart flushes by result (ok, error)", ["result"])
+CART_FLUSHED_LINES = Counter("bot_cart_flushed_lines_total", "Cart lines written to user_cart by flushes")
+CART_DROPPED_LINES = Counter("bot_cart_dropped_lines_total", "Cart lines the database refused, dropped by flushes")
+
+READY = Gauge("bot_ready", "1 once the startup warm-up has run, 0 while starting or shutting down")
+WARMUP_STEP_SECONDS = Gauge("bot_warmup_step_seconds", "Duration of each startup warm-up step", ["step"])
+
+_TRAILING_IDS_RE = re.compile(r"(_-?\d+)+$")
+
+
+def handler_label(event) -> str:
+    """
+    Low-cardinality label for an event: the callback data with trailing ids stripped
+    ("category_3_1" -> "category_"), the command for messages ("/start"), or the event type.
+    """
+    data = getattr(event, "data", None)
+    if isinstance(data, str):
+        return _TRAILING_IDS_RE.sub("_", data)
+    text = getattr(event, "text", None)
+    if isinstance(text, str) and text.startswith("/"):
+        return text.split(maxsplit=1)[0].split("@", 1)[0]
+    return type(event).__name__.lower()
+
+
+class CacheStatsCollector:
+    """Exposes hit/miss counters of the in-process caches, read at scrape time."""
+
+    def __init__(self):
+        self._caches: Dict[str, object] = {}
+
+    def register(self, name: str, cache):
+        """`cache` is anything with `hits` and `misses` attributes."""
+        self._caches[name] = cache
+
+    def collect(self):
+        hits = CounterMetricFamily("bot_cache_hits", "Cache hits", labels=["cache"])
+        misses = CounterMetricFamily("bot_cache_misses", "Cache misses", labels=["cache"])
+        ratio = GaugeMetricFamily("bot_cache_hit_ratio", "Cache hit ratio since start", labels=["cache"])
+        for name, cache in self._caches.items():
+            cache_hits, cache_misses = cache.hits, cache.misses
+            total = cache_hits + cache_misses
+            hits.add_metric([name], cache_hits)
+            misses.add_metric([name], cache_misses)
+            ratio.add_metric([name], cache_hits / total if total else 0.0)
+        yield hits
+        yield misses
+        yield ratio
+
+
+cache_stats = CacheStatsCollector()
+REGISTRY.register(cache_stats)
+
+
+def instrument_client(client):
+    """
+    Wraps every public coroutine method of a SupabaseClient instance to record call
+    counts, errors and latency per method. Safe to call more than once.
+    """
+    if client is None or getattr(client, "_metrics_instrumented", False):
+        return client
+    for name, method in inspect.getmembers(client, inspect.iscoroutinefunction):
+        if name.startswith("_"):
+            continue
+        setattr(client, name, _timed(name, method))
+    client._metrics_instrumented = True
+    return client
+
+
+def _timed(name: str, method):
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        SUPABASE_CALLS_TOTAL.labels(name).inc()
+        started = time.perf_counter()
+        try:
+            return await method(*args, **kwargs)
+        except Exception:
+            SUPABASE_ERRORS_TOTAL.labels(name).inc()
+            raise
+        finally:
+            SUPABASE_LATENCY.labels(name).observe(time.perf_counter() - started)
+    return wrapper
+
+
+def render_metrics() -> bytes:
+    """
+    This process' metrics in Prometheus text format or, when PROMETHEUS_MULTIPROC_DIR is set
+    (multi-worker webhook mode), the metrics of all worker processes aggregated.
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+async def metrics_view(request: web.Request) -> web.Response:
+    """aiohttp handler for GET /metrics (Prometheus text format)."""
+    response = web.Response(body=render_metrics())
+    response.content_type = CONTENT_TYPE_LATEST.split(";")[0]
+    response.charset = "utf-8"
+    return response
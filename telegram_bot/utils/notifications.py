@@ -0,0 +1,197 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+
+from database.backend import repository
+from utils.localization import localization_catalog
+from utils.metrics import NOTIFICATION_DELAY, NOTIFICATIONS_TOTAL
+from utils.send_scheduler import TokenBucket
+
+try:
+    from config import NOTIFY_RATE, NOTIFY_BATCH_SIZE, NOTIFY_POLL_INTERVAL, NOTIFY_MAX_ATTEMPTS
+except ImportError:
+    NOTIFY_RATE = float(os.getenv("NOTIFY_RATE", "20"))
+    NOTIFY_BATCH_SIZE = int(os.getenv("NOTIFY_BATCH_SIZE", "50"))
+    NOTIFY_POLL_INTERVAL = float(os.getenv("NOTIFY_POLL_INTERVAL", "10"))
+    NOTIFY_MAX_ATTEMPTS = int(os.getenv("NOTIFY_MAX_ATTEMPTS", "5"))
+
+logger = logging.getLogger(__name__)
+
+LEASE_SECONDS = 300 # A claimed batch not settled within this time is delivered again
+RETRY_BACKOFF = 30.0 # Seconds before the first retry of a failed delivery, doubled per attempt
+CONCURRENCY = 10 # Notifications being sent at the same time
+
+
+class OrderNotifier:
+    """
+    Delivers order status notifications from the order_notifications outbox
+    (database/sql/order_notifications.sql), which a trigger fills on every status change.
+
+    Due rows are claimed in batches with a lease, rendered in the customer's language and
+    sent at most `rate` per second (on top of the bot's SendScheduler, leaving room for
+    interactive traffic). Each row is marked sent right after its message went out, so a
+    restart re-sends at most the messages whose mark was lost. Delivery errors are retried
+    with exponential backoff; blocked bots and unknown chats fail at once.
+    """
+
+    def __init__(self, rate: float = NOTIFY_RATE, batch_size: int = NOTIFY_BATCH_SIZE,
+                 poll_interval: float = NOTIFY_POLL_INTERVAL, max_attempts: int = NOTIFY_MAX_ATTEMPTS):
+        self.rate = rate
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self.busy_seconds = 0.0 # Time spent delivering batches (for throughput)
+        self._bucket = TokenBucket(rate, rate)
+        self._templates: Dict[Tuple[str, str], str] = {}
+        self._templates_version = -1
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._bot: Optional[Bot] = None
+
+    async def transition(self, order_ids: Iterable[int], new_status: str, admin_notes: str = None,
+                         expected_status: str = None) -> list:
+        """
+        Changes the status of one or many orders in a single update (only those still in
+        `expected_status`, if given); the trigger enqueues their notifications, which are
+        then delivered right away instead of at the next poll. Returns the updated orders.
+        """
+        orders = await repository.update_orders_status(list(order_ids), new_status, admin_notes, expected_status)
+        self.wake()
+        return orders
+
+    def wake(self):
+        self._wake.set()
+
+    # Rendering
+
+    def render(self, notification: dict) -> str:
+        language = notification.get("language_code") or "en"
+        status = notification["status"]
+        if self._templates_version != localization_catalog.version:
+            self._templates = {} # Interface texts were reloaded
+            self._templates_version = localization_catalog.version
+        template = self._templates.get((language, status))
+        if template is None:
+            # Pre-fill the status so only the order id is formatted per message
+            status_text = localization_catalog.get(f"order_status_{status}", language, status.replace("_", " "))
+            template = localization_catalog.get(
+                "order_status_notification", language, "📦 Order #{order_id}: {status}"
+            ).replace("{status}", status_text)
+            self._templates[(language, status)] = template
+        return template.replace("{order_id}", str(notification["order_id"]))
+
+    # Delivery
+
+    async def start(self, bot: Bot):
+        """Starts the delivery loop. Registered as a dispatcher startup hook."""
+        self._bot = bot
+        if self.rate > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                delivered = await self.deliver_batch()
+            except ConnectionError as e:
+                logger.warning(f"Order notifications disabled: {e}")
+                return
+            except Exception as e:
+                logger.error(f"Error claiming order notifications: {e}")
+                delivered = 0
+            if delivered < self.batch_size: # Backlog is empty: wait for a wake-up or the next poll
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def deliver_batch(self) -> int:
+        """Claims and delivers one batch. Returns the number of notifications claimed."""
+        notifications = await repository.claim_order_notifications(self.batch_size, LEASE_SECONDS)
+        if not notifications:
+            return 0
+        started = time.perf_counter()
+        semaphore = asyncio.Semaphore(CONCURRENCY)
+
+        async def deliver(notification: dict):
+            async with semaphore:
+                await self._bucket.acquire()
+                await self._deliver(notification)
+
+        counts = (self.sent, self.retried, self.failed)
+        await asyncio.gather(*(deliver(notification) for notification in notifications))
+        elapsed = time.perf_counter() - started
+        self.busy_seconds += elapsed
+        sent, retried, failed = self.sent - counts[0], self.retried - counts[1], self.failed - counts[2]
+        logger.info(f"Order notifications: {sent} sent, {retried} to retry, {failed} failed "
+                    f"in {elapsed:.2f}s ({sent / elapsed:.1f}/s).")
+        return len(notifications)
+
+    async def _deliver(self, notification: dict):
+        try:
+            await self._bot.send_message(chat_id=notification["user_id"], text=self.render(notification))
+        except (TelegramForbiddenError, TelegramBadRequest) as e:
+            # Bot blocked, chat not found, ...: retrying will not help
+            await self._settle(notification, "failed", {"state": "failed", "last_error": str(e)[:500]})
+            return
+        except Exception as e:
+            attempts = notification.get("attempts", 0) + 1
+            if attempts >= self.max_attempts:
+                await self._settle(notification, "failed", {
+                    "state": "failed", "attempts": attempts, "last_error": str(e)[:500],
+                })
+            else:
+                next_attempt_at = datetime.now(timezone.utc) + timedelta(seconds=RETRY_BACKOFF * 2 ** (attempts - 1))
+                await self._settle(notification, "retry", {
+                    "attempts": attempts, "next_attempt_at": next_attempt_at.isoformat(), "last_error": str(e)[:500],
+                })
+            return
+        await self._settle(notification, "sent", {"state": "sent", "sent_at": datetime.now(timezone.utc).isoformat()})
+        created_at = notification.get("created_at")
+        if created_at:
+            NOTIFICATION_DELAY.observe(max(0.0, time.time() - datetime.fromisoformat(created_at).timestamp()))
+
+    async def _settle(self, notification: dict, result: str, values: dict):
+        values["claimed_until"] = None
+        if result == "sent":
+            self.sent += 1
+        elif result == "retry":
+            self.retried += 1
+        else:
+            self.failed += 1
+            logger.warning(f"Order notification {notification['id']} failed: {values.get('last_error')}")
+        NOTIFICATIONS_TOTAL.labels(result).inc()
+        try:
+            await repository.update_order_notification(notification["id"], values)
+        except Exception as e:
+            # The lease runs out and the notification is claimed again (sent twice if it went out)
+            logger.error(f"Error recording order notification {notification['id']} as {result}: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "sent": self.sent,
+            "retried": self.retried,
+            "failed": self.failed,
+            "throughput_per_second": round(self.sent / self.busy_seconds, 2) if self.busy_seconds else 0.0,
+        }
+
+
+order_notifier = OrderNotifier()
@@ -0,0 +1,128 @@
+import json
+import logging
+import os
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+from urllib.parse import unquote
+
+try:
+    from config import QUERY_TRACE_ENABLED, QUERY_TRACE_BUDGET, QUERY_TRACE_SLOW_MS
+except ImportError:
+    QUERY_TRACE_ENABLED = os.getenv("QUERY_TRACE_ENABLED", "False").lower() in ('true', '1', 't')
+    QUERY_TRACE_BUDGET = int(os.getenv("QUERY_TRACE_BUDGET", "3"))
+    QUERY_TRACE_SLOW_MS = float(os.getenv("QUERY_TRACE_SLOW_MS", "500"))
+
+logger = logging.getLogger("query_trace")
+
+# The trace of the update being processed in the current task (None when tracing is off).
+_current_trace: ContextVar[Optional["UpdateTrace"]] = ContextVar("query_trace", default=None)
+
+
+def describe_query(query) -> Dict[str, Any]:
+    """Table/RPC, HTTP method and filters of a postgrest request builder (tolerates older postgrest-py layouts)."""
+    config = getattr(query, "request", query)
+    path = str(getattr(config, "path", ""))
+    method = getattr(config, "http_method", "")
+    return {
+        "table": path.split("/rest/v1/", 1)[-1],
+        "method": getattr(method, "value", method),
+        "filters": unquote(str(getattr(config, "params", ""))),
+        "body": getattr(config, "json", None),
+    }
+
+
+class UpdateTrace:
+    """Every DB query and localization lookup issued while handling one Telegram update."""
+
+    def __init__(self, update_id: Optional[int], update_type: str, label: str):
+        self.update_id = update_id
+        self.update_type = update_type
+        self.label = label
+        self.started = time.perf_counter()
+        self.queries: List[Dict[str, Any]] = []
+        self.text_lookups: List[str] = []
+
+    def add_query(self, query, duration: float, response=None, error: Optional[BaseException] = None):
+        entry = describe_query(query)
+        entry["duration_ms"] = round(duration * 1000, 2)
+        data = getattr(response, "data", None)
+        entry["rows"] = len(data) if isinstance(data, list) else (1 if data else 0)
+        try:
+            entry["payload_bytes"] = len(json.dumps(data, default=str)) if data is not None else 0
+        except (TypeError, ValueError):
+            entry["payload_bytes"] = None
+        if error is not None:
+            entry["error"] = repr(error)
+        self.queries.append(entry)
+
+    def repeated_queries(self) -> List[Dict[str, Any]]:
+        """Queries issued more than once with the same table, method, filters and body."""
+        seen: Dict[str, int] = {}
+        for query in self.queries:
+            key = json.dumps([query["table"], query["method"], query["filters"], query["body"]], default=str, sort_keys=True)
+            seen[key] = seen.get(key, 0) + 1
+        return [
+            {"query": json.loads(key), "count": count}
+            for key, count in seen.items() if count > 1
+        ]
+
+    def report(self, budget: int, slow_ms: float) -> Optional[Dict[str, Any]]:
+        """The trace as a dict if it is over budget, has repeated queries or is slow; else None."""
+        total_ms = round((time.perf_counter() - self.started) * 1000, 2)
+        repeated = self.repeated_queries()
+        flags = []
+        if len(self.queries) > budget:
+            flags.append("over_query_budget")
+        if repeated:
+            flags.append("repeated_query")
+        if total_ms > slow_ms:
+            flags.append("slow_update")
+        if not flags:
+            return None
+        return {
+            "update_id": self.update_id,
+            "update_type": self.update_type,
+            "handler": self.label,
+            "flags": flags,
+            "total_ms": total_ms,
+            "db_ms": round(sum(query["duration_ms"] for query in self.queries), 2),
+            "query_count": len(self.queries),
+            "query_budget": budget,
+            "repeated": repeated,
+            "queries": self.queries,
+            "text_lookups": len(self.text_lookups),
+        }
+
+
+def current_trace() -> Optional[UpdateTrace]:
+    return _current_trace.get()
+
+
+def start_trace(update_id: Optional[int], update_type: str, label: str):
+    """Starts tracing the current update; returns a token for `finish_trace`."""
+    return _current_trace.set(UpdateTrace(update_id, update_type, label))
+
+
+def finish_trace(token, budget: int = QUERY_TRACE_BUDGET, slow_ms: float = QUERY_TRACE_SLOW_MS) -> Optional[Dict[str, Any]]:
+    """Ends the current trace, logging it as one JSON line if it was flagged."""
+    trace = _current_trace.get()
+    _current_trace.reset(token)
+    if trace is None:
+        return None
+    report = trace.report(budget, slow_ms)
+    if report is not None:
+        logger.warning(json.dumps(report, default=str, ensure_ascii=False))
+    return report
+
+
+def record_query(query, duration: float, response=None, error: Optional[BaseException] = None):
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_query(query, duration, response, error)
+
+
+def record_text_lookup(key: str, language_code: str):
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.text_lookups.append(f"{language_code}:{key}")
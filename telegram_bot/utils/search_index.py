@@ -0,0 +1,190 @@
+import bisect
+import heapq
+import re
+import unicodedata
+from typing import Dict, List, Set, Tuple
+
+# Field weights: a hit in the product name counts more than one in the manufacturer or description.
+NAME_WEIGHT = 3.0
+MANUFACTURER_WEIGHT = 2.0
+DESCRIPTION_WEIGHT = 1.0
+
+# Match quality multipliers per query token
+EXACT_MATCH = 1.0
+PREFIX_MATCH = 0.8
+FUZZY_MATCH = 0.6
+MIN_FUZZY_SIMILARITY = 0.4 # Trigram (Jaccard) similarity needed to count as a typo match
+# Short words share too few trigrams for that (a swap like 'appel' / 'apple' scores 0.25), so
+# words sharing any trigram also match within a few edits (insert, delete, substitute, swap
+# adjacent letters): one from 4 letters, two from 8. Query words under 3 letters only match
+# exactly or as a prefix.
+EDIT_DISTANCE_LIMITS = ((8, 2), (4, 1))
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+# Letters NFKD does not decompose into base + accent
+_TRANSLITERATE = str.maketrans({"ł": "l", "ø": "o", "ß": "ss", "ё": "е"})
+
+
+def normalize(text: str) -> str:
+    """
+    Lowercases and strips diacritics so 'Łódź' matches 'lodz'. Applied to both indexed
+    text and queries, so folding (e.g. Cyrillic й -> и) never causes a mismatch.
+    """
+    decomposed = unicodedata.normalize("NFKD", (text or "").lower().translate(_TRANSLITERATE))
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(normalize(text))
+
+
+def max_edits(token: str) -> int:
+    return next((edits for length, edits in EDIT_DISTANCE_LIMITS if len(token) >= length), 0)
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance between a and b, or limit + 1 once it exceeds `limit`."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous, current = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous, current = previous, current, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+    return current[-1]
+
+
+def trigrams(token: str) -> Set[str]:
+    padded = f" {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    """
+    In-process product search for one language.
+
+    An inverted index maps each token to {product_id: field weight}; a trigram index over
+    the vocabulary handles typos (words sharing at least one trigram with the query word,
+    within MIN_FUZZY_SIMILARITY or EDIT_DISTANCE_LIMITS), and a sorted vocabulary handles prefixes (the last word
+    of a query that is still being typed). Products can be added, replaced and removed
+    one at a time, so the index follows catalog changes without a full rebuild.
+    """
+
+    def __init__(self):
+        self._postings: Dict[str, Dict[int, float]] = {}
+        self._trigrams: Dict[str, Set[str]] = {}
+        self._trigram_counts: Dict[str, int] = {} # Number of distinct trigrams per vocabulary token
+        self._vocabulary: List[str] = [] # Sorted, for prefix lookups
+        self._product_tokens: Dict[int, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._product_tokens)
+
+    def add(self, product_id: int, name: str = "", description: str = "", manufacturer: str = ""):
+        """Indexes (or re-indexes) one product."""
+        self.remove(product_id)
+        weights: Dict[str, float] = {}
+        for text, weight in ((name, NAME_WEIGHT), (manufacturer, MANUFACTURER_WEIGHT), (description, DESCRIPTION_WEIGHT)):
+            for token in tokenize(text):
+                if weight > weights.get(token, 0.0):
+                    weights[token] = weight
+        for token, weight in weights.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                bisect.insort(self._vocabulary, token)
+                grams = trigrams(token)
+                self._trigram_counts[token] = len(grams)
+                for gram in grams:
+                    self._trigrams.setdefault(gram, set()).add(token)
+            postings[product_id] = weight
+        self._product_tokens[product_id] = set(weights)
+
+    def add_product(self, product: dict):
+        """Indexes a product row as returned by SupabaseClient (localization and manufacturer embedded)."""
+        localization = product.get("product_localization") or {}
+        if isinstance(localization, list):
+            localization = localization[0] if localization else {}
+        manufacturer = product.get("manufacturers") or {}
+        self.add(
+            product["id"],
+            name=localization.get("name") or product.get("name") or "",
+            description=localization.get("description") or "",
+            manufacturer=manufacturer.get("name") or "",
+        )
+
+    def remove(self, product_id: int):
+        for token in self._product_tokens.pop(product_id, ()):
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.pop(product_id, None)
+            if not postings:
+                del self._postings[token]
+                del self._trigram_counts[token]
+                index = bisect.bisect_left(self._vocabulary, token)
+                if index < len(self._vocabulary) and self._vocabulary[index] == token:
+                    del self._vocabulary[index]
+                for gram in trigrams(token):
+                    tokens = self._trigrams.get(gram)
+                    if tokens is not None:
+                        tokens.discard(token)
+                        if not tokens:
+                            del self._trigrams[gram]
+
+    def _expand(self, token: str, allow_prefix: bool) -> Dict[str, float]:
+        """Vocabulary tokens matching a query token, with their match quality."""
+        matches: Dict[str, float] = {}
+        if token in self._postings:
+            matches[token] = EXACT_MATCH
+        if allow_prefix:
+            index = bisect.bisect_left(self._vocabulary, token)
+            while index < len(self._vocabulary) and self._vocabulary[index].startswith(token):
+                matches.setdefault(self._vocabulary[index], PREFIX_MATCH)
+                index += 1
+        if len(token) >= 3:
+            edits = max_edits(token)
+            query_grams = trigrams(token)
+            shared: Dict[str, int] = {}
+            for gram in query_grams:
+                for candidate in self._trigrams.get(gram, ()):
+                    shared[candidate] = shared.get(candidate, 0) + 1
+            for candidate, count in shared.items():
+                if candidate in matches:
+                    continue
+                similarity = count / (len(query_grams) + self._trigram_counts[candidate] - count)
+                if similarity >= MIN_FUZZY_SIMILARITY:
+                    matches[candidate] = FUZZY_MATCH * similarity
+                # Each edit changes at most 4 trigrams (a swap), which rules out most candidates cheaply
+                elif (edits and abs(len(candidate) - len(token)) <= edits and count >= len(query_grams) - 4 * edits
+                      and edit_distance(token, candidate, edits) <= edits):
+                    matches[candidate] = FUZZY_MATCH * MIN_FUZZY_SIMILARITY
+        return matches
+
+    def search(self, query: str, limit: int = 20) -> List[int]:
+        """
+        Ranked product ids for a free-text query. Products matching more query words rank
+        first, then by summed match quality x field weight; ties go to the lower id.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        scores: Dict[int, Tuple[int, float]] = {}
+        for position, token in enumerate(tokens):
+            best: Dict[int, float] = {}
+            # Only the last word can be incomplete (search-as-you-type)
+            for match, quality in self._expand(token, allow_prefix=position == len(tokens) - 1).items():
+                for product_id, weight in self._postings[match].items():
+                    score = quality * weight
+                    if score > best.get(product_id, 0.0):
+                        best[product_id] = score
+            for product_id, score in best.items():
+                matched, total = scores.get(product_id, (0, 0.0))
+                scores[product_id] = (matched + 1, total + score)
+        ranked = heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1][0], -item[1][1], item[0]))
+        return [product_id for product_id, _ in ranked]
@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Hashable, Optional
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import TelegramMethod
+
+from utils.metrics import SEND_COALESCED, SEND_RETRY_AFTER, SEND_WAIT
+
+logger = logging.getLogger(__name__)
+
+# Methods that count against Telegram's message limits (only when they target a chat or inline message)
+LIMITED_PREFIXES = ("send", "edit", "copy", "forward", "delete", "stop")
+# Edits of the same message that are still waiting to be sent are collapsed into the latest one
+COALESCED_METHODS = {"editMessageText", "editMessageCaption", "editMessageMedia", "editMessageReplyMarkup"}
+MAX_RETRY_AFTER = 60 # Longer flood-waits are raised to the caller instead of slept through
+MAX_IDLE_LANES = 10000 # Per-chat state kept before idle chats are pruned
+
+
+class TokenBucket:
+    """
+    `rate` tokens per second, holding at most `capacity` (at least 1, or acquire() could never
+    get a whole token, e.g. with a global rate split across many workers). acquire() waits for one token.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        async with self._lock: # Waiters are served in arrival order
+            self._refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+    def pause(self, seconds: float):
+        """Takes the bucket's tokens away for `seconds` (after a flood-wait)."""
+        self._refill()
+        self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+    @property
+    def idle(self) -> bool:
+        self._refill()
+        return self.tokens >= self.capacity and not self._lock.locked()
+
+
+class _Lane:
+    """Requests to one chat: sent one at a time, in call order, at most `rate` per second."""
+
+    def __init__(self, rate: float, burst: float):
+        self.bucket = TokenBucket(rate, burst)
+        self.lock = asyncio.Lock()
+
+
+class _PendingEdit:
+    def __init__(self, method: TelegramMethod, future: asyncio.Future):
+        self.method = method
+        self.future = future
+
+
+class SendScheduler(BaseRequestMiddleware):
+    """
+    Bot session middleware (`bot.session.middleware(SendScheduler(...))`) pacing outgoing
+    requests to stay under Telegram's limits instead of running into 429 flood-waits:
+
+    - sends, edits and deletes take a token from a global bucket (`global_rate` per second)
+      and from their chat's bucket (`chat_rate` per second, bursts of `chat_burst`); a chat's
+      requests go out one at a time in call order, so other chats are not held up;
+    - an edit of a message that already has an edit waiting replaces that edit's payload, and
+      both callers get the result of the one request that is sent (fast paging clicks);
+    - TelegramRetryAfter is slept through (up to MAX_RETRY_AFTER seconds, `max_retries` times)
+      and retried, holding back the chat meanwhile.
+
+    Other methods (answerCallbackQuery, getMe, webhook setup, ...) pass through unthrottled.
+    """
+
+    def __init__(self, global_rate: float = 30.0, chat_rate: float = 1.0, chat_burst: float = 3.0,
+                 max_retries: int = 3):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self._lanes: Dict[Hashable, _Lane] = {}
+        self._pending_edits: Dict[tuple, _PendingEdit] = {}
+
+    @staticmethod
+    def _target(method: TelegramMethod) -> Optional[Hashable]:
+        """The chat (or inline message) a limited method is sent to; None if it is not limited."""
+        if not method.__api_method__.startswith(LIMITED_PREFIXES):
+            return None
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is not None:
+            return chat_id
+        return getattr(method, "inline_message_id", None)
+
+    def _lane(self, target: Hashable) -> _Lane:
+        lane = self._lanes.get(target)
+        if lane is None:
+            if len(self._lanes) >= MAX_IDLE_LANES:
+                for key in [key for key, other in self._lanes.items() if other.bucket.idle and not other.lock.locked()]:
+                    del self._lanes[key]
+            lane = self._lanes[target] = _Lane(self.chat_rate, self.chat_burst)
+        return lane
+
+    async def __call__(self, make_request, bot, method: TelegramMethod):
+        target = self._target(method)
+        if target is None:
+            return await self._send(make_request, bot, method)
+
+        edit_key = None
+        if method.__api_method__ in COALESCED_METHODS:
+            edit_key = (method.__api_method__, target, getattr(method, "message_id", None))
+            pending = self._pending_edits.get(edit_key)
+            if pending is not None:
+                pending.method = method # The waiting request will send this payload instead
+                SEND_COALESCED.inc()
+                return await asyncio.shield(pending.future)
+            pending = self._pending_edits[edit_key] = _PendingEdit(method, asyncio.get_running_loop().create_future())
+
+        lane = self._lane(target)
+        started = time.perf_counter()
+        try:
+            async with lane.lock:
+                await lane.bucket.acquire()
+                await self.global_bucket.acquire()
+                SEND_WAIT.observe(time.perf_counter() - started)
+                if edit_key is None:
+                    return await self._send(make_request, bot, method, lane)
+                del self._pending_edits[edit_key] # Later edits queue behind this one from here on
+                try:
+                    pending.future.set_result(await self._send(make_request, bot, pending.method, lane))
+                except Exception as e:
+                    pending.future.set_exception(e)
+                return await pending.future
+        finally:
+            if edit_key is not None and not pending.future.done():
+                # Cancelled: release the callers whose edits were folded into this one
+                if self._pending_edits.get(edit_key) is pending:
+                    del self._pending_edits[edit_key]
+                pending.future.cancel()
+
+    async def _send(self, make_request, bot, method: TelegramMethod, lane: Optional[_Lane] = None):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                if attempt == self.max_retries or e.retry_after > MAX_RETRY_AFTER:
+                    raise
+                SEND_RETRY_AFTER.labels(method.__api_method__).inc()
+                logger.warning(f"Flood control on {method.__api_method__}: retrying in {e.retry_after}s.")
+                if lane is not None:
+                    lane.bucket.pause(e.retry_after)
+                await asyncio.sleep(e.retry_after)
@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from aiogram.methods import TelegramMethod
+
+from utils.metrics import UPDATE_QUEUE_DEPTH, UPDATE_QUEUE_DROPPED, UPDATE_QUEUE_WAIT
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_BACKPRESSURE = "backpressure" # wait for space, then refuse (Telegram redelivers later)
+OVERFLOW_SHED = "shed" # acknowledge and drop the update
+
+
+def ordering_key(update: dict) -> int:
+    """
+    Updates with the same key are processed one at a time, in arrival order: the chat
+    (messages, callback queries on a message), else the sender, else the update itself.
+    """
+    for key, event in update.items():
+        if key == "update_id" or not isinstance(event, dict):
+            continue
+        chat = event.get("chat") or (event.get("message") or {}).get("chat")
+        if isinstance(chat, dict) and "id" in chat:
+            return int(chat["id"])
+        for field in ("from", "user"):
+            owner = event.get(field)
+            if isinstance(owner, dict) and "id" in owner:
+                return int(owner["id"])
+    return int(update.get("update_id", 0))
+
+
+class UpdateQueue:
+    """
+    Bounded in-process queue of raw Telegram updates, processed by `workers` tasks.
+
+    Updates are kept in one FIFO lane per `key(update)` (ordering_key by default); a lane is
+    handled by at most one worker at a time, so per-chat order is preserved while different
+    chats run concurrently, and a slow chat only holds up itself. When `maxsize` updates are waiting, `put()` either
+    waits for space (OVERFLOW_BACKPRESSURE, up to `put_timeout` seconds) and then refuses,
+    or drops the update (OVERFLOW_SHED). `drain()` stops intake and finishes what is queued.
+    """
+
+    def __init__(self, dispatcher, bot, workers: int = 50, maxsize: int = 1000,
+                 overflow: str = OVERFLOW_BACKPRESSURE, put_timeout: Optional[float] = 5.0,
+                 key: Callable[[dict], int] = ordering_key, **data: Any):
+        self.dispatcher = dispatcher
+        self.bot = bot
+        self.workers = workers
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.put_timeout = put_timeout
+        self.key = key
+        self.data = data
+        self.size = 0 # Updates waiting (not yet picked up by a worker)
+        self.in_flight = 0
+        self.processed = 0
+        self.errors = 0
+        self.shed = 0
+        self.rejected = 0
+        self._lanes: Dict[int, Deque[Tuple[float, dict]]] = {}
+        self._active: Set[int] = set()
+        self._ready: asyncio.Queue = asyncio.Queue()
+        self._space = asyncio.Condition()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._closed = False
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def put(self, update: dict) -> bool:
+        """
+        Queues an update. Returns False if it was refused (queue closed, or still full after
+        put_timeout under backpressure) and should be answered with an error so Telegram
+        redelivers it; True if it was queued or shed.
+        """
+        if self._closed:
+            return False
+        if self.size >= self.maxsize:
+            if self.overflow == OVERFLOW_SHED:
+                self.shed += 1
+                UPDATE_QUEUE_DROPPED.labels("shed").inc()
+                return True
+            async with self._space:
+                try:
+                    await asyncio.wait_for(
+                        self._space.wait_for(lambda: self.size < self.maxsize or self._closed), self.put_timeout
+                    )
+                except asyncio.TimeoutError:
+                    pass
+            if self.size >= self.maxsize or self._closed:
+                self.rejected += 1
+                UPDATE_QUEUE_DROPPED.labels("rejected").inc()
+                return False
+
+        key = self.key(update)
+        lane = self._lanes.setdefault(key, deque())
+        lane.append((time.perf_counter(), update))
+        self.size += 1
+        self._idle.clear()
+        UPDATE_QUEUE_DEPTH.set(self.size)
+        if len(lane) == 1 and key not in self._active:
+            self._ready.put_nowait(key)
+        return True
+
+    async def _worker(self):
+        while True:
+            key = await self._ready.get()
+            lane = self._lanes[key]
+            enqueued, update = lane.popleft()
+            self._active.add(key)
+            self.size -= 1
+            self.in_flight += 1
+            UPDATE_QUEUE_DEPTH.set(self.size)
+            UPDATE_QUEUE_WAIT.observe(time.perf_counter() - enqueued)
+            async with self._space:
+                self._space.notify()
+            try:
+                result = await self.dispatcher.feed_raw_update(self.bot, update, **self.data)
+                if isinstance(result, TelegramMethod):
+                    await self.dispatcher.silent_call_request(bot=self.bot, result=result)
+                self.processed += 1
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Error processing update {update.get('update_id')}: {e}", exc_info=True)
+            finally:
+                self.in_flight -= 1
+                self._active.discard(key)
+                if lane:
+                    self._ready.put_nowait(key) # Next update of this chat, behind the other waiting chats
+                else:
+                    del self._lanes[key]
+                if self.size == 0 and self.in_flight == 0:
+                    self._idle.set()
+
+    async def drain(self, timeout: Optional[float] = 30.0):
+        """Refuses new updates, waits up to `timeout` seconds for queued ones, then stops the workers."""
+        self._closed = True
+        async with self._space:
+            self._space.notify_all() # Wake producers waiting for space so they refuse
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Update queue drain timed out: {self.size} queued and {self.in_flight} in-flight updates dropped.")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.size,
+            "in_flight": self.in_flight,
+            "processed": self.processed,
+            "errors": self.errors,
+            "shed": self.shed,
+            "rejected": self.rejected,
+        }
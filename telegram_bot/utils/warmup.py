@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, List, Optional
+
+from database.backend import repository
+from database.catalog_cache import catalog_cache
+from database.media_cache import media_cache
+from utils.localization import localization_catalog
+from utils.metrics import READY, WARMUP_STEP_SECONDS
+
+try:
+    from config import WARMUP_HOT_PRODUCTS
+except ImportError:
+    WARMUP_HOT_PRODUCTS = int(os.getenv("WARMUP_HOT_PRODUCTS", "200"))
+
+logger = logging.getLogger(__name__)
+
+HOT_PRODUCTS_PER_CATEGORY = 5 # First page of a category listing (ITEMS_PER_PAGE in handlers/catalog.py)
+
+
+class Warmup:
+    """
+    Startup warm-up: fills the in-process caches before the bot takes traffic, so the first
+    users after a deploy are not served from cold caches.
+
+    Interface texts (all languages) and product file_ids load concurrently with the catalog
+    chain: repository start (SQLite replica sync), then each language's snapshot (categories
+    with counts, products) and the locations, then the stock of the hot products (most ordered
+    recently, topped up with the first page of every category). Each step is timed; timings
+    are logged, exported as bot_warmup_step_seconds and served by the webhook app's /ready.
+
+    `ready` turns True once the warm-up has run, also if a step failed (those reads fall
+    through to the database), and False again on shutdown.
+    """
+
+    def __init__(self, hot_products: int = WARMUP_HOT_PRODUCTS):
+        self.hot_products = hot_products
+        self.ready = False
+        self.timings: Dict[str, float] = {}
+        self.failed: List[str] = []
+        self.total_seconds: Optional[float] = None
+
+    def set_ready(self, ready: bool):
+        self.ready = ready
+        READY.set(1 if ready else 0)
+
+    async def _step(self, name: str, load) -> bool:
+        """Runs one step and records its duration. A step fails by raising or returning False."""
+        started = time.perf_counter()
+        try:
+            ok = await load() is not False
+        except Exception as e:
+            logger.error(f"Warm-up step {name} failed: {e}")
+            ok = False
+        elapsed = time.perf_counter() - started
+        self.timings[name] = elapsed
+        WARMUP_STEP_SECONDS.labels(name).set(elapsed)
+        if not ok:
+            self.failed.append(name)
+        return ok
+
+    async def run(self):
+        """Registered as a dispatcher startup hook, before the caches start their refresh loops."""
+        started = time.perf_counter()
+        self.timings, self.failed = {}, []
+        await asyncio.gather(
+            self._step("interface_texts", localization_catalog.refresh),
+            self._step("media", media_cache.load),
+            self._warm_catalog(),
+        )
+        self.total_seconds = time.perf_counter() - started
+        self.set_ready(True)
+        steps = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.timings.items())
+        logger.info(f"Warm-up finished in {self.total_seconds:.2f}s ({steps})"
+                    + (f"; failed: {', '.join(self.failed)}" if self.failed else ""))
+
+    async def stop(self):
+        """Turns readiness off so load balancers stop routing here while the bot shuts down."""
+        self.set_ready(False)
+
+    async def _warm_catalog(self):
+        if not repository:
+            return
+        await self._step("repository", repository.start) # Catalog reads may come from the replica it syncs
+        await asyncio.gather(
+            self._step("locations", catalog_cache.load_locations),
+            *(self._step(f"catalog_{language}", lambda language=language: catalog_cache.load(language))
+              for language in catalog_cache.languages),
+        )
+        await self._step("hot_products", self._prefetch_hot_products)
+
+    async def _prefetch_hot_products(self) -> bool:
+        if self.hot_products <= 0:
+            return True
+        product_ids = await repository.get_hot_product_ids(self.hot_products)
+        snapshot = next(filter(None, map(catalog_cache.snapshot, catalog_cache.languages)), None)
+        if snapshot is not None:
+            # Only products still in the catalog, then what the first category pages show
+            product_ids = [product_id for product_id in product_ids if product_id in snapshot.products]
+            for category in snapshot.categories:
+                product_ids.extend(snapshot.products_by_category.get(category["id"], [])[:HOT_PRODUCTS_PER_CATEGORY])
+        product_ids = list(dict.fromkeys(product_ids))[:self.hot_products]
+        await catalog_cache.prefetch_stock(product_ids)
+        return True
+
+    def report(self) -> dict:
+        return {
+            "ready": self.ready,
+            "seconds": round(self.total_seconds, 3) if self.total_seconds is not None else None,
+            "steps": {name: round(seconds, 3) for name, seconds in self.timings.items()},
+            "failed": self.failed,
+        }
+
+
+warmup = Warmup()
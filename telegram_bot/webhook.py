@@ -7,7 +7,11 @@ from aiohttp import web
 
 # Import Bot, Dispatcher, and configurations
 try:
-    from config import BOT_TOKEN, WEBHOOK_URL, DEBUG, SUPABASE_URL # Added SUPABASE_URL
+    from config import (
+        BOT_TOKEN, WEBHOOK_URL, DEBUG, SUPABASE_URL, WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_WORKERS,
+        WEBHOOK_QUEUE_SIZE, WEBHOOK_QUEUE_WORKERS, WEBHOOK_QUEUE_OVERFLOW, WEBHOOK_QUEUE_PUT_TIMEOUT,
+        WEBHOOK_DRAIN_TIMEOUT
+    )
     # Assuming main.py initializes bot and dp, or we do it here.
     # The document example for webhook.py implies bot and dp are imported from main.
     # This can create a circular dependency if main.py also tries to run webhook logic.
@@ -20,14 +24,11 @@ try:
     # and register all handlers and middlewares, similar to main.py.
 
     from aiogram import Bot, Dispatcher
-    from aiogram.enums import ParseMode
-
-    # Import middlewares
-    from middlewares.localization import LocalizationMiddleware
-    from middlewares.database import DatabaseMiddleware
 
-    # Import routers
-    from handlers import start, catalog, cart, orders, settings
+    from main import create_bot, create_dispatcher
+    from utils.metrics import metrics_view
+    from utils.warmup import warmup
+    from utils.update_queue import UpdateQueue
 
     # Import Supabase client for checks (optional here, but good for consistency)
     from database.supabase_client import supabase_client # Removed SUPABASE_URL from here as it's in config
@@ -63,6 +64,38 @@ async def on_shutdown(bot: Bot):
         logger.error(f"Failed to delete webhook: {e}")
 
 
+async def ready_view(request: web.Request) -> web.Response:
+    """Readiness probe: 200 once the startup warm-up has run, 503 while starting or shutting down."""
+    return web.json_response(warmup.report(), status=200 if warmup.ready else 503)
+
+
+class QueuedRequestHandler(SimpleRequestHandler):
+    """
+    Fast-ack webhook handler: answers Telegram as soon as the update is queued in an
+    UpdateQueue (utils/update_queue.py) instead of after the handlers have run, so slow
+    Supabase calls do not make Telegram time out and redeliver. Answers 503 when the queue
+    refuses the update (full under backpressure, or draining). Drains the queue on shutdown.
+    """
+
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, update_queue: UpdateQueue, **data):
+        super().__init__(dispatcher=dispatcher, bot=bot, **data)
+        self.update_queue = update_queue
+
+    async def handle(self, request: web.Request) -> web.Response:
+        bot = await self.resolve_bot(request)
+        if not self.verify_secret(request.headers.get("X-Telegram-Bot-Api-Secret-Token", ""), bot):
+            return web.Response(body="Unauthorized", status=401)
+        update = await request.json(loads=bot.session.json_loads)
+        if not await self.update_queue.put(update):
+            return web.Response(status=503)
+        return web.json_response({}, dumps=bot.session.json_dumps)
+
+    async def close(self) -> None:
+        # Runs on app shutdown, after the webhook was deleted and before dispatcher shutdown.
+        await self.update_queue.drain(WEBHOOK_DRAIN_TIMEOUT)
+        await super().close()
+
+
 def setup_bot_and_dispatcher():
     if not BOT_TOKEN:
         logger.critical("BOT_TOKEN is not configured. Webhook cannot start.")
@@ -74,71 +107,90 @@ def setup_bot_and_dispatcher():
         logger.error("SUPABASE_URL is configured, but Supabase client failed to initialize.")
         # sys.exit(1) # Decide if critical
 
-    bot = Bot(token=BOT_TOKEN, parse_mode=ParseMode.HTML)
-    dp = Dispatcher()
-
-    # Register middlewares
-    dp.update.middleware(DatabaseMiddleware())
-    dp.update.middleware(LocalizationMiddleware())
-
-    # Register routers
-    dp.include_router(start.router)
-    dp.include_router(catalog.router)
-    dp.include_router(cart.router)
-    dp.include_router(orders.router)
-    dp.include_router(settings.router)
+    bot = create_bot()
+    dp = create_dispatcher() # Same middlewares, hooks and routers as polling mode
 
     logger.info("Bot and Dispatcher initialized for webhook.")
     return bot, dp
 
 
-def run_webhook_server():
-    """
-    Initializes and runs the aiohttp web server for the webhook.
-    This function is intended to be called if webhook mode is active.
-    """
-    if not WEBHOOK_URL:
-        logger.info("WEBHOOK_URL not set. Webhook server will not start. Use polling (main.py).")
-        return
-
-    logging.basicConfig(level=logging.INFO if not DEBUG else logging.DEBUG,
-                        format="%(asctime)s - %(levelname)s - %(name)s - %(message)s")
-
+def create_single_process_app() -> web.Application:
+    """Webhook app processing updates in this process."""
     bot, dp = setup_bot_and_dispatcher()
 
     app = web.Application()
 
     # Register startup and shutdown actions
     app.on_startup.append(lambda _: on_startup(bot, WEBHOOK_URL))
+    app.on_shutdown.append(lambda _: warmup.stop()) # Not ready any more while the queue drains
     app.on_shutdown.append(lambda _: on_shutdown(bot))
 
-    # Create SimpleRequestHandler instance
-    webhook_request_handler = SimpleRequestHandler(
-        dispatcher=dp,
-        bot=bot,
-    )
+    if WEBHOOK_QUEUE_SIZE > 0:
+        # Acknowledge at once; a bounded queue with per-chat ordering feeds the dispatcher
+        update_queue = UpdateQueue(
+            dp, bot, workers=WEBHOOK_QUEUE_WORKERS, maxsize=WEBHOOK_QUEUE_SIZE,
+            overflow=WEBHOOK_QUEUE_OVERFLOW, put_timeout=WEBHOOK_QUEUE_PUT_TIMEOUT,
+        )
+        app.on_startup.append(lambda _: update_queue.start())
+        webhook_request_handler = QueuedRequestHandler(dispatcher=dp, bot=bot, update_queue=update_queue)
+    else:
+        # Process each update inside its request
+        webhook_request_handler = SimpleRequestHandler(
+            dispatcher=dp,
+            bot=bot,
+        )
     # Register webhook handler on application
     webhook_request_handler.register(app, path=WEBHOOK_PATH)
 
+    # Prometheus scrape endpoint and readiness probe
+    app.router.add_get("/metrics", metrics_view)
+    app.router.add_get("/ready", ready_view)
+
     # Mount dispatcher startup and shutdown hooks to aiohttp application
     # setup_application will run dp.emit_startup() and dp.emit_shutdown()
     setup_application(app, dp, bot=bot)
 
-    # Get host and port from WEBHOOK_URL or use defaults
-    # Example: WEBHOOK_URL = "https://your-domain.com" implies port 443 (HTTPS)
-    # For local testing, WEBHOOK_URL might be "http://localhost:8080"
-    # aiohttp's run_app typically uses host '0.0.0.0' and a specified port.
-    # The port needs to be consistent with what Telegram sends requests to.
-    # If WEBHOOK_URL is "https://your-domain.com/somepath", the actual listening port
-    # is determined by your reverse proxy (e.g., nginx) forwarding to this app's port.
-    # For simplicity, let's assume a common local setup or that the environment handles port mapping.
-    # The document example uses port 8000.
-
-    host = "0.0.0.0"
-    port = 8000 # Default port, make configurable if needed e.g. from .env
-
-    logger.info(f"Starting aiohttp server for webhook on {host}:{port}{WEBHOOK_PATH}")
-    web.run_app(app, host=host, port=port)
+    return app
+
+
+def create_multi_worker_app() -> web.Application:
+    """
+    Front app for WEBHOOK_WORKERS > 1: updates are routed by from_user.id to worker
+    processes (webhook_workers.py), each running its own dispatcher. Only the webhook
+    registration happens here. Serves /health and aggregated /metrics.
+    """
+    from webhook_workers import WorkerPool, create_front_app, prepare_multiprocess_metrics
+
+    prepare_multiprocess_metrics()
+    bot = create_bot()
+    app = create_front_app(WorkerPool(WEBHOOK_WORKERS), WEBHOOK_PATH)
+    app.on_startup.append(lambda _: on_startup(bot, WEBHOOK_URL))
+    app.on_shutdown.insert(0, lambda _: on_shutdown(bot)) # Stop deliveries before draining the workers
+    app.on_cleanup.append(lambda _: bot.session.close())
+    return app
+
+
+def run_webhook_server():
+    """
+    Initializes and runs the aiohttp web server for the webhook.
+    This function is intended to be called if webhook mode is active.
+    """
+    if not WEBHOOK_URL:
+        logger.info("WEBHOOK_URL not set. Webhook server will not start. Use polling (main.py).")
+        return
+
+    logging.basicConfig(level=logging.INFO if not DEBUG else logging.DEBUG,
+                        format="%(asctime)s - %(levelname)s - %(name)s - %(message)s")
+
+    if WEBHOOK_WORKERS > 1:
+        app = create_multi_worker_app()
+    else:
+        app = create_single_process_app()
+
+    # The public port is whatever the reverse proxy behind WEBHOOK_URL forwards to WEBHOOK_HOST:WEBHOOK_PORT.
+    logger.info(f"Starting aiohttp server for webhook on {WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH} "
+                f"({WEBHOOK_WORKERS} worker process{'es' if WEBHOOK_WORKERS > 1 else ''})")
+    web.run_app(app, host=WEBHOOK_HOST, port=WEBHOOK_PORT)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,281 @@
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from aiohttp import web
+
+try:
+    from config import WEBHOOK_WORKER_QUEUE_SIZE, WEBHOOK_WORKER_CONCURRENCY
+except ImportError:
+    WEBHOOK_WORKER_QUEUE_SIZE = int(os.getenv("WEBHOOK_WORKER_QUEUE_SIZE", "1000"))
+    WEBHOOK_WORKER_CONCURRENCY = int(os.getenv("WEBHOOK_WORKER_CONCURRENCY", "100"))
+
+logger = logging.getLogger(__name__)
+
+# Workers are started with "spawn": the front process already runs threads (Supabase
+# pool, aiohttp), which must not be inherited through fork().
+_context = multiprocessing.get_context("spawn")
+
+HEARTBEAT_INTERVAL = 1.0 # Seconds between worker heartbeats while idle
+HEARTBEAT_TIMEOUT = 10.0 # A worker silent for longer is reported unhealthy
+SUPERVISE_INTERVAL = 2.0 # Seconds between checks for dead workers (which are restarted)
+SHUTDOWN_TIMEOUT = 30.0 # Seconds a worker gets to drain its queue on shutdown
+
+
+def routing_key(update: dict) -> int:
+    """
+    The id an update is routed by: the sender (from_user.id), or the chat / user of updates
+    without a sender (channel posts, poll answers, reactions), or the update_id as a last resort.
+    """
+    for key, event in update.items():
+        if key == "update_id" or not isinstance(event, dict):
+            continue
+        for field in ("from", "user", "chat"):
+            owner = event.get(field)
+            if isinstance(owner, dict) and "id" in owner:
+                return int(owner["id"])
+        message = event.get("message") # e.g. callback queries without a sender
+        if isinstance(message, dict) and isinstance(message.get("chat"), dict):
+            return int(message["chat"]["id"])
+    return int(update.get("update_id", 0))
+
+
+class WorkerState:
+    """Per-worker counters in shared memory, written by the workers and read by the front process."""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.heartbeats = _context.Array("d", workers) # time.time() of the last sign of life
+        self.ready = _context.Array("b", workers) # 1 once the worker's dispatcher has started
+        self.in_flight = _context.Array("l", workers)
+        self.processed = _context.Array("l", workers)
+        self.errors = _context.Array("l", workers)
+
+
+# Worker process
+
+def worker_main(index: int, updates, state: WorkerState, concurrency: int):
+    """Entry point of a worker process: runs the full dispatcher on the updates routed to it."""
+    # Ctrl+C reaches the whole process group; workers stop via the sentinel from the front instead.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.basicConfig(level=logging.INFO, format=f"%(asctime)s - %(levelname)s - worker{index} - %(name)s - %(message)s")
+    asyncio.run(_worker(index, updates, state, concurrency))
+
+
+async def _worker(index: int, updates, state: WorkerState, concurrency: int):
+    from main import create_bot, create_dispatcher # Heavy imports only in the worker processes
+    from utils.update_queue import UpdateQueue
+
+    bot = create_bot(senders=state.workers) # Workers share the global send rate
+    dp = create_dispatcher()
+    await dp.emit_startup(bot=bot)
+    state.heartbeats[index] = time.time()
+    state.ready[index] = 1
+    logger.info(f"Worker {index} (pid {os.getpid()}) ready.")
+
+    loop = asyncio.get_running_loop()
+    reader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="update-reader")
+    # Keyed by the same id as the routing, so one user's updates run one at a time in order
+    # while different users run concurrently. put() blocks while `concurrency` updates are
+    # buffered here, which leaves the rest in the shared queue (and lets the front answer 503).
+    update_queue = UpdateQueue(dp, bot, workers=concurrency, maxsize=concurrency, put_timeout=None, key=routing_key)
+    await update_queue.start()
+
+    def beat():
+        state.heartbeats[index] = time.time()
+        state.in_flight[index] = update_queue.size + update_queue.in_flight
+        state.processed[index] = update_queue.processed
+        state.errors[index] = update_queue.errors
+
+    while True:
+        try:
+            raw = await loop.run_in_executor(reader, updates.get, True, HEARTBEAT_INTERVAL)
+        except queue.Empty:
+            beat()
+            continue
+        beat()
+        if raw is None: # Shutdown sentinel
+            break
+        await update_queue.put(raw)
+
+    state.ready[index] = 0
+    await update_queue.drain(SHUTDOWN_TIMEOUT)
+    reader.shutdown(wait=False)
+    await dp.emit_shutdown(bot=bot)
+    await bot.session.close()
+    logger.info(f"Worker {index} stopped.")
+
+
+# Front process
+
+class WorkerPool:
+    """
+    Worker processes, each with its own bounded update queue. `submit()` routes an update
+    to worker `routing_key(update) % workers`, so one user's updates always reach the same
+    process (warm per-user caches and FSM state, preserved order). Dead workers are restarted.
+    """
+
+    def __init__(self, workers: int, queue_size: int = WEBHOOK_WORKER_QUEUE_SIZE,
+                 concurrency: int = WEBHOOK_WORKER_CONCURRENCY):
+        self.workers = workers
+        self.concurrency = concurrency
+        self.queues = [_context.Queue(maxsize=queue_size) for _ in range(workers)]
+        self.state = WorkerState(workers)
+        self.processes: List[Optional[multiprocessing.Process]] = [None] * workers
+        self.restarts = [0] * workers
+        self.rejected = [0] * workers
+        self._supervisor: Optional[asyncio.Task] = None
+        self.stopping = False
+
+    def _spawn(self, index: int):
+        process = _context.Process(
+            target=worker_main, name=f"webhook-worker-{index}", daemon=False,
+            args=(index, self.queues[index], self.state, self.concurrency),
+        )
+        self.state.ready[index] = 0
+        process.start()
+        self.state.heartbeats[index] = time.time()
+        self.processes[index] = process
+
+    async def start(self):
+        for index in range(self.workers):
+            self._spawn(index)
+        self._supervisor = asyncio.create_task(self._supervise())
+
+    async def _supervise(self):
+        while True:
+            await asyncio.sleep(SUPERVISE_INTERVAL)
+            for index, process in enumerate(self.processes):
+                if process is not None and not process.is_alive():
+                    logger.error(f"Webhook worker {index} (pid {process.pid}) exited with {process.exitcode}; restarting.")
+                    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+                        from prometheus_client import multiprocess
+                        multiprocess.mark_process_dead(process.pid)
+                    self.restarts[index] += 1
+                    self.state.in_flight[index] = 0
+                    self._spawn(index)
+
+    def submit(self, update: dict) -> bool:
+        """Queues an update for its worker; False if that worker's queue is full."""
+        index = routing_key(update) % self.workers
+        try:
+            self.queues[index].put_nowait(update)
+            return True
+        except queue.Full:
+            self.rejected[index] += 1
+            return False
+
+    async def stop(self):
+        """Lets every worker drain its queue and in-flight updates, then stops it."""
+        self.stopping = True
+        if self._supervisor:
+            self._supervisor.cancel()
+        for updates in self.queues:
+            updates.put(None)
+        loop = asyncio.get_running_loop()
+        for index, process in enumerate(self.processes):
+            if process is None:
+                continue
+            await loop.run_in_executor(None, process.join, SHUTDOWN_TIMEOUT)
+            if process.is_alive():
+                logger.warning(f"Webhook worker {index} did not stop in {SHUTDOWN_TIMEOUT}s; terminating.")
+                process.terminate()
+
+    def health(self) -> dict:
+        now = time.time()
+        workers = []
+        for index, process in enumerate(self.processes):
+            alive = process is not None and process.is_alive()
+            ready = alive and bool(self.state.ready[index])
+            heartbeat_age = now - self.state.heartbeats[index]
+            workers.append({
+                "worker": index,
+                "pid": process.pid if process else None,
+                "alive": alive,
+                "ready": ready,
+                "healthy": ready and heartbeat_age < HEARTBEAT_TIMEOUT,
+                "heartbeat_age_seconds": round(heartbeat_age, 2),
+                "queue_depth": self.queues[index].qsize(),
+                "in_flight": self.state.in_flight[index],
+                "processed": self.state.processed[index],
+                "errors": self.state.errors[index],
+                "rejected": self.rejected[index],
+                "restarts": self.restarts[index],
+            })
+        return {"healthy": all(worker["healthy"] for worker in workers), "workers": workers}
+
+    def render_metrics(self) -> str:
+        """Worker gauges in Prometheus text format (appended to the aggregated worker metrics)."""
+        health = self.health()["workers"]
+        lines = []
+        for name, field, kind, help_text in (
+            ("bot_webhook_worker_up", "healthy", "gauge", "1 if the worker is started and sending heartbeats"),
+            ("bot_webhook_worker_queue_depth", "queue_depth", "gauge", "Updates waiting in the worker's queue"),
+            ("bot_webhook_worker_in_flight", "in_flight", "gauge", "Updates the worker is processing"),
+            ("bot_webhook_worker_processed", "processed", "counter", "Updates processed by the worker"),
+            ("bot_webhook_worker_rejected", "rejected", "counter", "Updates rejected because the worker's queue was full"),
+            ("bot_webhook_worker_restarts", "restarts", "counter", "Times the worker process was restarted"),
+        ):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(f'{name}{{worker="{w["worker"]}"}} {int(w[field])}' for w in health)
+        return "\n".join(lines) + "\n"
+
+
+def create_front_app(pool: WorkerPool, webhook_path: str) -> web.Application:
+    """
+    aiohttp app of the front process: accepts Telegram's webhook POSTs and hands each update
+    to its worker, and serves /health (per-worker status, 503 while any worker is starting or unhealthy),
+    /ready (503 until every worker has warmed up) and /metrics (all workers' metrics plus the worker gauges).
+    """
+    from utils.metrics import render_metrics
+
+    async def webhook_view(request: web.Request) -> web.Response:
+        try:
+            update = await request.json()
+        except json.JSONDecodeError:
+            return web.Response(status=400)
+        if not pool.submit(update):
+            # Telegram redelivers on errors, which backs off this worker's queue.
+            return web.Response(status=503)
+        return web.Response()
+
+    async def health_view(request: web.Request) -> web.Response:
+        health = pool.health()
+        return web.json_response(health, status=200 if health["healthy"] else 503)
+
+    async def ready_view(request: web.Request) -> web.Response:
+        # A worker reports ready once its dispatcher startup, including the warm-up, has finished
+        workers = [{"worker": w["worker"], "ready": w["ready"]} for w in pool.health()["workers"]]
+        ready = not pool.stopping and all(worker["ready"] for worker in workers)
+        return web.json_response({"ready": ready, "workers": workers}, status=200 if ready else 503)
+
+    async def metrics_view(request: web.Request) -> web.Response:
+        body = render_metrics() + pool.render_metrics().encode()
+        return web.Response(body=body, content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_post(webhook_path, webhook_view)
+    app.router.add_get("/health", health_view)
+    app.router.add_get("/ready", ready_view)
+    app.router.add_get("/metrics", metrics_view)
+    app.on_startup.append(lambda _: pool.start())
+    app.on_shutdown.append(lambda _: pool.stop())
+    return app
+
+
+def prepare_multiprocess_metrics():
+    """
+    Points prometheus_client at a fresh directory shared by the workers (set before they are
+    spawned, so they record into it), letting the front aggregate their metrics.
+    """
+    if not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="bot-metrics-")